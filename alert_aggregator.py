@@ -0,0 +1,255 @@
+"""
+Incident Aggregation
+====================
+Collapses the per-packet alert stream into incidents before anything is
+written. Alerts with the same (source IP, attack type, destination IP) join
+one open incident while they keep arriving within `window` seconds of each
+other, up to `max_duration`. Each incident tracks:
+
+    first/last seen, alert count, distinct destination ports,
+    peak RF score and AE error, anomaly count
+
+Only a sample of the raw alerts is forwarded to the raw sink (normally an
+AlertWriter): the first `sample_first` alerts of each incident, then one in
+every `sample_every`, each tagged with the incident key. Incident rows are
+upserted from a background thread every `flush_interval` seconds while they
+change, and once more when they close. With a RollupCounter (alert_storage.py)
+every alert, sampled or not, is also counted into the per-minute/hour rollups
+on the same flush. Incidents and rollup counts go wherever the raw alerts go:
+the AlertWriter's sink (alert_sinks.py, e.g. files shipped later from an edge
+sensor), or `engine` when the raw sink has none. A `stream_sink` (normally
+alert_archive.stream_writer()) receives every alert, tagged with its
+incident key, for the Parquet archive.
+
+The aggregator is callable, so it plugs into LivePipeline as its alert_sink:
+
+    aggregator = IncidentAggregator(raw_sink=AlertWriter().start()).start()
+    pipeline = LivePipeline(assets, threshold, alert_sink=aggregator)
+"""
+
+import time
+import uuid
+import threading
+
+DEFAULT_WINDOW = 60.0  # seconds of silence that close an incident
+DEFAULT_MAX_DURATION = 900.0  # long-running attacks are split into incidents of at most this length
+MAX_PORTS_TRACKED = 65536
+PORTS_SAMPLE = 20
+MAX_CLOSED_PENDING = 10_000  # closed incident rows kept for retry while writes fail; the oldest are dropped beyond
+
+
+class _Incident:
+    __slots__ = ('key', 'src_ip', 'dst_ip', 'attack_type', 'sensor_id', 'first_seen', 'last_seen', 'started',
+                 'updated', 'count', 'ports', 'peak_rf_score', 'peak_ae_mse', 'anomalies', 'dirty')
+
+    def __init__(self, alert, now):
+        self.key = uuid.uuid4().hex
+        self.src_ip = alert.get('Source IP')
+        self.dst_ip = alert.get('Destination IP')
+        self.attack_type = alert['Attack Type']
+        self.sensor_id = alert.get('Sensor')
+        self.first_seen = alert['timestamp']
+        self.started = now
+        self.count = 0
+        self.ports = set()
+        self.peak_rf_score = None
+        self.peak_ae_mse = None
+        self.anomalies = 0
+
+    def add(self, alert, now):
+        self.count += 1
+        self.last_seen = alert['timestamp']
+        self.updated = now
+        self.dirty = True
+        if len(self.ports) < MAX_PORTS_TRACKED:
+            self.ports.add(int(alert['Destination Port']))
+        rf_score, ae_mse = alert.get('RF Score'), alert.get('Anomaly MSE')
+        if rf_score is not None and (self.peak_rf_score is None or rf_score > self.peak_rf_score):
+            self.peak_rf_score = rf_score
+        if ae_mse is not None and (self.peak_ae_mse is None or ae_mse > self.peak_ae_mse):
+            self.peak_ae_mse = ae_mse
+        self.anomalies += bool(alert.get('Is Anomaly'))
+
+    def row(self, is_open):
+        return {
+            'incident_key': self.key,
+            'src_ip': self.src_ip,
+            'dst_ip': self.dst_ip,
+            'known_attack_type': self.attack_type,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'alert_count': self.count,
+            'distinct_dst_ports': len(self.ports),
+            'dst_ports_sample': ','.join(map(str, sorted(self.ports)[:PORTS_SAMPLE])),
+            'peak_rf_score': self.peak_rf_score,
+            'peak_ae_mse': self.peak_ae_mse,
+            'anomaly_count': self.anomalies,
+            'sensor_id': self.sensor_id,
+            'is_open': is_open,
+        }
+
+
+def upsert_incidents(engine, rows):
+    """INSERT ... ON CONFLICT (incident_key) DO UPDATE, for PostgreSQL and SQLite."""
+    from database_setup import Incident
+    if engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    # One row per incident, the last one given (an upsert can't touch the same row twice)
+    rows = list({row['incident_key']: row for row in rows}.values())
+    statement = insert(Incident.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=['incident_key'],
+        set_={col: statement.excluded[col] for col in rows[0] if col not in ('incident_key', 'first_seen')})
+    with engine.begin() as connection:
+        connection.execute(statement, rows)
+
+
+class IncidentAggregator:
+    """Groups alerts into incidents in memory; persists incidents and a sample of raw alerts."""
+
+    def __init__(self, raw_sink=None, engine=None, window=DEFAULT_WINDOW, max_duration=DEFAULT_MAX_DURATION,
+                 sample_first=5, sample_every=100, flush_interval=2.0, write_incidents=upsert_incidents,
+                 rollups=None, stream_sink=None):
+        self.raw_sink = raw_sink
+        self.engine = engine
+        self.window = window
+        self.max_duration = max_duration
+        self.sample_first = sample_first
+        self.sample_every = sample_every
+        self.flush_interval = flush_interval
+        self.write_incidents = write_incidents
+        self.rollups = rollups
+        self.stream_sink = stream_sink
+        self.sink = None  # the raw sink's alert sink, if it has one (set in start())
+        self.open = {}  # (src_ip, attack type, dst_ip) -> _Incident
+        self.closed = []  # rows of the incidents closed since the last successful write
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.counters = {'alerts': 0, 'raw_forwarded': 0, 'incidents_opened': 0, 'incidents_closed': 0,
+                         'incident_writes': 0, 'write_failures': 0, 'incidents_dropped': 0}
+        self.last_error = None
+
+    # --- Analysis thread ---
+    def submit(self, alert):
+        now = time.monotonic()
+        if self.rollups is not None:
+            self.rollups.add(alert)
+        key = (alert.get('Source IP'), alert['Attack Type'], alert.get('Destination IP'))
+        with self.lock:
+            self.counters['alerts'] += 1
+            incident = self.open.get(key)
+            if incident is not None and (now - incident.updated > self.window
+                                         or now - incident.started > self.max_duration):
+                self._close(key)
+                incident = None
+            if incident is None:
+                incident = self.open[key] = _Incident(alert, now)
+                self.counters['incidents_opened'] += 1
+            incident.add(alert, now)
+            sampled = incident.count <= self.sample_first or incident.count % self.sample_every == 0
+        if self.stream_sink is not None:
+            self.stream_sink(dict(alert, Incident=incident.key))
+        if sampled and self.raw_sink is not None:
+            self.counters['raw_forwarded'] += 1
+            self.raw_sink(dict(alert, Incident=incident.key))
+
+    __call__ = submit
+
+    def _close(self, key):
+        """Moves an incident's final row to the closed list (caller holds the lock); its port set is freed."""
+        incident = self.open.pop(key)
+        self.closed.append(incident.row(is_open=False))
+        self.counters['incidents_closed'] += 1
+
+    # --- Flusher thread ---
+    def start(self):
+        """Starts the flusher; start the raw sink (AlertWriter) first, so its sink is known."""
+        sink = getattr(self.raw_sink, 'sink', None)
+        if hasattr(sink, 'write_incidents'):
+            self.sink = sink
+        elif self.engine is None:
+            from database_setup import engine
+            self.engine = engine
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True, name='incident-flusher')
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        """Closes every open incident, writes them, then stops the raw and stream sinks if they have a stop()."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        if hasattr(self.raw_sink, 'stop'):
+            self.raw_sink.stop()
+        if hasattr(self.stream_sink, 'stop'):
+            self.stream_sink.stop()
+
+    def run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+        self.flush(close_all=True)
+
+    def flush(self, close_all=False):
+        """Closes expired incidents and upserts every incident that changed since the last flush."""
+        if self.rollups is not None:
+            self.rollups.flush(self.engine, sink=self.sink)
+        now = time.monotonic()
+        with self.lock:
+            for key, incident in list(self.open.items()):
+                if close_all or now - incident.updated > self.window or now - incident.started > self.max_duration:
+                    self._close(key)
+            closed, self.closed = self.closed, []
+            rows = list(closed)
+            changed = [incident for incident in self.open.values() if incident.dirty]
+            rows += [incident.row(is_open=True) for incident in changed]
+            for incident in changed:
+                incident.dirty = False
+        if not rows:
+            return
+        try:
+            if self.sink is not None:
+                self.sink.write_incidents(rows)
+            else:
+                self.write_incidents(self.engine, rows)
+            self.counters['incident_writes'] += len(rows)
+            self.last_error = None
+        except Exception as e:
+            # Retry on the next flush: closed rows go back on the (capped) list, open incidents stay dirty
+            self.counters['write_failures'] += 1
+            self.last_error = e
+            with self.lock:
+                self.closed = closed + self.closed
+                overflow = len(self.closed) - MAX_CLOSED_PENDING
+                if overflow > 0:
+                    self.closed = self.closed[overflow:]
+                    self.counters['incidents_dropped'] += overflow
+                for incident in changed:
+                    incident.dirty = True
+
+    # --- Views ---
+    def snapshot(self, limit=200):
+        """Open incidents, most recently active first, as display rows."""
+        with self.lock:
+            incidents = sorted(self.open.values(), key=lambda incident: incident.updated, reverse=True)[:limit]
+            return [{
+                'Last Seen': incident.last_seen,
+                'Source IP': incident.src_ip,
+                'Destination IP': incident.dst_ip,
+                'Attack Type': incident.attack_type,
+                'Alerts': incident.count,
+                'Distinct Ports': len(incident.ports),
+                'Peak RF Score': incident.peak_rf_score,
+                'Peak Anomaly MSE': incident.peak_ae_mse,
+                'First Seen': incident.first_seen,
+            } for incident in incidents]
+
+    def metrics(self):
+        counters = dict(self.counters, open_incidents=len(self.open), pending_closed=len(self.closed),
+                        last_error=str(self.last_error) if self.last_error else None)
+        written = counters['raw_forwarded'] + counters['incident_writes']
+        counters['write_reduction'] = round(counters['alerts'] / written, 1) if written else None
+        return counters
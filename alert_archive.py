@@ -0,0 +1,464 @@
+"""
+Alert Archive: Parquet Export and DuckDB Investigation
+======================================================
+Long-range questions over the alert history ("top 20 sources by distinct
+destination ports in the last 30 days") are answered from a columnar archive
+of every alert instead of the alerts table, which keeps only a sample of
+each incident's alerts (see alert_aggregator.py):
+
+    stream   IncidentAggregator passes every alert to a stream writer
+             (stream_writer(): an AlertWriter with a ParquetSink) that
+             writes rotating files to alert_archive/incoming/. The export
+             moves each finished file into the date partitions, split at
+             midnight, rows in timestamp order
+             (alert_archive/date=2026-10-19/stream-<file>.parquet). Once a
+             day is over, its stream files are merged into one
+             stream-day.parquet, since every file adds to the cost of a
+             query. Edge sensors' incoming/ files are ingested the same way.
+    table    History from before the stream was enabled can be exported
+             from the alerts table (--from-table): completed hours, one file
+             per hour for the current day, replaced by a single day.parquet
+             once the day is over. A watermark file records the first hour
+             not yet exported. These files hold only the sampled alerts, and
+             the table export stops where the stream starts, so no alert is
+             archived twice.
+    query    An in-process DuckDB reads the files through an `alerts` view.
+             It reads only the columns a query uses, skips date partitions
+             and row groups outside the time range, and runs the group-bys
+             on all cores. No server is involved.
+
+The archive outlives the alerts table's retention. Export (ingest) hourly:
+    python alert_archive.py --export
+Copy edge sensors' finished stream files over and ingest them:
+    python alert_archive.py --export --ingest /mnt/edge-01/alert_archive/incoming
+Once, for the sampled history from before the stream:
+    python alert_archive.py --export --from-table
+"""
+
+import os
+import sys
+import glob
+import json
+import argparse
+from datetime import datetime, timedelta
+
+ARCHIVE_DIR = os.getenv('ALERT_ARCHIVE_DIR', 'alert_archive')
+WATERMARK_FILE = '_watermark.json'
+INCOMING_DIR = 'incoming'  # finished stream files waiting to be ingested
+STREAM_ROTATE_SECONDS = 600  # a stream file is finished (and can be ingested) after at most this long
+STREAM_DAY_FILE = 'stream-day.parquet'
+EXPORT_SETTLE_MINUTES = 5  # an hour is exported once it ended this long ago, so the writer's batches have landed
+EXPORT_BATCH_ROWS = 100_000  # rows per Parquet row group
+# Display name -> archive column
+DIMENSIONS = {
+    'Source IP': 'src_ip',
+    'Destination IP': 'dst_ip',
+    'Destination Port': 'destination_port',
+    'Protocol': 'protocol',
+    'Attack Type': 'known_attack_type',
+    'Sensor': 'sensor_id',
+    'Incident': 'incident_key',
+}
+# Display name -> DuckDB aggregate
+METRICS = {
+    'Alerts': 'count(*)',
+    'Anomalies': 'count(*) FILTER (WHERE anomaly_detected)',
+    'Distinct Destination Ports': 'count(DISTINCT destination_port)',
+    'Distinct Destination IPs': 'count(DISTINCT dst_ip)',
+    'Distinct Source IPs': 'count(DISTINCT src_ip)',
+    'Max RF Score': 'max(rf_score)',
+    'Mean Anomaly MSE': 'avg(ae_mse)',
+}
+TIME_BUCKETS = ('minute', 'hour', 'day', 'week')
+
+
+def _engine(engine):
+    if engine is None:
+        from database_setup import engine
+    return engine
+
+
+def floor_hour(timestamp):
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def archive_schema():
+    import pyarrow as pa
+    from alert_sinks import parquet_schema
+    return pa.schema([('id', pa.int64())] + list(parquet_schema()))
+
+
+def hour_path(archive_dir, hour):
+    return os.path.join(archive_dir, f"date={hour:%Y-%m-%d}", f"hour-{hour:%H}.parquet")
+
+
+def day_path(archive_dir, day):
+    return os.path.join(archive_dir, f"date={day:%Y-%m-%d}", "day.parquet")
+
+
+# --- Export ---
+def read_watermark(archive_dir=ARCHIVE_DIR):
+    """Start of the first hour not yet exported, or None for a new archive."""
+    try:
+        with open(os.path.join(archive_dir, WATERMARK_FILE)) as f:
+            return datetime.fromisoformat(json.load(f)['exported_until'])
+    except FileNotFoundError:
+        return None
+
+
+def write_watermark(archive_dir, until):
+    path = os.path.join(archive_dir, WATERMARK_FILE)
+    with open(path + '.part', 'w') as f:
+        json.dump({'exported_until': until.isoformat()}, f)
+    os.replace(path + '.part', path)
+
+
+def export_range(engine, path, start, end):
+    """Writes the alerts in [start, end) to the Parquet file `path`, replacing it; returns the number of rows."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from sqlalchemy import select
+    from database_setup import Alert
+    table = Alert.__table__
+    schema = archive_schema()
+    query = (select(*[table.c[name] for name in schema.names])
+             .where(table.c.timestamp >= start, table.c.timestamp < end)
+             .order_by(table.c.timestamp))
+    writer = None
+    rows = 0
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(query)
+        while batch := result.fetchmany(EXPORT_BATCH_ROWS):
+            if writer is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                writer = pq.ParquetWriter(path + '.part', schema, compression='zstd')
+            columns = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            rows += len(batch)
+    if writer is not None:
+        writer.close()
+        os.replace(path + '.part', path)
+    return rows
+
+
+def archived_rows(paths):
+    import pyarrow.parquet as pq
+    return sum(pq.ParquetFile(path).metadata.num_rows for path in paths)
+
+
+def export_period(engine, path, start, end):
+    """
+    Exports [start, end) to `path` and removes the period's other files
+    (the hourly files of a completed day). Skipped when the table now holds
+    fewer of the period's alerts than the archive, i.e. retention has removed
+    some: the archive keeps what it exported before. Returns the number of rows.
+    """
+    from sqlalchemy import select, func
+    from database_setup import Alert
+    table_files = glob.glob(os.path.join(os.path.dirname(path), 'hour-*.parquet')) + \
+        glob.glob(os.path.join(os.path.dirname(path), 'day.parquet'))
+    exported = [candidate for candidate in table_files
+                if candidate == path or os.path.basename(path) == 'day.parquet']
+    if exported:
+        with engine.connect() as connection:
+            in_table = connection.execute(select(func.count()).select_from(Alert.__table__)
+                                          .where(Alert.timestamp >= start, Alert.timestamp < end)).scalar()
+        if in_table < archived_rows(exported):
+            return 0
+    rows = export_range(engine, path, start, end)
+    if rows:
+        for old_path in exported:
+            if old_path != path:
+                os.remove(old_path)
+    return rows
+
+
+def export_alerts(engine=None, archive_dir=ARCHIVE_DIR, since=None, until=None):
+    """
+    Exports every completed hour of the alerts table from the watermark (or
+    from `since`) up to `until` (default: now less EXPORT_SETTLE_MINUTES),
+    but not past the hour the stream starts. Returns (files, rows).
+    """
+    from sqlalchemy import select, func
+    from database_setup import Alert
+    engine = _engine(engine)
+    os.makedirs(archive_dir, exist_ok=True)
+    until = floor_hour(until or datetime.now() - timedelta(minutes=EXPORT_SETTLE_MINUTES))
+    started = stream_started(archive_dir)
+    if started is not None:
+        until = min(until, floor_hour(started))
+    with engine.connect() as connection:
+        oldest = connection.execute(select(func.min(Alert.timestamp))).scalar()
+    if oldest is None:
+        return 0, 0
+    hour = floor_hour(since) if since is not None else read_watermark(archive_dir) or floor_hour(oldest)
+    files = rows = 0
+    while hour < until:
+        day = hour.replace(hour=0)
+        if day + timedelta(days=1) <= until:  # a completed day: one file, replacing its hourly files
+            period_rows = export_period(engine, day_path(archive_dir, day), day, day + timedelta(days=1))
+            hour = day + timedelta(days=1)
+        else:
+            period_rows = export_period(engine, hour_path(archive_dir, hour), hour, hour + timedelta(hours=1))
+            hour += timedelta(hours=1)
+        files += bool(period_rows)
+        rows += period_rows
+    write_watermark(archive_dir, until)
+    return files, rows
+
+
+# --- Stream ---
+def stream_writer(archive_dir=ARCHIVE_DIR):
+    """An AlertWriter (not yet started) that writes every alert it is given to the archive's incoming/."""
+    from alert_sinks import ParquetSink
+    from alert_writer import AlertWriter
+    return AlertWriter(sink=ParquetSink(os.path.join(archive_dir, INCOMING_DIR), rotate_seconds=STREAM_ROTATE_SECONDS),
+                       spill_path=os.path.join(archive_dir, 'stream_spill.jsonl'))
+
+
+def ingest_stream(archive_dir=ARCHIVE_DIR, incoming=None):
+    """
+    Moves every finished stream file in `incoming` (default: the archive's
+    incoming/) into the date partitions, one file per date it covers, and
+    deletes it. A crash before the delete ingests it again under the same
+    names, so no alert is counted twice. Returns (files, rows).
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    incoming = incoming or os.path.join(archive_dir, INCOMING_DIR)
+    paths = sorted(glob.glob(os.path.join(incoming, 'alerts-*.parquet')))
+    rows = 0
+    for path in paths:
+        table = pq.read_table(path)
+        dates = pc.strftime(table['timestamp'], format='%Y-%m-%d')
+        name = f"stream-{os.path.splitext(os.path.basename(path))[0]}.parquet"
+        for date in pc.unique(dates).drop_null().to_pylist():
+            out = os.path.join(archive_dir, f"date={date}", name)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            pq.write_table(table.filter(pc.equal(dates, date)).sort_by('timestamp'), out + '.part',
+                           compression='zstd', row_group_size=EXPORT_BATCH_ROWS)
+            os.replace(out + '.part', out)
+        rows += table.num_rows
+        os.remove(path)
+    return len(paths), rows
+
+
+def compact_stream_day(day_dir):
+    """
+    Merges a completed day's stream files into stream-day.parquet. The merged
+    file is written as .part, the list of merged files is recorded, then they
+    are deleted and the .part renamed into place; a run cut short after the
+    record is finished by the next one. Returns the number of files merged.
+    """
+    import duckdb
+    final = os.path.join(day_dir, STREAM_DAY_FILE)
+    journal = os.path.join(day_dir, '_compaction.json')
+    if os.path.exists(journal):
+        with open(journal) as f:
+            _finish_compaction(day_dir, json.load(f)['sources'], journal)
+    sources = sorted(glob.glob(os.path.join(day_dir, 'stream-*.parquet')))
+    if not sources or sources == [final]:
+        return 0
+    file_list = ', '.join("'" + path.replace("'", "''") + "'" for path in sources)
+    target = (final + '.part').replace("'", "''")
+    duckdb.connect().execute(f"COPY (SELECT * FROM read_parquet([{file_list}], union_by_name = true) "
+                             f"ORDER BY timestamp) TO '{target}' "
+                             f"(FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE {EXPORT_BATCH_ROWS})")
+    names = [os.path.basename(path) for path in sources]
+    with open(journal + '.tmp', 'w') as f:
+        json.dump({'sources': names}, f)
+    os.replace(journal + '.tmp', journal)
+    _finish_compaction(day_dir, names, journal)
+    return len(sources)
+
+
+def _finish_compaction(day_dir, names, journal):
+    final = os.path.join(day_dir, STREAM_DAY_FILE)
+    for name in names:
+        path = os.path.join(day_dir, name)
+        if name != STREAM_DAY_FILE and os.path.exists(path):
+            os.remove(path)
+    if os.path.exists(final + '.part'):
+        os.replace(final + '.part', final)
+    os.remove(journal)
+
+
+def drop_table_rows_from(archive_dir, started):
+    """
+    Removes table-exported alerts at or after `started` (the stream has every
+    alert from there on): later hour and day files are deleted and the day
+    file of `started`'s day is rewritten without them.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    start_hour = floor_hour(started)
+    for path in glob.glob(os.path.join(archive_dir, 'date=*', 'hour-*.parquet')):
+        day = os.path.basename(os.path.dirname(path))[len('date='):]
+        if datetime.strptime(f"{day} {os.path.basename(path)[5:7]}", '%Y-%m-%d %H') >= start_hour:
+            os.remove(path)
+    for path in glob.glob(os.path.join(archive_dir, 'date=*', 'day.parquet')):
+        day = datetime.strptime(os.path.basename(os.path.dirname(path))[len('date='):], '%Y-%m-%d')
+        if day + timedelta(days=1) <= started:
+            continue
+        table = pq.read_table(path)
+        kept = table.filter(pc.less(table['timestamp'], started))
+        if kept.num_rows == table.num_rows:
+            continue
+        if kept.num_rows:
+            pq.write_table(kept, path + '.part', compression='zstd', row_group_size=EXPORT_BATCH_ROWS)
+            os.replace(path + '.part', path)
+        else:
+            os.remove(path)
+
+
+def export_stream(archive_dir=ARCHIVE_DIR, incoming=None, now=None):
+    """
+    Ingests finished stream files, drops table-exported alerts the stream
+    now covers, then compacts every completed day. Returns (files, rows) ingested.
+    """
+    files, rows = ingest_stream(archive_dir, incoming)
+    started = stream_started(archive_dir)
+    if started is not None:
+        drop_table_rows_from(archive_dir, started)
+    today = f"date={(now or datetime.now()) - timedelta(minutes=EXPORT_SETTLE_MINUTES):%Y-%m-%d}"
+    for day_dir in glob.glob(os.path.join(archive_dir, 'date=*')):
+        if os.path.basename(day_dir) < today:
+            compact_stream_day(day_dir)
+    return files, rows
+
+
+def stream_started(archive_dir=ARCHIVE_DIR):
+    """Timestamp of the first archived stream alert, or None."""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    for day_dir in sorted(glob.glob(os.path.join(archive_dir, 'date=*'))):
+        paths = glob.glob(os.path.join(day_dir, 'stream-*.parquet'))
+        if paths:
+            return min(pc.min(pq.read_table(path, columns=['timestamp'])['timestamp']).as_py() for path in paths)
+    return None
+
+
+def archive_status(archive_dir=ARCHIVE_DIR):
+    """
+    Files, total bytes, first archived date, the table watermark and when the
+    stream starts; `sampled_until` is where the (sampled) table exports end,
+    None without any.
+    """
+    files = sorted(glob.glob(os.path.join(archive_dir, 'date=*', '*.parquet')))
+    started = stream_started(archive_dir)
+    table_files = [path for path in files if not os.path.basename(path).startswith('stream-')]
+    return {'files': len(files), 'bytes': sum(os.path.getsize(path) for path in files),
+            'first_date': os.path.basename(os.path.dirname(files[0]))[len('date='):] if files else None,
+            'exported_until': read_watermark(archive_dir), 'stream_started': started,
+            'sampled_until': (started or read_watermark(archive_dir)) if table_files else None}
+
+
+# --- Queries (DuckDB) ---
+def connect(archive_dir=ARCHIVE_DIR):
+    """
+    An in-memory DuckDB connection with an `alerts` view over the archive.
+    The view lists the files on every query, so new exports show up without
+    reconnecting. Use connection.cursor() per thread.
+    """
+    import duckdb
+    if not archive_status(archive_dir)['files']:
+        raise FileNotFoundError(f"No exported alerts in '{archive_dir}'. Run: python alert_archive.py --export")
+    pattern = os.path.join(archive_dir, 'date=*', '*.parquet').replace("'", "''")
+    connection = duckdb.connect()
+    # union_by_name: files exported before a column was added to alerts read it as NULL
+    connection.execute(f"CREATE VIEW alerts AS SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, "
+                       f"union_by_name = true)")
+    return connection
+
+
+def archive_conditions(attack_types=(), start=None, end=None, src_ip=None, dst_ip=None, anomalies_only=False):
+    """SQL WHERE clause and parameters on the archive for a filters dict (same keys as alert_queries)."""
+    conditions, params = ['true'], []
+    if start is not None:
+        # The date bound lets DuckDB skip whole date partitions; the timestamp bound is exact
+        conditions.append('date >= ? AND timestamp >= ?')
+        params += [f"{start:%Y-%m-%d}", start]
+    if end is not None:
+        conditions.append('date <= ? AND timestamp < ?')
+        params += [f"{end:%Y-%m-%d}", end]
+    if attack_types:
+        conditions.append(f"known_attack_type IN ({', '.join('?' * len(attack_types))})")
+        params += list(attack_types)
+    if src_ip:
+        conditions.append('src_ip = ?')
+        params.append(src_ip)
+    if dst_ip:
+        conditions.append('dst_ip = ?')
+        params.append(dst_ip)
+    if anomalies_only:
+        conditions.append('anomaly_detected')
+    return ' AND '.join(conditions), params
+
+
+def investigate(connection, filters, group_by=(), metric='Alerts', bucket=None, top_k=20):
+    """
+    `metric` per combination of the `group_by` dimensions over the archived
+    alerts matching `filters`, as a DataFrame. Without a time bucket: the
+    top_k groups by the metric. With one ('minute' ... 'week'): the metric
+    per bucket for each of the top_k groups over the whole range.
+    """
+    where, params = archive_conditions(**filters)
+    columns = [DIMENSIONS[name] for name in group_by]
+    value = f'{METRICS[metric]} AS "{metric}"'
+    if bucket is None:
+        select_list = ', '.join([f'{col} AS "{name}"' for col, name in zip(columns, group_by)] + [value])
+        group = f"GROUP BY {', '.join(columns)}" if columns else ''
+        sql = f'SELECT {select_list} FROM alerts WHERE {where} {group} ORDER BY "{metric}" DESC LIMIT {int(top_k)}'
+    else:
+        if bucket not in TIME_BUCKETS:
+            raise ValueError(f"bucket must be one of {TIME_BUCKETS}")
+        time_col = f"date_trunc('{bucket}', timestamp)"
+        select_list = ', '.join([f'{time_col} AS "Time"']
+                                + [f'm.{col} AS "{name}"' for col, name in zip(columns, group_by)] + [value])
+        group = ', '.join([time_col] + [f'm.{col}' for col in columns])
+        if columns:
+            # Rank the groups over the whole range, then bucket only the top_k of them
+            keys = ', '.join(f'{col} AS k{i}' for i, col in enumerate(columns))
+            on = ' AND '.join(f'm.{col} IS NOT DISTINCT FROM top.k{i}' for i, col in enumerate(columns))
+            sql = (f"WITH matching AS (SELECT * FROM alerts WHERE {where}), "
+                   f"top AS (SELECT {keys} FROM matching GROUP BY {', '.join(columns)} "
+                   f"ORDER BY {METRICS[metric]} DESC LIMIT {int(top_k)}) "
+                   f"SELECT {select_list} FROM matching m JOIN top ON {on} GROUP BY {group} ORDER BY 1")
+        else:
+            sql = f'SELECT {select_list} FROM alerts m WHERE {where} GROUP BY {group} ORDER BY 1'
+    return connection.execute(sql, params).df()
+
+
+def archive_attack_types(connection):
+    return [value for (value,) in connection.execute(
+        "SELECT DISTINCT known_attack_type FROM alerts WHERE known_attack_type IS NOT NULL ORDER BY 1").fetchall()]
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export alerts to the Parquet archive.")
+    parser.add_argument('--export', action='store_true',
+                        help="Ingest finished stream files and merge the stream files of completed days")
+    parser.add_argument('--ingest', metavar='DIRECTORY', default=None,
+                        help="Ingest stream files from this directory (e.g. an edge sensor's incoming/)")
+    parser.add_argument('--from-table', action='store_true',
+                        help="Also export the (sampled) alerts table up to where the stream starts")
+    parser.add_argument('--since', type=datetime.fromisoformat, default=None,
+                        help="With --from-table: export again from this date/time (e.g. after late-shipped alerts)")
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR)
+    args = parser.parse_args()
+    if not args.export:
+        parser.error("nothing to do; use --export")
+    try:
+        started = datetime.now()
+        n_files, rows = export_stream(args.archive_dir, args.ingest)
+        print(f"✅ Ingested {rows:,} streamed alerts from {n_files:,} files into '{args.archive_dir}'")
+        if args.from_table:
+            n_files, rows = export_alerts(archive_dir=args.archive_dir, since=args.since)
+            print(f"✅ Exported {rows:,} sampled alerts from the alerts table to {n_files:,} files")
+        status = archive_status(args.archive_dir)
+        print(f"🔹 Archive: {status['files']:,} files, {status['bytes'] / 1e6:,.1f} MB, from {status['first_date']}; "
+              f"stream from {status['stream_started']} ({(datetime.now() - started).total_seconds():.1f}s)")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
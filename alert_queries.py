@@ -0,0 +1,286 @@
+"""
+Alert Log Queries
+=================
+Query layer for the historical alert-log views. Filters (attack types, date
+range, source/destination IP, anomalies only), counts and group-bys run in
+SQL, so the views cover the whole history instead of the newest N rows.
+
+The alerts table only holds a sample of the raw alerts (the first few of each
+incident, then one in every N; see alert_aggregator.py). Rows are paged from
+it, while totals and breakdowns come from the incidents table, which counts
+every alert.
+
+Pages are read newest first with keyset pagination: each page continues from
+the (timestamp, id) of the previous page's last row. The timestamp index
+serves every page, however deep, with no OFFSET scan. Results come back as
+column arrays, not ORM objects, and are cached for QUERY_CACHE_TTL seconds,
+so reruns (the Live page reruns every 2 s) reuse them.
+
+AlertFeed is the incremental variant for the live view. It keeps a bounded
+ring of the newest rows and on each poll reads only rows with a higher id
+than it has seen, so its cost follows the new alerts, not the table size.
+
+    filters = alert_filter_controls('perf_log')
+    render_alert_log('perf_log', filters)
+"""
+
+from collections import deque
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+QUERY_CACHE_TTL = 10  # seconds
+PAGE_SIZE = 100
+COUNT_CAP = 100_000  # counts stop here ("100,000+"), so a wide date range never counts the whole table
+FEED_SIZE = 500
+# Ids are allocated before commit, so concurrent writers (several sensors) can commit a lower id after a higher
+# one has been read; each feed poll re-reads this many ids below the highest seen and skips known ones
+FEED_LOOKBACK_IDS = 2_000
+# Display name -> alerts column
+LOG_COLUMNS = {
+    'Timestamp': 'timestamp',
+    'Source IP': 'src_ip',
+    'Source Port': 'source_port',
+    'Destination IP': 'dst_ip',
+    'Destination Port': 'destination_port',
+    'Protocol': 'protocol',
+    'Attack Type': 'known_attack_type',
+    'RF Score': 'rf_score',
+    'Anomaly MSE': 'ae_mse',
+    'Is Anomaly': 'anomaly_detected',
+}
+
+
+def alert_conditions(attack_types=(), start=None, end=None, src_ip=None, dst_ip=None, anomalies_only=False):
+    """SQLAlchemy WHERE conditions on the alerts table for a filters dict."""
+    from database_setup import Alert
+    table = Alert.__table__
+    conditions = []
+    if attack_types:
+        conditions.append(table.c.known_attack_type.in_(list(attack_types)))
+    if start is not None:
+        conditions.append(table.c.timestamp >= start)
+    if end is not None:
+        conditions.append(table.c.timestamp < end)
+    if src_ip:
+        conditions.append(table.c.src_ip == src_ip)
+    if dst_ip:
+        conditions.append(table.c.dst_ip == dst_ip)
+    if anomalies_only:
+        conditions.append(table.c.anomaly_detected.is_(True))
+    return conditions
+
+
+def incident_conditions(attack_types=(), start=None, end=None, src_ip=None, dst_ip=None, anomalies_only=False):
+    """
+    The same filters on the incidents table. An incident matches if it overlaps
+    the date range, and counts whole (incidents last at most 15 minutes).
+    """
+    from database_setup import Incident
+    table = Incident.__table__
+    conditions = []
+    if attack_types:
+        conditions.append(table.c.known_attack_type.in_(list(attack_types)))
+    if start is not None:
+        conditions.append(table.c.last_seen >= start)
+    if end is not None:
+        conditions.append(table.c.first_seen < end)
+    if src_ip:
+        conditions.append(table.c.src_ip == src_ip)
+    if dst_ip:
+        conditions.append(table.c.dst_ip == dst_ip)
+    if anomalies_only:
+        conditions.append(table.c.anomaly_count > 0)
+    return conditions
+
+
+# --- Cached queries ---
+@st.cache_data(ttl=QUERY_CACHE_TTL, show_spinner=False)
+def fetch_alerts(filters, before=None, limit=PAGE_SIZE, columns=tuple(LOG_COLUMNS.values())):
+    """
+    One page of matching alerts, newest first, as {column: array}, and the
+    cursor for the next (older) page, or None if this is the last one.
+    `before` is the cursor returned with the previous page.
+    """
+    from sqlalchemy import select, or_
+    from database_setup import Alert, engine
+    table = Alert.__table__
+    query = (select(*[table.c[col] for col in columns], table.c.id)
+             .where(*alert_conditions(**filters))
+             .order_by(table.c.timestamp.desc(), table.c.id.desc())
+             .limit(limit + 1))
+    if before is not None:
+        timestamp, alert_id = before
+        # The redundant `<=` bound lets the timestamp index start the scan at the cursor
+        query = query.where(table.c.timestamp <= timestamp, or_(table.c.timestamp < timestamp, table.c.id < alert_id))
+    with engine.connect() as connection:
+        rows = connection.execute(query).all()
+    last = rows[limit - 1] if len(rows) > limit else None
+    cursor = (last[columns.index('timestamp')], last[-1]) if last is not None else None
+    rows = rows[:limit]
+    values = list(zip(*rows)) if rows else [()] * (len(columns) + 1)
+    return {col: np.asarray(column_values) for col, column_values in zip(columns, values)}, cursor
+
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, show_spinner=False)
+def count_alerts(filters, cap=COUNT_CAP):
+    """Number of matching stored (sampled) alerts, counting at most `cap` (None = exact); used for paging."""
+    from sqlalchemy import select, func, literal
+    from database_setup import Alert, engine
+    matching = select(literal(1)).select_from(Alert.__table__).where(*alert_conditions(**filters)).limit(cap)
+    query = select(func.count()).select_from(matching.subquery())
+    with engine.connect() as connection:
+        return connection.execute(query).scalar()
+
+
+def _incident_alerts(table, filters):
+    """Alerts counted by an incident row: all of them, or its anomalies with the anomalies-only filter."""
+    from sqlalchemy import func
+    return func.coalesce(func.sum(table.c.anomaly_count if filters.get('anomalies_only') else table.c.alert_count), 0)
+
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, show_spinner=False)
+def total_alerts(filters):
+    """Number of matching alerts in total, sampled or not, from the incidents table."""
+    from sqlalchemy import select
+    from database_setup import Incident, engine
+    table = Incident.__table__
+    with engine.connect() as connection:
+        return int(connection.execute(select(_incident_alerts(table, filters))
+                                      .where(*incident_conditions(**filters))).scalar())
+
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, show_spinner=False)
+def count_alerts_by(column, filters, limit=None):
+    """Matching alerts in total per value of an incidents `column`, largest first, as a Series."""
+    from sqlalchemy import select
+    from database_setup import Incident, engine
+    table = Incident.__table__
+    count = _incident_alerts(table, filters).label('count')
+    query = (select(table.c[column], count).where(*incident_conditions(**filters))
+             .group_by(table.c[column]).order_by(count.desc()).limit(limit))
+    with engine.connect() as connection:
+        rows = connection.execute(query).all()
+    return pd.Series([n for _, n in rows], index=[value for value, _ in rows], name='count', dtype='int64')
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def known_attack_types():
+    """
+    Distinct attack types, found with a loose index scan: each step jumps to
+    the next type in the (attack type, timestamp) index, so the cost grows
+    with the number of types, not the number of alerts.
+    """
+    from sqlalchemy import text
+    from database_setup import engine
+    query = text(
+        "WITH RECURSIVE types(value) AS ("
+        " SELECT min(known_attack_type) FROM alerts"
+        " UNION ALL"
+        " SELECT (SELECT min(known_attack_type) FROM alerts WHERE known_attack_type > types.value)"
+        " FROM types WHERE types.value IS NOT NULL)"
+        " SELECT value FROM types WHERE value IS NOT NULL")
+    with engine.connect() as connection:
+        return connection.execute(query).scalars().all()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def alert_time_span():
+    """(oldest, newest) alert timestamps, read from the ends of the timestamp index; (None, None) if empty."""
+    from sqlalchemy import select, func
+    from database_setup import Alert, engine
+    # Two statements: SQLite only reads min/max from an index when the query has a single aggregate
+    with engine.connect() as connection:
+        return (connection.execute(select(func.min(Alert.timestamp))).scalar(),
+                connection.execute(select(func.max(Alert.timestamp))).scalar())
+
+
+# --- Incremental feed ---
+class AlertFeed:
+    """The newest `maxlen` alerts, topped up on each poll with only the rows added since the last one."""
+
+    def __init__(self, maxlen=FEED_SIZE, columns=tuple(LOG_COLUMNS.values())):
+        self.columns = columns
+        self.rows = deque(maxlen=maxlen)  # (id, *columns), oldest first
+        self.seen_ids = set()
+        self.last_id = None
+
+    def poll(self):
+        """Appends alerts committed since the last poll (primary-key range scan); returns how many."""
+        from sqlalchemy import select, func
+        from database_setup import Alert, engine
+        table = Alert.__table__
+        with engine.connect() as connection:
+            if self.last_id is None:  # first poll: start from the newest `maxlen` alerts
+                newest = connection.execute(select(func.max(table.c.id))).scalar() or 0
+                self.last_id = max(newest - self.rows.maxlen, 0)
+            # Ids only for the look-back window (primary key alone), full rows only for the unseen ones
+            recent_ids = connection.execute(select(table.c.id).where(table.c.id > self.last_id - FEED_LOOKBACK_IDS))
+            new_ids = sorted(alert_id for alert_id in recent_ids.scalars() if alert_id not in self.seen_ids)
+            new_rows = connection.execute(select(table.c.id, *[table.c[col] for col in self.columns])
+                                          .where(table.c.id.in_(new_ids)).order_by(table.c.id)).all() if new_ids else []
+        self.rows.extend(tuple(row) for row in new_rows)
+        if new_rows:
+            self.last_id = max(self.last_id, new_rows[-1][0])
+            low = self.last_id - FEED_LOOKBACK_IDS
+            self.seen_ids = {alert_id for alert_id in self.seen_ids if alert_id > low}
+            self.seen_ids.update(row[0] for row in new_rows)
+        return len(new_rows)
+
+    def frame(self):
+        """The ring as a DataFrame, newest first."""
+        labels = {col: label for label, col in LOG_COLUMNS.items()}
+        return pd.DataFrame([row[1:] for row in reversed(self.rows)],
+                            columns=[labels.get(col, col) for col in self.columns])
+
+
+# --- Views ---
+def alert_filter_controls(key):
+    """Draws the filter widgets and returns the filters dict for the queries above."""
+    now = datetime.now()
+    oldest, newest = alert_time_span()
+    oldest, newest = (oldest or now).date(), max(newest or now, now).date()
+    type_col, date_col = st.columns(2)
+    attack_types = type_col.multiselect("Attack Type", known_attack_types(), key=f"{key}_types")
+    date_range = date_col.date_input("Date Range", [oldest, newest], key=f"{key}_dates")
+    src_col, dst_col, flag_col = st.columns(3)
+    src_ip = src_col.text_input("Source IP", key=f"{key}_src").strip()
+    dst_ip = dst_col.text_input("Destination IP", key=f"{key}_dst").strip()
+    anomalies_only = flag_col.checkbox("Only anomalies", key=f"{key}_anomalies")
+    filters = {'attack_types': tuple(attack_types), 'src_ip': src_ip or None, 'dst_ip': dst_ip or None,
+               'anomalies_only': anomalies_only}
+    if len(date_range) == 2:
+        filters['start'] = datetime.combine(date_range[0], datetime.min.time())
+        filters['end'] = datetime.combine(date_range[1], datetime.min.time()) + timedelta(days=1)
+    return filters
+
+
+def render_alert_log(key, filters, page_size=PAGE_SIZE):
+    """
+    Shows one page of the stored alerts matching `filters` with Newer/Older
+    controls, and returns the number of matching stored alerts. The caption
+    also gives the total from the incidents. The cursors of the visited
+    pages are kept in the session and reset when the filters change.
+    """
+    signature = repr(sorted(filters.items()))
+    if st.session_state.get(f"{key}_signature") != signature:
+        st.session_state[f"{key}_signature"] = signature
+        st.session_state[f"{key}_cursors"] = [None]  # None = start from the newest alert
+    cursors = st.session_state[f"{key}_cursors"]
+
+    columns, next_cursor = fetch_alerts(filters, cursors[-1], page_size)
+    total = count_alerts(filters)
+    page = pd.DataFrame({label: columns[col] for label, col in LOG_COLUMNS.items()})
+    st.dataframe(page, use_container_width=True)
+
+    newer_col, older_col, caption_col = st.columns([1, 1, 4])
+    newer_col.button("‹ Newer", key=f"{key}_newer", disabled=len(cursors) == 1, on_click=cursors.pop)
+    older_col.button("Older ›", key=f"{key}_older", disabled=next_cursor is None,
+                     on_click=cursors.append, args=(next_cursor,))
+    first = (len(cursors) - 1) * page_size + 1 if len(page) else 0
+    shown = f"{total:,}+" if total == COUNT_CAP else f"{total:,}"
+    caption_col.caption(f"Rows {first:,}–{first + len(page) - 1 if len(page) else 0:,} of {shown} stored alerts "
+                        f"(a per-incident sample) · {total_alerts(filters):,} matching alerts in total")
+    return total
@@ -0,0 +1,315 @@
+"""
+Alert Sinks
+===========
+Where AlertWriter puts each batch of alert rows. A sink has write(rows)
+(one batch of alerts-table rows, see alert_writer.alert_row) and close().
+IncidentAggregator sends incident rows and rollup counts to the same sink
+through write_incidents(rows) and write_rollups(counts), so an edge sensor's
+incidents and counts travel with its alerts.
+
+    database   the DATABASE_URL database: COPY on PostgreSQL, one
+               executemany INSERT elsewhere
+    sqlite     an embedded SQLite file in WAL mode, one transaction per batch
+    jsonl      rotating JSON-lines files
+    parquet    rolling Parquet files, one row group per batch
+
+The sink is chosen per deployment with ALERT_SINK (default: database):
+
+    ALERT_SINK=postgresql://user:pw@central/ids_db
+    ALERT_SINK=sqlite:///alerts_local.db
+    ALERT_SINK=jsonl://alert_files?rotate_mb=64&rotate_minutes=60
+    ALERT_SINK=parquet://alert_files?rotate_rows=1000000
+
+File sinks write to `<name>.part` and rename the file once it is complete,
+so only finished files are shipped. Incident rows and rollup counts go to
+their own JSONL files next to the alerts (incidents-*.jsonl, rollups-*.jsonl).
+An edge sensor can write locally at a high rate and ship its files to the
+central database later. Incidents are upserted there and rollup counts added:
+
+    python alert_sinks.py --ship alert_files
+"""
+
+import os
+import sys
+import glob
+import json
+import shutil
+import socket
+import argparse
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+
+from alert_writer import ALERT_COLUMNS, copy_rows, insert_rows
+
+DEFAULT_FILE_DIR = 'alert_files'
+SHIPPED_DIR = 'shipped'
+SENSOR_ID = os.getenv('IDS_SENSOR_ID', socket.gethostname())  # same as live_pipeline; names the alert files
+
+
+def _json_default(value):
+    return value.isoformat()
+
+
+def parquet_schema():
+    import pyarrow as pa
+    types = {'timestamp': pa.timestamp('us'), 'source_port': pa.int32(), 'destination_port': pa.int32(),
+             'protocol': pa.int16(), 'total_length_fwd_packets': pa.int64(), 'anomaly_detected': pa.bool_(),
+             'rf_score': pa.float32(), 'ae_mse': pa.float32(), 'anomaly_threshold': pa.float32()}
+    return pa.schema([(col, types.get(col, pa.string())) for col in ALERT_COLUMNS])
+
+
+# --- Database sinks ---
+class DatabaseSink:
+    """PostgreSQL: COPY per batch. Any other database: one executemany INSERT per batch."""
+
+    def __init__(self, engine=None):
+        if engine is None:
+            from database_setup import engine
+        self.engine = engine
+        self.write_rows = copy_rows if engine.dialect.name == 'postgresql' else insert_rows
+
+    def write(self, rows):
+        self.write_rows(self.engine, rows)
+
+    def write_incidents(self, rows):
+        from alert_aggregator import upsert_incidents
+        upsert_incidents(self.engine, rows)
+
+    def write_rollups(self, counts):
+        from alert_storage import rollup_rows, upsert_rollups
+        upsert_rollups(self.engine, *rollup_rows(counts))
+
+    def close(self):
+        pass
+
+
+class SQLiteSink(DatabaseSink):
+    """An embedded SQLite file in WAL mode, so readers (the dashboards) never block the batch writes."""
+
+    def __init__(self, path):
+        from sqlalchemy import create_engine
+        from database_setup import Base, Alert, Incident, AlertRollupMinute, AlertRollupHour, enable_sqlite_wal
+        engine = create_engine(f'sqlite:///{path}')
+        enable_sqlite_wal(engine)
+        Base.metadata.create_all(engine, tables=[Alert.__table__, Incident.__table__, AlertRollupMinute.__table__,
+                                                 AlertRollupHour.__table__])
+        super().__init__(engine)
+
+    def close(self):
+        self.engine.dispose()
+
+
+# --- File sinks ---
+class _RotatingFileSink:
+    """
+    Rolls over to a new file after `rotate_bytes` bytes, `rotate_rows` rows or
+    `rotate_seconds` seconds. Incident rows and rollup counts go to JSONL
+    companion sinks in the same directory (prefix 'incidents' and 'rollups').
+    """
+    suffix = None
+
+    def __init__(self, directory=DEFAULT_FILE_DIR, rotate_bytes=None, rotate_rows=None, rotate_seconds=3600,
+                 prefix='alerts'):
+        self.directory = directory
+        self.rotate_bytes = rotate_bytes
+        self.rotate_rows = rotate_rows
+        self.rotate_seconds = rotate_seconds
+        self.prefix = prefix
+        self.path = None
+        self.companions = {}
+        self.companions_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, rows):
+        if self.path is not None and self._full():
+            self._finish()
+        if self.path is None:
+            name = f"{self.prefix}-{SENSOR_ID}-{datetime.now():%Y%m%dT%H%M%S%f}{self.suffix}"
+            self.path = os.path.join(self.directory, name)
+            self.opened = datetime.now()
+            self.rows = 0
+            self._open(self.path + '.part')
+        self._write(rows)
+        self.rows += len(rows)
+
+    def _full(self):
+        return ((self.rotate_rows and self.rows >= self.rotate_rows)
+                or (self.rotate_bytes and self._size() >= self.rotate_bytes)
+                or (self.rotate_seconds and (datetime.now() - self.opened).total_seconds() >= self.rotate_seconds))
+
+    def _finish(self):
+        """Finishes the current file and gives it its final name."""
+        if self.path is None:
+            return
+        self._close()
+        os.replace(self.path + '.part', self.path)
+        self.path = None
+
+    def _companion(self, prefix):
+        with self.companions_lock:
+            if prefix not in self.companions:
+                self.companions[prefix] = JsonlSink(self.directory, rotate_seconds=self.rotate_seconds, prefix=prefix)
+            return self.companions[prefix]
+
+    def write_incidents(self, rows):
+        self._companion('incidents').write(rows)
+
+    def write_rollups(self, counts):
+        from alert_storage import rollup_rows
+        self._companion('rollups').write(rollup_rows(counts)[0])  # minute rows; hours are rebuilt when shipped
+
+    def close(self):
+        """Finishes the current file and the companions' files."""
+        self._finish()
+        with self.companions_lock:
+            for companion in self.companions.values():
+                companion.close()
+
+
+class JsonlSink(_RotatingFileSink):
+    suffix = '.jsonl'
+
+    def __init__(self, directory=DEFAULT_FILE_DIR, rotate_bytes=64 * 1024 * 1024, rotate_rows=None,
+                 rotate_seconds=3600, prefix='alerts'):
+        super().__init__(directory, rotate_bytes, rotate_rows, rotate_seconds, prefix)
+
+    def _open(self, path):
+        self.file = open(path, 'a')
+
+    def _write(self, rows):
+        self.file.write(''.join(json.dumps(row, default=_json_default) + '\n' for row in rows))
+        self.file.flush()
+
+    def _size(self):
+        return self.file.tell()
+
+    def _close(self):
+        self.file.close()
+
+
+class ParquetSink(_RotatingFileSink):
+    """Each batch becomes one row group; the file is readable once it has been closed (renamed)."""
+    suffix = '.parquet'
+
+    def __init__(self, directory=DEFAULT_FILE_DIR, rotate_bytes=None, rotate_rows=1_000_000, rotate_seconds=3600):
+        super().__init__(directory, rotate_bytes, rotate_rows, rotate_seconds)
+        self.schema = parquet_schema()
+
+    def _open(self, path):
+        import pyarrow.parquet as pq
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def _write(self, rows):
+        import pyarrow as pa
+        self.writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+
+    def _size(self):
+        return os.path.getsize(self.path + '.part')
+
+    def _close(self):
+        self.writer.close()
+
+
+def make_sink(spec=None):
+    """A sink from an ALERT_SINK-style spec (default: the ALERT_SINK environment variable, else 'database')."""
+    spec = spec or os.getenv('ALERT_SINK') or 'database'
+    if spec == 'database':
+        return DatabaseSink()
+    url = urlsplit(spec)
+    options = {key: float(values[-1]) for key, values in parse_qs(url.query).items()}
+    if url.scheme in ('jsonl', 'parquet'):
+        directory = (url.netloc + url.path) or DEFAULT_FILE_DIR
+        sink = JsonlSink if url.scheme == 'jsonl' else ParquetSink
+        kwargs = {}
+        if 'rotate_mb' in options:
+            kwargs['rotate_bytes'] = int(options['rotate_mb'] * 1024 * 1024)
+        if 'rotate_rows' in options:
+            kwargs['rotate_rows'] = int(options['rotate_rows'])
+        if 'rotate_minutes' in options:
+            kwargs['rotate_seconds'] = options['rotate_minutes'] * 60
+        return sink(directory, **kwargs)
+    if url.scheme == 'sqlite':
+        return SQLiteSink(spec[len('sqlite:///'):])
+    from sqlalchemy import create_engine
+    return DatabaseSink(create_engine(spec))
+
+
+# --- Shipping ---
+# File prefix -> columns stored as ISO strings in JSONL
+DATETIME_COLUMNS = {'alerts': ('timestamp',), 'incidents': ('first_seen', 'last_seen'), 'rollups': ('bucket',)}
+
+
+def read_alert_file(path, datetime_columns=DATETIME_COLUMNS['alerts']):
+    """Rows of a finished JSONL or Parquet file (alerts by default)."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(path).to_pylist()
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    for row in rows:
+        for col in datetime_columns:
+            if row.get(col) is not None:
+                row[col] = datetime.fromisoformat(row[col])
+    return rows
+
+
+def ship_file(path, sink, prefix):
+    """Writes one finished file to `sink` in a single write; returns its number of rows."""
+    rows = read_alert_file(path, DATETIME_COLUMNS[prefix])
+    if not rows:
+        return 0
+    if prefix == 'alerts':
+        sink.write(rows)
+    elif prefix == 'incidents':
+        sink.write_incidents(rows)
+    else:
+        counts = {}
+        for row in rows:
+            totals = counts.setdefault((row['bucket'], row['known_attack_type'], row['sensor_id'],
+                                        row['destination_port']), [0, 0])
+            totals[0] += row['alert_count']
+            totals[1] += row['anomaly_count']
+        sink.write_rollups(counts)
+    return len(rows)
+
+
+def ship_files(directory=DEFAULT_FILE_DIR, sink=None, delete=False):
+    """
+    Loads every finished alert, incident and rollup file in `directory` into
+    `sink` (default: the DATABASE_URL database), one write (one transaction)
+    per file, then moves the file to `shipped/` or deletes it. Incident files
+    are upserted in the order they were written, so the last row of each
+    incident wins. A crash between the write and the move ships that file
+    again on the next run (rollup counts from it are then added twice).
+    Returns (files, rows).
+    """
+    sink = sink or DatabaseSink()
+    n_files = shipped_rows = 0
+    for prefix in ('alerts', 'incidents', 'rollups'):
+        files = sorted(glob.glob(os.path.join(directory, f'{prefix}-*.jsonl')) +
+                       glob.glob(os.path.join(directory, f'{prefix}-*.parquet')))
+        for path in files:
+            shipped_rows += ship_file(path, sink, prefix)
+            if delete:
+                os.remove(path)
+            else:
+                os.makedirs(os.path.join(directory, SHIPPED_DIR), exist_ok=True)
+                shutil.move(path, os.path.join(directory, SHIPPED_DIR, os.path.basename(path)))
+        n_files += len(files)
+    return n_files, shipped_rows
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ship finished alert files to the central database.")
+    parser.add_argument('--ship', metavar='DIRECTORY', default=DEFAULT_FILE_DIR,
+                        help="Directory of finished .jsonl/.parquet alert, incident and rollup files")
+    parser.add_argument('--delete', action='store_true', help="Delete shipped files instead of moving them")
+    args = parser.parse_args()
+    try:
+        n_files, n_rows = ship_files(args.ship, delete=args.delete)
+        print(f"✅ Shipped {n_rows:,} alert, incident and rollup rows from {n_files:,} files in '{args.ship}'")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,450 @@
+"""
+Alert Storage: Partitions, Retention and Rollups
+================================================
+Keeps the alerts table bounded and the dashboards off it:
+
+    partitions  On PostgreSQL the alerts table can be converted (once) into
+                a table range-partitioned by day on `timestamp`. Existing
+                rows become one legacy partition, and new daily partitions
+                are created a few days ahead. A DEFAULT partition catches
+                anything outside them.
+    retention   Alerts older than ALERT_RETENTION_DAYS are removed. Whole
+                daily partitions are dropped on PostgreSQL, which is instant.
+                Anywhere else the rows are deleted in batches. Minute rollups
+                and closed incidents have their own retention; hourly
+                rollups are kept.
+    rollups     Alert counts per minute and per hour, by attack type, sensor
+                and destination port (ports below 1024 and common service
+                ports individually, all others as OTHER_PORT). They are maintained from the full alert
+                stream by a RollupCounter (raw alerts are only a sample, see
+                alert_aggregator.py) and upserted by adding counts. The
+                charts read them instead of raw alerts.
+
+Run daily (e.g. from cron) to create upcoming partitions and apply retention:
+    python alert_storage.py --retention
+One-off PostgreSQL conversion, and rollups for alerts written before rollups existed:
+    python alert_storage.py --partition --backfill
+"""
+
+import os
+import re
+import sys
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+ALERT_RETENTION_DAYS = int(os.getenv('ALERT_RETENTION_DAYS', 30))
+MINUTE_ROLLUP_RETENTION_DAYS = int(os.getenv('MINUTE_ROLLUP_RETENTION_DAYS', 14))
+INCIDENT_RETENTION_DAYS = int(os.getenv('INCIDENT_RETENTION_DAYS', 90))
+PARTITION_DAYS_AHEAD = 3
+# Rollups keep well-known ports and common service ports individually and count every other port as
+# OTHER_PORT, so a scan adds at most ~1k rows per bucket rather than one per probed port
+WELL_KNOWN_PORTS = 1024
+SERVICE_PORTS = (1433, 1521, 2049, 3306, 3389, 5432, 5900, 5985, 6379, 8000, 8080, 8443, 8888, 9200, 11211, 27017)
+OTHER_PORT = -1
+MINUTE_ROLLUP_MAX_DAYS = 2  # longer chart ranges read the hourly rollup
+MAX_PENDING_ROLLUP_KEYS = 100_000  # minute counts kept for retry while writes fail; the oldest minutes are dropped
+DELETE_BATCH_ROWS = 50_000
+
+
+def _engine(engine):
+    if engine is None:
+        from database_setup import engine
+    return engine
+
+
+def rollup_port(port):
+    port = int(port)
+    return port if port < WELL_KNOWN_PORTS or port in SERVICE_PORTS else OTHER_PORT
+
+
+def port_label(port):
+    """Display value for a rollup port."""
+    return 'other' if port == OTHER_PORT else str(port)
+
+
+# --- Partitions (PostgreSQL) ---
+def is_partitioned(engine=None):
+    from sqlalchemy import text
+    engine = _engine(engine)
+    if engine.dialect.name != 'postgresql':
+        return False
+    with engine.connect() as connection:
+        return bool(connection.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('alerts')")).scalar())
+
+
+def list_partitions(connection):
+    """[(name, lower, upper)] for the alerts partitions; bounds are datetimes, None for MINVALUE/DEFAULT."""
+    from sqlalchemy import text
+    rows = connection.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = 'alerts'::regclass"))
+    partitions = []
+    for name, bound in rows:
+        lower = re.search(r"FROM \('([^']+)'\)", bound)
+        upper = re.search(r"TO \('([^']+)'\)", bound)
+        partitions.append((name, datetime.fromisoformat(lower.group(1)) if lower else None,
+                           datetime.fromisoformat(upper.group(1)) if upper else None))
+    return partitions
+
+
+def partition_alert_table(engine=None):
+    """
+    Converts a plain PostgreSQL alerts table into a daily range-partitioned
+    one. Existing rows (and their indexes) become the partition alerts_legacy,
+    covering everything before the day after the newest alert. Runs in one
+    transaction and holds an exclusive lock on alerts while it does.
+    """
+    from sqlalchemy import text, inspect
+    from database_setup import Alert
+    engine = _engine(engine)
+    if engine.dialect.name != 'postgresql':
+        raise RuntimeError("Partitioning needs PostgreSQL; other databases use batched deletes for retention")
+    if is_partitioned(engine):
+        return False
+    legacy_indexes = [index['name'] for index in inspect(engine).get_indexes('alerts')]
+    with engine.begin() as connection:
+        connection.execute(text('LOCK TABLE alerts IN ACCESS EXCLUSIVE MODE'))
+        newest = connection.execute(text('SELECT max(timestamp) FROM alerts')).scalar()
+        boundary = max(datetime.now(), newest or datetime.min).replace(hour=0, minute=0, second=0, microsecond=0)
+        boundary += timedelta(days=1)
+        connection.execute(text('ALTER TABLE alerts RENAME TO alerts_legacy'))
+        connection.execute(text('ALTER TABLE alerts_legacy RENAME CONSTRAINT alerts_pkey TO alerts_legacy_pkey'))
+        # Index names are schema-wide; renamed legacy indexes are attached to the new parent indexes below
+        for name in legacy_indexes:
+            connection.execute(text(f'ALTER INDEX {name} RENAME TO {name}_legacy'))
+        connection.execute(text('CREATE TABLE alerts (LIKE alerts_legacy INCLUDING DEFAULTS) '
+                                'PARTITION BY RANGE (timestamp)'))
+        connection.execute(text('ALTER SEQUENCE alerts_id_seq OWNED BY alerts.id'))
+        connection.execute(text(f"ALTER TABLE alerts ATTACH PARTITION alerts_legacy "
+                                f"FOR VALUES FROM (MINVALUE) TO ('{boundary:%Y-%m-%d}')"))
+        connection.execute(text('CREATE TABLE alerts_default PARTITION OF alerts DEFAULT'))
+        for index in Alert.__table__.indexes:
+            index.create(connection)
+        # A partitioned table has no primary key on id alone; id lookups (the live alert feed) need this index
+        connection.execute(text('CREATE INDEX ix_alerts_id ON alerts (id)'))
+    ensure_partitions(engine)
+    return True
+
+
+def ensure_partitions(engine=None, days_ahead=PARTITION_DAYS_AHEAD):
+    """
+    Creates the daily partitions from today to `days_ahead` days out, plus any
+    earlier day whose alerts landed in alerts_default because no run created
+    its partition in time; returns the names created. Each day is its own
+    transaction, and rows already in the default partition for that day are
+    moved into the new partition.
+    """
+    engine = _engine(engine)
+    if not is_partitioned(engine):
+        return []
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    with engine.connect() as connection:
+        covered_until = max((upper for _, _, upper in list_partitions(connection) if upper), default=today)
+    # Days between the last partition and today only get one if alerts_default has rows for them
+    day = max(min(covered_until, today), today - timedelta(days=ALERT_RETENTION_DAYS))
+    created = []
+    while day <= today + timedelta(days=days_ahead):
+        if day >= covered_until and _create_partition(engine, day, required=day >= today):
+            created.append(f'alerts_p{day:%Y%m%d}')
+        day += timedelta(days=1)
+    return created
+
+
+def _create_partition(engine, day, required=True):
+    """Creates the partition for `day`, moving that day's rows out of alerts_default first."""
+    from sqlalchemy import text
+    name = f'alerts_p{day:%Y%m%d}'
+    bounds = {'start': day, 'end': day + timedelta(days=1)}
+    values = f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}')"
+    with engine.begin() as connection:
+        if connection.execute(text('SELECT to_regclass(:name)'), {'name': name}).scalar():
+            return False
+        stray = connection.execute(text('SELECT 1 FROM alerts_default WHERE timestamp >= :start '
+                                        'AND timestamp < :end LIMIT 1'), bounds).scalar()
+        if not stray:
+            if required:
+                connection.execute(text(f'CREATE TABLE {name} PARTITION OF alerts {values}'))
+            return required
+        # PostgreSQL refuses a new partition whose range the default partition already holds rows for
+        connection.execute(text('ALTER TABLE alerts DETACH PARTITION alerts_default'))
+        connection.execute(text(f'CREATE TABLE {name} PARTITION OF alerts {values}'))
+        connection.execute(text(f'INSERT INTO {name} SELECT * FROM alerts_default '
+                                f'WHERE timestamp >= :start AND timestamp < :end'), bounds)
+        connection.execute(text('DELETE FROM alerts_default WHERE timestamp >= :start AND timestamp < :end'), bounds)
+        connection.execute(text('ALTER TABLE alerts ATTACH PARTITION alerts_default DEFAULT'))
+    return True
+
+
+# --- Retention ---
+def delete_before(engine, table, column, cutoff, extra=None, batch_rows=DELETE_BATCH_ROWS):
+    """Deletes rows with `column` < `cutoff` in batches, so no single transaction holds long locks."""
+    from sqlalchemy import delete, select, and_
+    condition = column < cutoff if extra is None else and_(column < cutoff, extra)
+    key = list(table.primary_key.columns)
+    deleted = 0
+    while True:
+        with engine.begin() as connection:
+            if len(key) == 1:
+                batch = select(key[0]).where(condition).limit(batch_rows).scalar_subquery()
+                result = connection.execute(delete(table).where(key[0].in_(batch)))
+            else:  # composite keys (rollups): rows are small, delete in one statement
+                result = connection.execute(delete(table).where(condition))
+        deleted += result.rowcount
+        if len(key) != 1 or result.rowcount < batch_rows:
+            return deleted
+
+
+def apply_retention(engine=None, alert_days=ALERT_RETENTION_DAYS, minute_rollup_days=MINUTE_ROLLUP_RETENTION_DAYS,
+                    incident_days=INCIDENT_RETENTION_DAYS):
+    """Removes expired alerts, minute rollups and closed incidents; returns what was removed."""
+    from sqlalchemy import text
+    from database_setup import Alert, AlertRollupMinute, Incident
+    engine = _engine(engine)
+    now = datetime.now()
+    alert_cutoff = now - timedelta(days=alert_days)
+    removed = {}
+    if is_partitioned(engine):
+        dropped = []
+        with engine.begin() as connection:
+            for name, _, upper in list_partitions(connection):
+                if upper is not None and upper <= alert_cutoff:
+                    connection.execute(text(f'DROP TABLE {name}'))
+                    dropped.append(name)
+            stray = connection.execute(text('DELETE FROM alerts_default WHERE timestamp < :cutoff'),
+                                       {'cutoff': alert_cutoff})
+        removed['alert_partitions_dropped'] = dropped
+        removed['alerts_deleted'] = stray.rowcount
+    else:
+        table = Alert.__table__
+        removed['alerts_deleted'] = delete_before(engine, table, table.c.timestamp, alert_cutoff)
+    minutes = AlertRollupMinute.__table__
+    removed['minute_rollups_deleted'] = delete_before(engine, minutes, minutes.c.bucket,
+                                                      now - timedelta(days=minute_rollup_days))
+    incidents = Incident.__table__
+    removed['incidents_deleted'] = delete_before(engine, incidents, incidents.c.last_seen,
+                                                 now - timedelta(days=incident_days), extra=~incidents.c.is_open)
+    return removed
+
+
+# --- Rollups ---
+def upsert_rollups(engine, minute_rows, hour_rows):
+    """
+    Adds each row's counts to its (bucket, attack type, sensor, port) row,
+    inserting it if missing. Both tables are written in one transaction, so a
+    failed write can be retried without double counting.
+    """
+    from database_setup import AlertRollupMinute, AlertRollupHour
+    if engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    with engine.begin() as connection:
+        for table, rows in ((AlertRollupMinute.__table__, minute_rows), (AlertRollupHour.__table__, hour_rows)):
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[col.name for col in table.primary_key.columns],
+                set_={'alert_count': table.c.alert_count + statement.excluded.alert_count,
+                      'anomaly_count': table.c.anomaly_count + statement.excluded.anomaly_count})
+            connection.execute(statement, rows)
+
+
+def rollup_rows(minute_counts):
+    """(minute rows, hour rows) from {(minute, attack type, sensor, port): [alerts, anomalies]}."""
+    hours = {}
+    for (minute, *key), (count, anomalies) in minute_counts.items():
+        totals = hours.setdefault((minute.replace(minute=0), *key), [0, 0])
+        totals[0] += count
+        totals[1] += anomalies
+
+    def rows(counts):
+        return [{'bucket': bucket, 'known_attack_type': attack_type, 'sensor_id': sensor_id,
+                 'destination_port': port, 'alert_count': count, 'anomaly_count': anomalies}
+                for (bucket, attack_type, sensor_id, port), (count, anomalies) in counts.items()]
+    return rows(minute_counts), rows(hours)
+
+
+class RollupCounter:
+    """Counts every alert per minute in memory; flush() adds the counts to the rollup tables (or a sink)."""
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.counters = {'alerts': 0, 'minute_rows_written': 0, 'hour_rows_written': 0, 'write_failures': 0,
+                         'alerts_dropped': 0}
+        self.last_error = None
+
+    def add(self, alert):
+        key = (alert['timestamp'].replace(second=0, microsecond=0), alert['Attack Type'], alert.get('Sensor') or '',
+               rollup_port(alert['Destination Port']))
+        with self.lock:
+            totals = self.counts.get(key)
+            if totals is None:
+                totals = self.counts[key] = [0, 0]
+            totals[0] += 1
+            totals[1] += bool(alert.get('Is Anomaly'))
+            self.counters['alerts'] += 1
+
+    __call__ = add
+
+    def flush(self, engine=None, sink=None):
+        """Adds the counts to the rollup tables, or passes them to sink.write_rollups(); keeps them on failure."""
+        with self.lock:
+            counts, self.counts = self.counts, {}
+        if not counts:
+            return
+        minute_rows, hour_rows = rollup_rows(counts)
+        try:
+            if sink is not None:
+                sink.write_rollups(counts)
+            else:
+                upsert_rollups(_engine(engine), minute_rows, hour_rows)
+            self.counters['minute_rows_written'] += len(minute_rows)
+            self.counters['hour_rows_written'] += len(hour_rows)
+            self.last_error = None
+        except Exception as e:
+            self.counters['write_failures'] += 1
+            self.last_error = e
+            with self.lock:
+                for key, (count, anomalies) in counts.items():
+                    totals = self.counts.setdefault(key, [0, 0])
+                    totals[0] += count
+                    totals[1] += anomalies
+                overflow = len(self.counts) - MAX_PENDING_ROLLUP_KEYS
+                if overflow > 0:
+                    for key in sorted(self.counts)[:overflow]:  # keys start with the minute
+                        self.counters['alerts_dropped'] += self.counts.pop(key)[0]
+
+    def metrics(self):
+        return dict(self.counters, pending_keys=len(self.counts),
+                    last_error=str(self.last_error) if self.last_error else None)
+
+
+def backfill_rollups(engine=None, until=None):
+    """
+    Builds rollups from raw alerts older than `until` (default: the oldest
+    hour already rolled up, or all alerts if there is none), one day at a
+    time. Meant for alerts written before rollups were maintained; running it
+    twice over the same range counts those alerts twice.
+    """
+    from sqlalchemy import select, func, case
+    from database_setup import Alert, AlertRollupHour
+    engine = _engine(engine)
+    alerts = Alert.__table__
+    with engine.connect() as connection:
+        if until is None:
+            # The hourly rollup is never trimmed by retention, so its oldest bucket marks where rollups start
+            until = connection.execute(select(func.min(AlertRollupHour.bucket))).scalar()
+        if until is None:
+            newest = connection.execute(select(func.max(alerts.c.timestamp))).scalar()
+            until = newest + timedelta(seconds=1) if newest else datetime.now()
+        oldest = connection.execute(select(func.min(alerts.c.timestamp)).where(alerts.c.timestamp < until)).scalar()
+    if oldest is None:
+        return 0
+    if engine.dialect.name == 'postgresql':
+        minute = func.date_trunc('minute', alerts.c.timestamp)
+    else:
+        minute = func.strftime('%Y-%m-%d %H:%M:00', alerts.c.timestamp)
+    port = func.coalesce(alerts.c.destination_port, 0)
+    port = case(((port < WELL_KNOWN_PORTS) | port.in_(SERVICE_PORTS), port), else_=OTHER_PORT)
+    sensor = func.coalesce(alerts.c.sensor_id, '')
+    attack_type = func.coalesce(alerts.c.known_attack_type, 'Unknown')
+    query = (select(minute, attack_type, sensor, port, func.count(), func.sum(case((alerts.c.anomaly_detected, 1),
+                                                                                   else_=0)))
+             .group_by(minute, attack_type, sensor, port))
+    day = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+    alerts_counted = 0
+    while day < until:
+        end = min(day + timedelta(days=1), until)
+        with engine.connect() as connection:
+            grouped = connection.execute(query.where(alerts.c.timestamp >= day, alerts.c.timestamp < end)).all()
+        counts = {(pd.Timestamp(bucket).to_pydatetime(), attack, sensor_id, int(dst_port)): [count, int(anomalies or 0)]
+                  for bucket, attack, sensor_id, dst_port, count, anomalies in grouped}
+        if counts:
+            upsert_rollups(engine, *rollup_rows(counts))
+            alerts_counted += sum(count for count, _ in counts.values())
+        day = end
+    return alerts_counted
+
+
+# --- Dashboard queries ---
+def rollup_table(start, end):
+    """The minute rollup for short ranges (still within its retention), the hourly one otherwise."""
+    from database_setup import AlertRollupMinute, AlertRollupHour
+    recent = start >= datetime.now() - timedelta(days=MINUTE_ROLLUP_RETENTION_DAYS)
+    if recent and end - start <= timedelta(days=MINUTE_ROLLUP_MAX_DAYS):
+        return AlertRollupMinute.__table__
+    return AlertRollupHour.__table__
+
+
+def rollup_counts(start, end, by='known_attack_type', attack_type=None, engine=None):
+    """Alert and anomaly totals per `by` value between `start` and `end`, largest first."""
+    from sqlalchemy import select, func
+    table = rollup_table(start, end)
+    query = (select(table.c[by], func.sum(table.c.alert_count).label('alerts'),
+                    func.sum(table.c.anomaly_count).label('anomalies'))
+             .where(table.c.bucket >= start, table.c.bucket < end)
+             .group_by(table.c[by]).order_by(func.sum(table.c.alert_count).desc()))
+    if attack_type is not None:
+        query = query.where(table.c.known_attack_type == attack_type)
+    with _engine(engine).connect() as connection:
+        return pd.DataFrame(connection.execute(query).all(), columns=[by, 'alerts', 'anomalies'])
+
+
+def rollup_series(start, end, attack_type=None, freq=None, engine=None):
+    """Alert counts over time, one column per attack type, resampled to `freq` (default: by range length)."""
+    from sqlalchemy import select, func
+    table = rollup_table(start, end)
+    query = (select(table.c.bucket, table.c.known_attack_type, func.sum(table.c.alert_count))
+             .where(table.c.bucket >= start, table.c.bucket < end)
+             .group_by(table.c.bucket, table.c.known_attack_type))
+    if attack_type is not None:
+        query = query.where(table.c.known_attack_type == attack_type)
+    with _engine(engine).connect() as connection:
+        df = pd.DataFrame(connection.execute(query).all(), columns=['bucket', 'known_attack_type', 'alerts'])
+    if df.empty:
+        return df
+    if freq is None:
+        span = end - start
+        freq = 'min' if span <= timedelta(hours=6) else 'h' if span <= timedelta(days=7) else 'D'
+    series = df.pivot_table(index='bucket', columns='known_attack_type', values='alerts', aggfunc='sum')
+    return series.resample(freq).sum()
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alert partitions, retention and rollups.")
+    parser.add_argument('--partition', action='store_true',
+                        help="Convert the alerts table to daily range partitions (PostgreSQL, one-off)")
+    parser.add_argument('--retention', action='store_true',
+                        help="Create upcoming partitions and remove expired alerts, rollups and incidents")
+    parser.add_argument('--backfill', action='store_true', help="Build rollups from alerts older than the rollups")
+    parser.add_argument('--alert-days', type=int, default=ALERT_RETENTION_DAYS)
+    parser.add_argument('--minute-rollup-days', type=int, default=MINUTE_ROLLUP_RETENTION_DAYS)
+    parser.add_argument('--incident-days', type=int, default=INCIDENT_RETENTION_DAYS)
+    args = parser.parse_args()
+    if not (args.partition or args.retention or args.backfill):
+        parser.error("choose at least one of --partition, --retention, --backfill")
+
+    from database_setup import Base, engine
+    try:
+        Base.metadata.create_all(engine)
+        if args.partition:
+            if partition_alert_table(engine):
+                print("✅ alerts is now partitioned by day (existing rows are in alerts_legacy)")
+            else:
+                print("🔹 alerts is already partitioned")
+        if args.retention:
+            created = ensure_partitions(engine)
+            if created:
+                print(f"✅ Partitions ready: {', '.join(created)}")
+            removed = apply_retention(engine, args.alert_days, args.minute_rollup_days, args.incident_days)
+            print(f"🧹 Retention: {removed}")
+        if args.backfill:
+            print(f"✅ Rolled up {backfill_rollups(engine):,} alerts")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,259 @@
+"""
+Background Alert Writer
+=======================
+Moves alert inserts off the analysis thread. Alerts are put on a bounded
+queue (never blocking the caller) and a writer thread flushes them in
+batches, when `batch_size` alerts are waiting or `flush_interval` seconds
+have passed. Each batch goes to a sink (alert_sinks.py, chosen with
+ALERT_SINK); the default writes to the database:
+
+    PostgreSQL   COPY alerts (...) FROM STDIN, one round-trip per batch
+    others       a single executemany INSERT per batch
+
+Failed flushes are retried with exponential backoff. If the database stays
+unavailable (or the queue is full) alerts are appended to a JSONL spill file,
+which is replayed into the database in batches once a flush succeeds again
+(or when the writer next starts).
+
+An AlertWriter is callable, so it plugs into LivePipeline as its alert_sink:
+
+    writer = AlertWriter().start()
+    pipeline = LivePipeline(assets, threshold, alert_sink=writer)
+    ...
+    writer.stop()  # flushes what is still queued
+"""
+
+import io
+import os
+import csv
+import json
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from queue import Queue, Empty, Full
+
+import numpy as np
+
+SPILL_FILE = 'alert_spill.jsonl'
+ALERT_COLUMNS = ['timestamp', 'source_port', 'destination_port', 'protocol', 'total_length_fwd_packets',
+                 'known_attack_type', 'anomaly_detected', 'src_ip', 'dst_ip', 'flow_id', 'rf_score', 'ae_mse',
+                 'anomaly_threshold', 'sensor_id', 'incident_key', 'alert_uid']
+
+
+def alert_row(alert):
+    """Alerts table row (column -> value) for a live pipeline alert dict."""
+    return {
+        'timestamp': alert['timestamp'],
+        'source_port': int(alert['Source Port']),
+        'destination_port': int(alert['Destination Port']),
+        'protocol': int(alert['Protocol']),
+        'total_length_fwd_packets': 0,
+        'known_attack_type': alert['Attack Type'],
+        'anomaly_detected': bool(alert['Is Anomaly']),
+        'src_ip': alert.get('Source IP'),
+        'dst_ip': alert.get('Destination IP'),
+        'flow_id': alert.get('Flow ID'),
+        'rf_score': alert.get('RF Score'),
+        'ae_mse': alert.get('Anomaly MSE'),
+        'anomaly_threshold': alert.get('Threshold'),
+        'sensor_id': alert.get('Sensor'),
+        'incident_key': alert.get('Incident'),
+        'alert_uid': alert.get('Alert ID'),
+    }
+
+
+# --- Batch inserts ---
+def copy_rows(engine, rows, table='alerts', columns=ALERT_COLUMNS):
+    """PostgreSQL: streams the batch through COPY FROM STDIN as CSV."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if row.get(col) is None else row[col] for col in columns])  # older rows lack new columns
+    buffer.seek(0)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+def insert_rows(engine, rows, table=None):
+    """Any other dialect: one executemany INSERT in a single transaction."""
+    if table is None:
+        from database_setup import Alert
+        table = Alert.__table__
+    with engine.begin() as connection:
+        connection.execute(table.insert(), rows)
+
+
+class AlertWriter:
+    """Queues alerts and writes them to the database in batches from a background thread."""
+
+    def __init__(self, engine=None, batch_size=500, flush_interval=1.0, queue_maxsize=10_000, max_retries=3,
+                 retry_backoff=0.5, spill_path=SPILL_FILE, sink=None):
+        self.engine = engine
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.spill_path = spill_path
+        self.queue = Queue(maxsize=queue_maxsize)
+        self.stop_event = threading.Event()
+        self.spill_lock = threading.Lock()
+        self.thread = None
+        self.counters = {'submitted': 0, 'written': 0, 'batches': 0, 'retries': 0, 'failed_batches': 0,
+                         'spilled': 0, 'recovered': 0}
+        self.batch_sizes = deque(maxlen=1000)
+        self.lags = deque(maxlen=10_000)  # seconds from submit() to committed
+        self.flush_seconds = deque(maxlen=1000)
+        self.last_error = None
+
+    # --- Producer side (analysis thread) ---
+    def submit(self, alert):
+        """Queues one alert without blocking; spills it to disk if the queue is full."""
+        self.counters['submitted'] += 1
+        row = alert_row(alert)
+        try:
+            self.queue.put_nowait((row, time.perf_counter()))
+        except Full:
+            self.spill([row])
+
+    __call__ = submit
+
+    # --- Writer thread ---
+    def start(self):
+        if self.sink is None:
+            from alert_sinks import DatabaseSink, make_sink
+            self.sink = DatabaseSink(self.engine) if self.engine is not None else make_sink()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True, name='alert-writer')
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        """Stops the thread after it has flushed everything still queued, then closes the sink."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        if self.sink is not None:
+            self.sink.close()
+
+    def next_batch(self):
+        """Waits for the first alert, then collects more until the batch is full or the interval ends."""
+        batch = []
+        deadline = time.perf_counter() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or (self.stop_event.is_set() and self.queue.empty()):
+                break
+            try:
+                batch.append(self.queue.get(timeout=min(remaining, 0.1)))
+            except Empty:
+                continue
+        return batch
+
+    def run(self):
+        self.recover_spill()  # alerts left on disk by an earlier run (or a crash mid-replay)
+        while not (self.stop_event.is_set() and self.queue.empty()):
+            batch = self.next_batch()
+            if batch and self.flush([row for row, _ in batch]):
+                committed = time.perf_counter()
+                self.lags.extend(committed - submitted for _, submitted in batch)
+                self.recover_spill()
+
+    def flush(self, rows, spill=True):
+        """Writes one batch, retrying with backoff; spills it to disk if every attempt fails (unless spill=False)."""
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                self.sink.write(rows)
+            except Exception as e:
+                self.last_error = e
+                if attempt < self.max_retries:
+                    self.counters['retries'] += 1
+                    self.stop_event.wait(self.retry_backoff * 2 ** attempt)
+                continue
+            self.flush_seconds.append(time.perf_counter() - started)
+            self.batch_sizes.append(len(rows))
+            self.counters['batches'] += 1
+            self.counters['written'] += len(rows)
+            self.last_error = None
+            return True
+        self.counters['failed_batches'] += 1
+        if spill:
+            self.spill(rows)
+        return False
+
+    # --- Spill file ---
+    def spill(self, rows):
+        with self.spill_lock:
+            with open(self.spill_path, 'a') as f:
+                for row in rows:
+                    f.write(json.dumps(dict(row, timestamp=row['timestamp'].isoformat())) + '\n')
+            self.counters['spilled'] += len(rows)
+
+    def recover_spill(self):
+        """
+        Replays spilled alerts into the database, a batch at a time. The spill file is renamed to
+        `.recovering`, and the byte offset after the last committed batch is kept next to it; the
+        file is deleted only once its last batch commits. A replay cut short by a failed flush or
+        a crash resumes from that offset on the next successful flush or the next start().
+        """
+        recovering = self.spill_path + '.recovering'
+        offset_path = recovering + '.offset'
+        with self.spill_lock:
+            if not os.path.exists(recovering):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, recovering)
+        offset = 0
+        if os.path.exists(offset_path):
+            with open(offset_path) as f:
+                offset = int(f.read().strip() or 0)
+        with open(recovering, 'rb') as f:
+            f.seek(offset)
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    line = f.readline()
+                    if not line:
+                        break
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue  # blank, or cut short by a crash while spilling
+                    row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+                    batch.append(row)
+                if not batch:
+                    break
+                if not self.flush(batch, spill=False):
+                    return  # the rest stays in the .recovering file for the next attempt
+                self.counters['recovered'] += len(batch)
+                with open(offset_path + '.tmp', 'w') as offset_file:
+                    offset_file.write(str(f.tell()))
+                os.replace(offset_path + '.tmp', offset_path)
+        os.remove(recovering)
+        if os.path.exists(offset_path):
+            os.remove(offset_path)
+
+    # --- Metrics ---
+    def metrics(self):
+        """Counters plus queue depth, batch size and lag/flush-time percentiles."""
+        lags = np.asarray(self.lags)
+        flushes = np.asarray(self.flush_seconds)
+        return dict(
+            self.counters,
+            queued=self.queue.qsize(),
+            mean_batch_size=round(float(np.mean(self.batch_sizes)), 1) if self.batch_sizes else None,
+            lag_p50_ms=round(float(np.percentile(lags, 50)) * 1000, 1) if len(lags) else None,
+            lag_p95_ms=round(float(np.percentile(lags, 95)) * 1000, 1) if len(lags) else None,
+            flush_p50_ms=round(float(np.percentile(flushes, 50)) * 1000, 2) if len(flushes) else None,
+            last_error=str(self.last_error) if self.last_error else None,
+        )
@@ -4,10 +4,6 @@ from database_setup import Session, User, InviteCode, InviteRequest, create_aler
 from datetime import datetime
 import streamlit as st
 import uuid
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import os
 
 # Initialize DB tables if not present
 try:
@@ -209,28 +205,15 @@ def deactivate_invite_code(code: str):
 
 
 def send_email(to_email: str, subject: str, body: str):
-    """Send email via SMTP. Configure SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, SENDER_PASSWORD in .env"""
+    """Queue an email for background delivery (notifications.py). Configure SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, SENDER_PASSWORD in .env"""
     try:
-        smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.getenv('SMTP_PORT', '587'))
-        sender_email = os.getenv('SENDER_EMAIL')
-        sender_password = os.getenv('SENDER_PASSWORD')
-
-        if not sender_email or not sender_password:
+        from notifications import get_dispatcher
+        dispatcher = get_dispatcher()
+        if not dispatcher.sender:
             return False, "Email configuration not set in environment"
-
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'html'))
-
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-
-        return True, "Email sent"
+        if not dispatcher.send(to_email, subject, body):
+            return False, "Email queue is full"
+        return True, "Email queued"
     except Exception as e:
         return False, str(e)
 
@@ -269,7 +252,7 @@ def list_invite_requests(status: str = None):
 
 
 def approve_invite_request(request_id: int, approved_by: str):
-    """Approve an invite request, generate code, and send email."""
+    """Approve an invite request, generate code, and queue the email."""
     session = Session()
     try:
         req = session.query(InviteRequest).filter(InviteRequest.id == request_id).first()
@@ -290,7 +273,7 @@ def approve_invite_request(request_id: int, approved_by: str):
         req.invite_code = code
         session.commit()
 
-        # Send email
+        # Queue email; delivery happens in the background
         email_body = f"""
         <html>
             <body>
@@ -307,7 +290,7 @@ def approve_invite_request(request_id: int, approved_by: str):
         ok, msg = send_email(req.email, "Your IDS Invite Code", email_body)
 
         if ok:
-            return True, f"Approved and email sent to {req.email}"
+            return True, f"Approved and email to {req.email} queued"
         else:
             return True, f"Approved but email failed: {msg}"
     except Exception as e:
@@ -318,7 +301,7 @@ def approve_invite_request(request_id: int, approved_by: str):
 
 
 def reject_invite_request(request_id: int, rejection_reason: str = ""):
-    """Reject an invite request and send rejection email."""
+    """Reject an invite request and queue the rejection email."""
     session = Session()
     try:
         req = session.query(InviteRequest).filter(InviteRequest.id == request_id).first()
@@ -331,7 +314,7 @@ def reject_invite_request(request_id: int, rejection_reason: str = ""):
         req.rejection_reason = rejection_reason
         session.commit()
 
-        # Send rejection email
+        # Queue rejection email
         email_body = f"""
         <html>
             <body>
@@ -347,7 +330,7 @@ def reject_invite_request(request_id: int, rejection_reason: str = ""):
         ok, msg = send_email(req.email, "Invite Request Decision", email_body)
 
         if ok:
-            return True, f"Rejected and email sent to {req.email}"
+            return True, f"Rejected and email to {req.email} queued"
         else:
             return True, f"Rejected but email failed: {msg}"
     except Exception as e:
@@ -0,0 +1,285 @@
+"""
+Alert Query Benchmark
+=====================
+Loads a large synthetic alerts table and times the dashboard queries (latest
+N alerts, per attack type, per source IP) with and without the alert
+indexes. Each query's plan is checked with EXPLAIN (PostgreSQL) or EXPLAIN
+QUERY PLAN (SQLite); in the indexed phase, a query that still scans the whole
+table or sorts it is reported as a failure. Finally the history charts (alert
+counts by type, alerts over time, top ports over the whole span) are timed
+from raw alerts and from the rollup tables (alert_storage.py).
+
+The table is created in its own database (default: a SQLite file under
+benchmarks/results/); point --database-url at a scratch PostgreSQL database
+to measure the production setup. Rows are loaded with COPY on PostgreSQL and
+executemany elsewhere, and reused by later runs unless --rebuild is given.
+
+Run from the repository root:
+    python benchmarks/bench_alert_queries.py --rows 1000000
+    python benchmarks/bench_alert_queries.py --rows 50000000 --database-url postgresql://user:pw@localhost/ids_bench
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results', 'alert_queries.json')
+DEFAULT_DATABASE_URL = f"sqlite:///{os.path.join(BENCH_DIR, 'results', 'alerts_bench.db')}"
+ATTACK_TYPES = ['BENIGN', 'DDoS', 'DoS Hulk', 'PortScan', 'DoS slowloris', 'SSH-Patator', 'Bot', 'Infiltration']
+ATTACK_SHARES = [0.30, 0.30, 0.20, 0.12, 0.04, 0.02, 0.015, 0.005]
+SELECT_COLUMNS = ('timestamp, src_ip, source_port, dst_ip, destination_port, protocol, known_attack_type, '
+                  'rf_score, ae_mse, anomaly_detected')
+
+
+# --- Synthetic rows ---
+def synthetic_alerts(n_rows, start, days, rng, n_sources=50_000):
+    """Alert rows in time order; source IPs follow a heavy-tailed distribution, like real scanners."""
+    offsets = np.sort(rng.uniform(0, days * 86400, n_rows))
+    sources = pd.Series(np.minimum(rng.zipf(1.3, n_rows), n_sources) - 1)
+    return pd.DataFrame({
+        'timestamp': pd.Timestamp(start) + pd.to_timedelta(offsets, unit='s'),
+        'source_port': rng.integers(1024, 65535, n_rows),
+        'destination_port': rng.choice([22, 53, 80, 443, 3389, 8080], n_rows),
+        'protocol': rng.choice([6, 17], n_rows, p=[0.8, 0.2]),
+        'total_length_fwd_packets': 0,
+        'known_attack_type': rng.choice(ATTACK_TYPES, n_rows, p=ATTACK_SHARES),
+        'anomaly_detected': rng.random(n_rows) < 0.3,
+        'src_ip': ('10.' + (sources // 65536).astype(str) + '.' + (sources // 256 % 256).astype(str) + '.'
+                   + (sources % 256).astype(str)),
+        'dst_ip': '192.168.1.' + pd.Series(rng.integers(1, 255, n_rows)).astype(str),
+        'flow_id': pd.Series(rng.integers(0, 2 ** 63, n_rows)).map('{:016x}'.format),
+        'rf_score': rng.uniform(0.5, 1.0, n_rows).round(4),
+        'ae_mse': rng.exponential(0.05, n_rows).round(6),
+        'anomaly_threshold': 0.1,
+        'sensor_id': rng.choice(['sensor-1', 'sensor-2', 'sensor-3'], n_rows),
+    })
+
+
+def load_rows(engine, df):
+    """COPY on PostgreSQL, executemany on anything else."""
+    columns = list(df.columns)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if engine.dialect.name == 'postgresql':
+            buffer = io.StringIO()
+            df.to_csv(buffer, header=False, index=False)
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY alerts ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            df = df.assign(timestamp=df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S.%f'))
+            cursor.executemany(f"INSERT INTO alerts ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                               df.itertuples(index=False, name=None))
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def populate(engine, n_rows, days=30, chunk_rows=500_000, seed=42):
+    from sqlalchemy import text
+    rng = np.random.default_rng(seed)
+    start = datetime.now() - timedelta(days=days)
+    started = time.perf_counter()
+    for offset in range(0, n_rows, chunk_rows):
+        chunk = min(chunk_rows, n_rows - offset)
+        chunk_start = start + timedelta(days=days * offset / n_rows)
+        load_rows(engine, synthetic_alerts(chunk, chunk_start, days * chunk / n_rows, rng))
+        print(f"\r🔹 Loaded {offset + chunk:,}/{n_rows:,} rows", end='', flush=True)
+    with engine.begin() as connection:
+        connection.execute(text('ANALYZE alerts' if engine.dialect.name == 'postgresql' else 'ANALYZE'))
+    print(f"\n⏱️  Load: {time.perf_counter() - started:.1f}s")
+
+
+# --- Queries ---
+def dashboard_queries(dialect):
+    ip = 'CAST(:src_ip AS INET)' if dialect == 'postgresql' else ':src_ip'
+    return {
+        'latest_500': f"SELECT {SELECT_COLUMNS} FROM alerts ORDER BY timestamp DESC LIMIT 500",
+        'attack_type_latest_1000': (f"SELECT {SELECT_COLUMNS} FROM alerts WHERE known_attack_type = :attack_type "
+                                    f"ORDER BY timestamp DESC LIMIT 1000"),
+        'rare_attack_type_latest_1000': (f"SELECT {SELECT_COLUMNS} FROM alerts WHERE known_attack_type = :rare_type "
+                                         f"ORDER BY timestamp DESC LIMIT 1000"),
+        'attack_type_last_day_count': ("SELECT count(*) FROM alerts WHERE known_attack_type = :attack_type "
+                                       "AND timestamp >= :since"),
+        'src_ip_latest_500': f"SELECT {SELECT_COLUMNS} FROM alerts WHERE src_ip = {ip} ORDER BY timestamp DESC LIMIT 500",
+    }
+
+
+def query_params(dialect):
+    since = datetime.now() - timedelta(days=1)
+    return {'attack_type': 'DDoS', 'rare_type': 'Infiltration', 'src_ip': '10.0.0.0',
+            'since': since if dialect == 'postgresql' else since.strftime('%Y-%m-%d %H:%M:%S.%f')}
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def explain(connection, dialect, sql, params):
+    """Plan summary: the plan lines, whether an index is used, and whether the table is fully scanned or sorted."""
+    from sqlalchemy import text
+    if dialect == 'postgresql':
+        plan = connection.execute(text('EXPLAIN (FORMAT JSON) ' + sql), params).scalar()[0]['Plan']
+        nodes = list(_plan_nodes(plan))
+        lines = [f"{node['Node Type']}{' using ' + node['Index Name'] if 'Index Name' in node else ''}"
+                 for node in nodes]
+        return {'plan': lines,
+                'uses_index': any('Index Name' in node for node in nodes),
+                'full_scan': any(node['Node Type'] == 'Seq Scan' for node in nodes),
+                'sort': any(node['Node Type'] in ('Sort', 'Incremental Sort') for node in nodes)}
+    lines = [row[-1] for row in connection.execute(text('EXPLAIN QUERY PLAN ' + sql), params)]
+    return {'plan': lines,
+            'uses_index': any('INDEX' in line for line in lines),
+            'full_scan': any(line.startswith('SCAN') and 'INDEX' not in line for line in lines),
+            'sort': any('TEMP B-TREE' in line for line in lines)}
+
+
+def time_call(fn, min_repeats=3, min_seconds=0.5, max_repeats=50):
+    """p50/p95 milliseconds of fn() and the length of its result."""
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_repeats and (len(timings) < min_repeats or time.perf_counter() - started < min_seconds):
+        t0 = time.perf_counter()
+        rows = fn()
+        timings.append(time.perf_counter() - t0)
+    p50, p95 = np.percentile(timings, [50, 95]) * 1000
+    return {'p50_ms': round(float(p50), 3), 'p95_ms': round(float(p95), 3), 'rows': len(rows),
+            'repeats': len(timings)}
+
+
+def time_query(connection, sql, params, **kwargs):
+    from sqlalchemy import text
+    statement = text(sql)
+    return time_call(lambda: connection.execute(statement, params).fetchall(), **kwargs)
+
+
+def run_queries(engine, phase):
+    dialect = engine.dialect.name
+    params = query_params(dialect)
+    results = {}
+    with engine.connect() as connection:
+        for name, sql in dashboard_queries(dialect).items():
+            plan = explain(connection, dialect, sql, params)
+            stats = time_query(connection, sql, params)
+            results[name] = dict(stats, **plan)
+            access = 'FULL SCAN' if plan['full_scan'] else ('index' if plan['uses_index'] else '?')
+            print(f"⏱️  [{phase}] {name:<30} p50 {stats['p50_ms']:10.2f} ms  p95 {stats['p95_ms']:10.2f} ms  "
+                  f"{access}{' + sort' if plan['sort'] else ''}")
+    return results
+
+
+def run_history_queries(engine, days):
+    """The Model Performance history charts over `days` days, from raw alerts and from the rollups."""
+    from sqlalchemy import text
+    from alert_storage import rollup_counts, rollup_series
+    end = datetime.now() + timedelta(minutes=1)
+    start = end - timedelta(days=days + 1)
+    since = start if engine.dialect.name == 'postgresql' else start.strftime('%Y-%m-%d %H:%M:%S.%f')
+    day = "date_trunc('day', timestamp)" if engine.dialect.name == 'postgresql' else 'date(timestamp)'
+    raw = {
+        'counts_by_type': "SELECT known_attack_type, count(*) FROM alerts WHERE timestamp >= :since GROUP BY 1",
+        'daily_series': f"SELECT {day}, known_attack_type, count(*) FROM alerts WHERE timestamp >= :since GROUP BY 1, 2",
+        'top_ports': ("SELECT destination_port, count(*) FROM alerts WHERE timestamp >= :since GROUP BY 1 "
+                      "ORDER BY 2 DESC LIMIT 20"),
+    }
+    rollup = {
+        'counts_by_type': lambda: rollup_counts(start, end, engine=engine),
+        'daily_series': lambda: rollup_series(start, end, freq='D', engine=engine),
+        'top_ports': lambda: rollup_counts(start, end, by='destination_port', engine=engine).head(20),
+    }
+    results = {}
+    with engine.connect() as connection:
+        for name, sql in raw.items():
+            results[name] = {'raw': time_query(connection, sql, {'since': since}, max_repeats=5),
+                             'rollup': time_call(rollup[name])}
+            print(f"⏱️  [history {days}d] {name:<21} raw p50 {results[name]['raw']['p50_ms']:10.2f} ms  "
+                  f"rollup p50 {results[name]['rollup']['p50_ms']:8.2f} ms")
+    return results
+
+
+def set_indexes(engine, present):
+    """Drops or (re)creates the Alert model's indexes; returns the seconds spent."""
+    from database_setup import Alert
+    started = time.perf_counter()
+    for index in Alert.__table__.indexes:
+        if present:
+            index.create(engine, checkfirst=True)
+        else:
+            index.drop(engine, checkfirst=True)
+    return time.perf_counter() - started
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard alert queries on a large table.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=30, help="Time span the alerts cover")
+    parser.add_argument('--database-url', default=DEFAULT_DATABASE_URL,
+                        help="Scratch database for the benchmark table (never the live one)")
+    parser.add_argument('--rebuild', action='store_true', help="Reload the table even if it already has enough rows")
+    parser.add_argument('--skip-unindexed', action='store_true', help="Only time the queries with indexes")
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.join(BENCH_DIR, 'results'), exist_ok=True)
+    os.environ['DATABASE_URL'] = args.database_url  # must be set before database_setup is imported
+    from sqlalchemy import text
+    from database_setup import Base, Alert, AlertRollupMinute, AlertRollupHour, engine, migrate_alert_table
+    from alert_storage import backfill_rollups
+
+    tables = [Alert.__table__, AlertRollupMinute.__table__, AlertRollupHour.__table__]
+    if args.rebuild:
+        Base.metadata.drop_all(engine, tables=tables, checkfirst=True)
+    Base.metadata.create_all(engine, tables=tables)
+    migrate_alert_table(engine)
+    with engine.connect() as connection:
+        existing = connection.execute(text('SELECT count(*) FROM alerts')).scalar()
+    if existing < args.rows:
+        print(f"🔹 Table has {existing:,} rows; loading {args.rows - existing:,} more (indexes dropped while loading)")
+        set_indexes(engine, present=False)
+        populate(engine, args.rows - existing, args.days)
+    else:
+        print(f"🔹 Reusing {existing:,} existing rows")
+
+    results = {'created_at': datetime.now().isoformat(timespec='seconds'), 'dialect': engine.dialect.name,
+               'rows': max(existing, args.rows), 'phases': {}}
+    if not args.skip_unindexed:
+        set_indexes(engine, present=False)
+        results['phases']['unindexed'] = run_queries(engine, 'no index')
+    results['index_build_seconds'] = round(set_indexes(engine, present=True), 2)
+    print(f"⏱️  Index build: {results['index_build_seconds']:.1f}s")
+    with engine.begin() as connection:
+        connection.execute(text('ANALYZE alerts' if engine.dialect.name == 'postgresql' else 'ANALYZE'))
+    results['phases']['indexed'] = run_queries(engine, 'indexed')
+
+    if existing < args.rows:  # rows were added: roll everything up again
+        Base.metadata.drop_all(engine, tables=tables[1:])
+        Base.metadata.create_all(engine, tables=tables[1:])
+    started = time.perf_counter()
+    rolled_up = backfill_rollups(engine)  # a no-op when the reused rows are already rolled up
+    if rolled_up:
+        print(f"⏱️  Rollup backfill: {rolled_up:,} alerts in {time.perf_counter() - started:.1f}s")
+    results['history'] = run_history_queries(engine, args.days)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to '{args.output}'")
+
+    unverified = [name for name, stats in results['phases']['indexed'].items()
+                  if stats['full_scan'] or stats['sort'] or not stats['uses_index']]
+    if unverified:
+        print(f"❌ Not served by an index: {', '.join(unverified)}")
+        sys.exit(1)
+    print("✅ Every dashboard query is served by an index (EXPLAIN verified)")
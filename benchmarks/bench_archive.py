@@ -0,0 +1,96 @@
+"""
+Alert Archive Benchmark
+=======================
+Exports the alerts table built by bench_alert_queries.py to the Parquet
+archive (alert_archive.py) and times investigation questions two ways: with
+DuckDB over the archive, and with the equivalent SQL on the source database.
+
+    top_sources_by_distinct_ports   top 20 source IPs by distinct destination ports, last 30 days
+    top_source_port_pairs           top 20 (source IP, destination port) by anomalous alerts, last 30 days
+    alerts_per_day_by_type          alerts per day and attack type, whole span
+    alerts_total                    alerts over the whole span
+
+Build the table first, then run from the repository root:
+    python benchmarks/bench_alert_queries.py --rows 2000000 --days 180
+    python benchmarks/bench_archive.py
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_alert_queries import DEFAULT_DATABASE_URL, time_call
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.path.join(BENCH_DIR, 'results', 'archive')
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results', 'archive.json')
+
+
+def questions(now):
+    """name -> (investigate() arguments, source-database SQL, SQL parameters)."""
+    month = {'start': now - timedelta(days=30), 'end': now}
+    return {
+        'top_sources_by_distinct_ports': (
+            (month, ('Source IP',), 'Distinct Destination Ports', None, 20),
+            "SELECT src_ip, count(DISTINCT destination_port) AS n FROM alerts WHERE timestamp >= :start "
+            "AND timestamp < :end GROUP BY src_ip ORDER BY n DESC LIMIT 20", month),
+        'top_source_port_pairs': (
+            (dict(month, anomalies_only=True), ('Source IP', 'Destination Port'), 'Alerts', None, 20),
+            "SELECT src_ip, destination_port, count(*) AS n FROM alerts WHERE timestamp >= :start "
+            "AND timestamp < :end AND anomaly_detected GROUP BY src_ip, destination_port ORDER BY n DESC LIMIT 20",
+            month),
+        'alerts_per_day_by_type': (
+            ({}, ('Attack Type',), 'Alerts', 'day', 20),
+            "SELECT date(timestamp), known_attack_type, count(*) FROM alerts "
+            "GROUP BY date(timestamp), known_attack_type ORDER BY 1", {}),
+        'alerts_total': (({}, (), 'Alerts', None, 1), "SELECT count(*) FROM alerts", {}),
+    }
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DuckDB over the Parquet alert archive.")
+    parser.add_argument('--database-url', default=DEFAULT_DATABASE_URL,
+                        help="Database with the benchmark alerts table (see bench_alert_queries.py)")
+    parser.add_argument('--keep-archive', action='store_true', help="Reuse an existing export")
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url  # must be set before database_setup is imported
+    from sqlalchemy import text
+    from database_setup import engine
+    from alert_archive import export_alerts, archive_status, connect, investigate
+
+    results = {'created_at': datetime.now().isoformat(timespec='seconds'), 'dialect': engine.dialect.name}
+    if not (args.keep_archive and os.path.isdir(ARCHIVE_DIR)):
+        shutil.rmtree(ARCHIVE_DIR, ignore_errors=True)
+        started = time.perf_counter()
+        n_files, n_rows = export_alerts(engine, ARCHIVE_DIR, until=datetime.now() + timedelta(hours=1))
+        if not n_rows:
+            print("❌ The alerts table is empty; run benchmarks/bench_alert_queries.py first")
+            sys.exit(1)
+        results['export'] = {'rows': n_rows, 'files': n_files, 'seconds': round(time.perf_counter() - started, 2)}
+        print(f"⏱️  Export: {n_rows:,} alerts to {n_files:,} files in {results['export']['seconds']:.1f}s")
+    status = archive_status(ARCHIVE_DIR)
+    results['archive'] = {'files': status['files'], 'mb': round(status['bytes'] / 1e6, 1)}
+
+    duck = connect(ARCHIVE_DIR)
+    results['questions'] = {}
+    with engine.connect() as connection:
+        for name, (arguments, sql, params) in questions(datetime.now()).items():
+            archive = time_call(lambda: investigate(duck, *arguments))
+            source = time_call(lambda: connection.execute(text(sql), params).fetchall())
+            results['questions'][name] = {'duckdb_archive': archive, f'{engine.dialect.name}_table': source}
+            print(f"⏱️  {name:<32} duckdb {archive['p50_ms']:>9,.1f} ms   {engine.dialect.name} "
+                  f"{source['p50_ms']:>9,.1f} ms")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to '{args.output}'")
@@ -0,0 +1,12 @@
+"""Helpers shared by the benchmark scripts."""
+
+import numpy as np
+
+
+def percentiles_ms(values):
+    """p50/p95/p99 of durations in seconds, in milliseconds, and their count; None without values."""
+    if not len(values):
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+    return {'p50_ms': round(float(p50), 3), 'p95_ms': round(float(p95), 3), 'p99_ms': round(float(p99), 3),
+            'count': len(values)}
@@ -0,0 +1,108 @@
+"""
+Feature Store Benchmark
+=======================
+Feeds synthetic scored batches through FeatureStore.record() as the live
+analyzer does and reports:
+
+    * record() time per batch (p50/p95/p99); shards are written in the background
+    * bytes per stored row on disk (zstd Parquet, float32 features)
+    * load_features() rows/s, as read back for retraining
+
+The features use the columns in model_columns.pkl (78 for CICIDS2017):
+heavy-tailed integer values like packet lengths and durations, with about
+a third of the columns all zero, like the ones the live path can't derive.
+
+Run from the repository root:
+    python benchmarks/bench_feature_store.py --batches 5000 --batch-size 100 --attack-rate 0.1
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_common import percentiles_ms
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(BENCH_DIR, 'results', 'feature_store')
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results', 'feature_store.json')
+
+
+def synthetic_batch(rng, columns, batch_size, attack_rate):
+    """(features frame, scores dict, alert ids) for one analyzer batch."""
+    import pandas as pd
+    values = np.round(rng.lognormal(4, 2, (batch_size, len(columns))))
+    values[:, rng.random(len(columns)) < 0.3] = 0  # features the live path can't derive stay 0
+    is_attack = rng.random(batch_size) < attack_rate
+    scores = {'rf_labels': np.where(is_attack, 'DDoS', 'BENIGN'), 'rf_scores': rng.uniform(0.5, 1, batch_size),
+              'ae_errors': rng.exponential(0.05, batch_size), 'anomalies': is_attack & (rng.random(batch_size) < 0.3)}
+    alert_uids = [os.urandom(16).hex() if attack else None for attack in is_attack]
+    return pd.DataFrame(values.astype(np.float32), columns=columns), scores, alert_uids
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the live feature store.")
+    parser.add_argument('--batches', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=100, help="Flows per analyzer batch (the page's default)")
+    parser.add_argument('--attack-rate', type=float, default=0.1)
+    parser.add_argument('--benign-fraction', type=float, default=0.01)
+    parser.add_argument('--shard-rows', type=int, default=None, help="Rows per shard (default: the store's)")
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    import joblib
+    from feature_store import FeatureStore, SHARD_ROWS, load_features
+    columns = [str(col) for col in joblib.load('model_columns.pkl')]
+    shutil.rmtree(STORE_DIR, ignore_errors=True)
+    store = FeatureStore(columns, directory=STORE_DIR, benign_fraction=args.benign_fraction,
+                         shard_rows=args.shard_rows or SHARD_ROWS, seed=0)
+    rng = np.random.default_rng(42)
+    batches = [synthetic_batch(rng, columns, args.batch_size, args.attack_rate) for _ in range(args.batches)]
+    flow_ids = [f'{i:016x}' for i in range(args.batch_size)]
+
+    record_seconds = []
+    started = time.perf_counter()
+    for features, scores, alert_uids in batches:
+        batch_started = time.perf_counter()
+        store.record(features, scores, alert_uids, flow_ids)
+        record_seconds.append(time.perf_counter() - batch_started)
+    store.flush()  # waits for the last shard
+    total_seconds = time.perf_counter() - started
+    metrics = store.metrics()
+
+    started = time.perf_counter()
+    X, labels, _ = load_features(STORE_DIR, columns=columns)
+    load_seconds = time.perf_counter() - started
+
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config': {'batches': args.batches, 'batch_size': args.batch_size, 'attack_rate': args.attack_rate,
+                   'benign_fraction': args.benign_fraction, 'features': len(columns), 'shard_rows': store.shard_rows},
+        'rows': {'alert': metrics['alert'], 'benign': metrics['benign'], 'shards': metrics['shards_written']},
+        'record_per_batch': percentiles_ms(record_seconds),
+        'total_seconds': round(total_seconds, 3),
+        'bytes_per_row': round(store.bytes_on_disk / max(metrics['rows_written'], 1), 1),
+        'raw_bytes_per_row': len(columns) * 4,
+        'load_rows_per_s': round(len(X) / load_seconds),
+    }
+    print(f"🔹 {metrics['rows_written']:,} rows kept ({metrics['alert']:,} alert, {metrics['benign']:,} benign) "
+          f"from {args.batches * args.batch_size:,} flows, {metrics['shards_written']:,} shards")
+    print(f"⏱️  record() per batch: p50 {results['record_per_batch']['p50_ms']:.3f} ms  "
+          f"p99 {results['record_per_batch']['p99_ms']:.3f} ms  max {max(record_seconds) * 1000:.1f} ms; "
+          f"{total_seconds:.1f}s in total")
+    print(f"💽 {results['bytes_per_row']:,.1f} bytes/row on disk vs {results['raw_bytes_per_row']} raw float32")
+    print(f"⏱️  load_features(): {results['load_rows_per_s']:,} rows/s")
+    shutil.rmtree(STORE_DIR, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to '{args.output}'")
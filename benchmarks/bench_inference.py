@@ -0,0 +1,265 @@
+"""
+Inference Benchmark
+===================
+Measures, for every saved model and the fused live verdict:
+
+    * cold-load time and RSS growth (each model loaded in a fresh process)
+    * p50/p95/p99 latency and rows/s for batch sizes 1 ... 100k
+
+Results are written as JSON and compared against a stored baseline; a model
+and batch size whose p50 latency got slower than the tolerance allows is
+reported as a regression. Runs headless and offline. Input rows come from
+the saved test split, or are synthetic if no split exists.
+
+Run from the repository root:
+    python benchmarks/bench_inference.py
+    python benchmarks/bench_inference.py --models rf fused --batch-sizes 1 1000 --update-baseline
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import multiprocessing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joblib
+from split_store import load_split
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results', 'inference.json')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline_inference.json')
+BATCH_SIZES = [1, 10, 100, 1_000, 10_000, 100_000]
+MODELS = ['scaler', 'rf', 'xgb', 'autoencoder', 'iforest', 'fused']
+
+
+# --- Process memory ---
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux /proc, else peak RSS)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# --- Model loaders (name -> callable returning the loaded object) ---
+def _load_autoencoder():
+    from tensorflow.keras.models import load_model
+    return {'model': load_model('ids_autoencoder_model.keras'), 'threshold': joblib.load('autoencoder_threshold.pkl')}
+
+
+def _load_xgb():
+    from xgb_model_io import load_xgb_model
+    return load_xgb_model()
+
+
+LOADERS = {
+    'scaler': lambda: joblib.load('scaler.pkl'),
+    'rf': lambda: joblib.load('ids_rf_model.pkl'),
+    'xgb': _load_xgb,
+    'autoencoder': _load_autoencoder,
+    'iforest': lambda: joblib.load('ids_iforest_model.pkl'),
+}
+FUSED_PARTS = ['scaler', 'rf', 'autoencoder']
+
+
+def _timed_load(name):
+    """Runs in a fresh process: (seconds, RSS growth in MB) for loading one model."""
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    LOADERS[name]()
+    return time.perf_counter() - started, current_rss_mb() - rss_before
+
+
+def measure_cold_load(name):
+    names = FUSED_PARTS if name == 'fused' else [name]
+    ctx = multiprocessing.get_context('spawn')
+    seconds, rss_mb = 0.0, 0.0
+    with ctx.Pool(1) as pool:
+        for part in names:
+            part_seconds, part_rss = pool.apply(_timed_load, (part,))
+            seconds, rss_mb = seconds + part_seconds, rss_mb + part_rss
+    return {'seconds': round(seconds, 4), 'rss_mb': round(rss_mb, 1)}
+
+
+# --- Input data ---
+def load_inputs(max_rows):
+    """
+    (raw features, scaled features) with `max_rows` rows. Uses the saved test
+    split (raw = inverse-scaled) or, without one, standard-normal rows.
+    """
+    scaler = joblib.load('scaler.pkl')
+    try:
+        X_test, = load_split('X_test')
+        source = 'test split'
+    except FileNotFoundError:
+        X_test = np.random.default_rng(42).standard_normal((1000, scaler.n_features_in_)).astype(np.float32)
+        source = 'synthetic'
+    # Tile the available rows up to the largest batch size
+    idx = np.arange(max_rows) % len(X_test)
+    X_scaled = np.ascontiguousarray(X_test[idx], dtype=np.float32)
+    columns = joblib.load('model_columns.pkl')
+    X_raw = pd.DataFrame(scaler.inverse_transform(X_scaled), columns=columns)
+    print(f"🔹 Benchmark inputs: {max_rows:,} rows x {X_scaled.shape[1]} features ({source})")
+    return X_raw, X_scaled
+
+
+# --- Per-model scoring functions (batch -> result) ---
+def make_scorers(names):
+    from detection import reconstruction_errors, score_features
+    loaded = {name: LOADERS[name]() for name in set(names) | (set(FUSED_PARTS) if 'fused' in names else set())
+              if name != 'fused'}
+    label_encoder = joblib.load('label_encoder.pkl')
+    scorers = {}
+    if 'scaler' in names:
+        scorers['scaler'] = ('raw', loaded['scaler'].transform)
+    if 'rf' in names:
+        scorers['rf'] = ('scaled', loaded['rf'].predict)
+    if 'xgb' in names:
+        scorers['xgb'] = ('scaled', loaded['xgb'].predict_proba)
+    if 'autoencoder' in names:
+        scorers['autoencoder'] = ('scaled', lambda X: reconstruction_errors(loaded['autoencoder']['model'], X))
+    if 'iforest' in names:
+        scorers['iforest'] = ('scaled', loaded['iforest'].decision_function)
+    if 'fused' in names:
+        ae = loaded['autoencoder']
+        scorers['fused'] = ('raw', lambda df: score_features(df, loaded['scaler'], loaded['rf'], label_encoder,
+                                                             ae['model'], ae['threshold']))
+    return scorers
+
+
+def measure_latency(score, X, batch_size, min_repeats=5, min_seconds=1.0, max_repeats=200):
+    """Times `score` on the first `batch_size` rows until both repeat and time minimums are met."""
+    batch = X.iloc[:batch_size] if isinstance(X, pd.DataFrame) else X[:batch_size]
+    score(batch)  # warm-up (lazy init, graph tracing)
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_repeats and (len(timings) < min_repeats or time.perf_counter() - started < min_seconds):
+        t0 = time.perf_counter()
+        score(batch)
+        timings.append(time.perf_counter() - t0)
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {'p50_ms': round(p50 * 1000, 4), 'p95_ms': round(p95 * 1000, 4), 'p99_ms': round(p99 * 1000, 4),
+            'rows_per_s': round(batch_size / p50, 1), 'repeats': len(timings)}
+
+
+# --- Baseline comparison ---
+def compare_to_baseline(results, baseline, tolerance):
+    """Returns (model, batch, baseline p50, current p50) for every slowdown beyond `tolerance`."""
+    regressions = []
+    for model, batches in results['latency'].items():
+        for batch, stats in batches.items():
+            base = baseline.get('latency', {}).get(model, {}).get(batch)
+            if base and stats['p50_ms'] > base['p50_ms'] * (1 + tolerance):
+                regressions.append((model, batch, base['p50_ms'], stats['p50_ms']))
+    return regressions
+
+
+def environment_info():
+    from importlib.metadata import version, PackageNotFoundError
+    info = {'host': socket.gethostname(), 'platform': platform.platform(), 'python': platform.python_version(),
+            'cpu_count': os.cpu_count()}
+    for package in ('numpy', 'scikit-learn', 'xgboost', 'tensorflow'):
+        try:
+            info[package] = version(package)
+        except PackageNotFoundError:
+            pass
+    return info
+
+
+def _artifacts_exist(name):
+    files = {'scaler': ['scaler.pkl'], 'rf': ['ids_rf_model.pkl'], 'iforest': ['ids_iforest_model.pkl'],
+             'autoencoder': ['ids_autoencoder_model.keras', 'autoencoder_threshold.pkl']}
+    if name == 'xgb':
+        return os.path.exists('ids_xgb_model.ubj') or os.path.exists('ids_xgb_model.pkl')
+    return all(os.path.exists(path) for path in files[name])
+
+
+def run_benchmark(models=MODELS, batch_sizes=BATCH_SIZES, cold_load=True):
+    available = [name for name in models if name == 'fused' or _artifacts_exist(name)]
+    if 'fused' in available and not all(_artifacts_exist(part) for part in FUSED_PARTS):
+        available.remove('fused')
+    for name in models:
+        if name not in available:
+            print(f"⚠️  Skipping '{name}': model artifacts not found")
+    missing = [path for path in ('scaler.pkl', 'model_columns.pkl') if not os.path.exists(path)]
+    if not available or missing:
+        raise FileNotFoundError(f"No model artifacts to benchmark in '{os.getcwd()}' "
+                                f"({', '.join(missing) or 'no models'} missing); run from the project root after training")
+
+    results = {'created_at': datetime.now().isoformat(timespec='seconds'), 'environment': environment_info(),
+               'load': {}, 'latency': {}}
+    if cold_load:
+        for name in available:
+            results['load'][name] = measure_cold_load(name)
+            print(f"⏱️  Cold load {name:<12} {results['load'][name]['seconds']:8.3f}s  "
+                  f"+{results['load'][name]['rss_mb']:,.1f} MB RSS")
+
+    X_raw, X_scaled = load_inputs(max(batch_sizes))
+    scorers = make_scorers(available)
+    for name in available:
+        kind, score = scorers[name]
+        X = X_raw if kind == 'raw' else X_scaled
+        results['latency'][name] = {}
+        for batch_size in batch_sizes:
+            stats = measure_latency(score, X, batch_size)
+            results['latency'][name][str(batch_size)] = stats
+            print(f"⏱️  {name:<12} batch {batch_size:>7,}: p50 {stats['p50_ms']:10.3f} ms  "
+                  f"p95 {stats['p95_ms']:10.3f} ms  p99 {stats['p99_ms']:10.3f} ms  {stats['rows_per_s']:>14,.0f} rows/s")
+    results['rss_mb'] = round(current_rss_mb(), 1)
+    return results
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark model inference latency and throughput.")
+    parser.add_argument('--models', nargs='+', choices=MODELS, default=MODELS)
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=BATCH_SIZES)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed p50 slowdown vs. the baseline before flagging a regression (0.25 = 25%%)")
+    parser.add_argument('--update-baseline', action='store_true', help="Save this run as the new baseline")
+    parser.add_argument('--no-cold-load', action='store_true', help="Skip the per-model fresh-process load timing")
+    args = parser.parse_args()
+
+    try:
+        results = run_benchmark(args.models, sorted(args.batch_sizes), cold_load=not args.no_cold_load)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to '{args.output}'")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Baseline updated: '{args.baseline}'")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️  No baseline at '{args.baseline}'; run with --update-baseline to create one")
+        sys.exit(0)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) vs. baseline (tolerance {args.tolerance:.0%}):")
+        for model, batch, base_ms, now_ms in regressions:
+            print(f"    {model:<12} batch {int(batch):>7,}: p50 {base_ms:.3f} ms -> {now_ms:.3f} ms "
+                  f"({now_ms / base_ms - 1:+.0%})")
+        sys.exit(1)
+    print(f"\n✅ No regressions vs. baseline (tolerance {args.tolerance:.0%})")
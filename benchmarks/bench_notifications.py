@@ -0,0 +1,132 @@
+"""
+Notification Benchmark
+======================
+Sends email through the local SMTP stand-in (notifications.LocalSMTPServer),
+which adds `--latency` seconds to every reply to stand in for a remote server,
+and reports:
+
+    inline      the old auth.send_email path: one SMTP session per message,
+                on the caller's thread (without STARTTLS and login, which
+                make a real session several round-trips longer)
+    queued      NotificationDispatcher.send(): time the caller waits, and
+                delivery time and connections used for the whole batch
+    alerts      an alert burst through notify_alert(): cost per alert and
+                how many digest emails it turns into
+
+Run from the repository root:
+    python benchmarks/bench_notifications.py --messages 200 --latency 0.02 --alerts 200000
+"""
+
+import os
+import sys
+import json
+import time
+import smtplib
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_common import percentiles_ms
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results', 'notifications.json')
+SENDER = 'ids@localhost'
+
+
+def send_inline(port, message):
+    """What auth.send_email used to do for every message."""
+    with smtplib.SMTP('127.0.0.1', port) as server:
+        server.ehlo()
+        server.send_message(message)
+
+
+def synthetic_alert(rng):
+    return {'timestamp': datetime.now(), 'Source IP': f"10.{rng.integers(256)}.{rng.integers(256)}.{rng.integers(256)}",
+            'Destination IP': '192.168.1.10', 'Destination Port': int(rng.integers(1, 1024)), 'Attack Type': 'DDoS',
+            'RF Score': float(rng.uniform(0.5, 1)), 'Is Anomaly': bool(rng.random() < 0.3)}
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark inline vs queued email delivery.")
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02, help="Seconds added to every SMTP reply")
+    parser.add_argument('--workers', type=int, default=2, help="Dispatcher worker threads (pooled connections)")
+    parser.add_argument('--alerts', type=int, default=200_000)
+    parser.add_argument('--burst-seconds', type=float, default=10.0, help="Time the alert burst is spread over")
+    parser.add_argument('--digest-seconds', type=float, default=2.0)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    from notifications import LocalSMTPServer, NotificationDispatcher, SMTPPool, build_message
+
+    server = LocalSMTPServer(latency=args.latency).start()
+    results = {'created_at': datetime.now().isoformat(timespec='seconds'),
+               'config': {'messages': args.messages, 'latency_s': args.latency, 'workers': args.workers}}
+
+    # --- Inline: one session per message on the caller's thread ---
+    seconds = []
+    for i in range(args.messages):
+        started = time.perf_counter()
+        send_inline(server.port, build_message(SENDER, f'user{i}@example.com', 'Invite', '<p>code</p>'))
+        seconds.append(time.perf_counter() - started)
+    results['inline'] = dict(percentiles_ms(seconds), total_seconds=round(sum(seconds), 3),
+                             messages_per_s=round(args.messages / sum(seconds), 1))
+
+    # --- Queued: the caller only enqueues; workers deliver over pooled connections ---
+    sessions_before = server.sessions
+    dispatcher = NotificationDispatcher(pool=SMTPPool('127.0.0.1', server.port, SENDER), workers=args.workers,
+                                        rate_per_hour=0, alert_recipients=[]).start()
+    seconds = []
+    started = time.perf_counter()
+    for i in range(args.messages):
+        call_started = time.perf_counter()
+        dispatcher.send(f'user{i}@example.com', 'Invite', '<p>code</p>')
+        seconds.append(time.perf_counter() - call_started)
+    dispatcher.stop(timeout=600)
+    delivered_seconds = time.perf_counter() - started
+    metrics = dispatcher.metrics()
+    results['queued'] = dict(percentiles_ms(seconds), sent=metrics['sent'], delivered_seconds=round(delivered_seconds, 3),
+                             messages_per_s=round(metrics['sent'] / delivered_seconds, 1),
+                             connections=server.sessions - sessions_before)
+
+    # --- Alert burst: digests per recipient, default rate limit ---
+    rng = np.random.default_rng(0)
+    alerts = [synthetic_alert(rng) for _ in range(args.alerts)]
+    messages_before = len(server.messages)
+    dispatcher = NotificationDispatcher(pool=SMTPPool('127.0.0.1', server.port, SENDER), workers=args.workers,
+                                        alert_recipients=['soc@example.com', 'oncall@example.com'],
+                                        digest_seconds=args.digest_seconds).start()
+    seconds = []
+    batch = 100  # alerts per analyzer batch
+    pause = args.burst_seconds / max(args.alerts // batch, 1)
+    for start in range(0, args.alerts, batch):
+        call_started = time.perf_counter()
+        for alert in alerts[start:start + batch]:
+            dispatcher.notify_alert(alert)
+        seconds.append((time.perf_counter() - call_started) / len(alerts[start:start + batch]))
+        time.sleep(pause)
+    dispatcher.stop(timeout=600)
+    metrics = dispatcher.metrics()
+    results['alerts'] = {'alerts': args.alerts, 'per_alert_us_p50': round(float(np.median(seconds)) * 1e6, 2),
+                         'per_alert_us_p99': round(float(np.percentile(seconds, 99)) * 1e6, 2),
+                         'digests': metrics['digests'], 'emails': len(server.messages) - messages_before,
+                         'rate_limited_checks': metrics['rate_limited']}
+    server.stop()
+
+    print(f"⏱️  Inline:  caller waits p50 {results['inline']['p50_ms']:,.1f} ms per message, "
+          f"{results['inline']['messages_per_s']:,.1f} messages/s, {args.messages:,} sessions")
+    print(f"⏱️  Queued:  caller waits p50 {results['queued']['p50_ms']:,.3f} ms, p99 {results['queued']['p99_ms']:,.3f} ms; "
+          f"{results['queued']['sent']:,} delivered at {results['queued']['messages_per_s']:,.1f} messages/s "
+          f"over {results['queued']['connections']} connections")
+    print(f"🔹 Alerts:  {args.alerts:,} alerts -> {results['alerts']['emails']:,} emails "
+          f"({results['alerts']['digests']:,} digests), notify_alert() p50 {results['alerts']['per_alert_us_p50']:.1f} µs")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to '{args.output}'")
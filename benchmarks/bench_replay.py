@@ -0,0 +1,305 @@
+"""
+Live Pipeline Replay Benchmark
+==============================
+Replays a pcap file through the same stages the Live Analysis page runs
+(process_packet -> packet_queue -> analyzer -> models -> alert sink), in
+process and without touching a network interface. It reports:
+
+    * packets/s offered and scored, distinct flows/s, drops
+    * queue depth over time
+    * per-stage latency (featurize, score, sink) per batch
+    * alert latency (packet enqueued -> alert written)
+    * with --feature-store DIR, the feature vectors kept (their cost is part of the sink stage)
+
+Without --pcap, a synthetic labelled capture (generate_pcap.py) is written
+to a temporary pcap first. When the capture has a `.labels.csv` sidecar,
+alerts are also counted per ground-truth label. Pacing is controlled with --rate (packets/s, 0 = as
+fast as possible).
+
+Run from the repository root:
+    python benchmarks/bench_replay.py --packets 20000 --rate 0 --sink stub
+    python benchmarks/bench_replay.py --pcap capture.pcap --rate 5000 --sink sqlite
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_common import percentiles_ms
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results', 'replay.json')
+SQLITE_FILE = os.path.join(BENCH_DIR, 'results', 'replay_alerts.db')
+
+
+# --- Input capture ---
+def write_synthetic_pcap(path, n_packets, seed=42):
+    """The first `n_packets` of generate_pcap's labelled mix (benign sessions plus attacks), with its labels sidecar."""
+    from generate_pcap import build_traffic, write_pcap, flow_labels, labels_path_for
+    packets, flows = build_traffic(scale=max(n_packets / 600_000, 0.01), seed=seed)
+    packets = packets.iloc[np.linspace(0, len(packets) - 1, min(n_packets, len(packets))).astype(int)]
+    write_pcap(path, packets)
+    flow_labels(packets, flows).to_csv(labels_path_for(path), index=False)
+
+
+def read_pcap(path, limit=None):
+    from scapy.all import PcapReader
+    packets = []
+    with PcapReader(path) as reader:
+        for packet in reader:
+            packets.append(packet)
+            if limit and len(packets) >= limit:
+                break
+    return packets
+
+
+# --- Pipeline setup ---
+def load_live_assets():
+    import joblib
+    from tensorflow.keras.models import load_model
+    from feature_schema import load_schema
+    assets = {
+        'scaler': joblib.load('scaler.pkl'),
+        'rf_model': joblib.load('ids_rf_model.pkl'),
+        'label_encoder': joblib.load('label_encoder.pkl'),
+        'autoencoder': load_model('ids_autoencoder_model.keras'),
+        'model_columns': joblib.load('model_columns.pkl'),
+        'feature_schema': load_schema(),
+    }
+    return assets, joblib.load('autoencoder_threshold.pkl')
+
+
+def load_flow_labels(pcap_path):
+    """5-tuple (either direction) -> ground-truth label, from generate_pcap's sidecar; None if there is none."""
+    import pandas as pd
+    from generate_pcap import labels_path_for
+    path = labels_path_for(pcap_path)
+    if not os.path.exists(path):
+        return None
+    labels = {}
+    for row in pd.read_csv(path).itertuples(index=False):
+        labels[(row.src_ip, row.src_port, row.dst_ip, row.dst_port, row.protocol)] = row.label
+        labels[(row.dst_ip, row.dst_port, row.src_ip, row.src_port, row.protocol)] = row.label
+    return labels
+
+
+def alerts_by_label(alerts, packets, flow_labels):
+    """Per ground-truth label: packets replayed and alerts raised."""
+    from live_pipeline import get_flow_key
+    counts = {}
+    for key in map(get_flow_key, packets):
+        label = flow_labels.get(key, 'unlabelled')
+        counts.setdefault(label, {'packets': 0, 'alerts': 0})['packets'] += 1
+    for alert in alerts:
+        key = (alert['Source IP'], alert['Source Port'], alert['Destination IP'], alert['Destination Port'],
+               alert['Protocol'])
+        counts.setdefault(flow_labels.get(key, 'unlabelled'), {'packets': 0, 'alerts': 0})['alerts'] += 1
+    return counts
+
+
+def make_sink(kind):
+    """
+    'stub' discards alerts. 'sqlite' writes each one synchronously with the
+    SQLAlchemy sink, 'writer' batches them through AlertWriter, 'incidents'
+    aggregates them first (IncidentAggregator -> AlertWriter); all go to a
+    local SQLite file.
+    """
+    if kind == 'stub':
+        return lambda alert: None
+    os.makedirs(os.path.dirname(SQLITE_FILE), exist_ok=True)
+    if os.path.exists(SQLITE_FILE):
+        os.remove(SQLITE_FILE)
+    os.environ['DATABASE_URL'] = f"sqlite:///{SQLITE_FILE}"  # must be set before database_setup is imported
+    from database_setup import Base, engine
+    Base.metadata.create_all(engine)
+    if kind in ('writer', 'incidents'):
+        from alert_writer import AlertWriter
+        writer = AlertWriter(engine, spill_path=os.path.join(BENCH_DIR, 'results', 'replay_spill.jsonl')).start()
+        if kind == 'writer':
+            return writer
+        from alert_aggregator import IncidentAggregator
+        return IncidentAggregator(raw_sink=writer, engine=engine).start()
+    from live_pipeline import database_alert_sink
+    return database_alert_sink
+
+
+# --- Replay ---
+def replay(pipeline, packets, rate):
+    """Feeds packets to pipeline.process_packet, paced to `rate` packets/s (0 = unpaced)."""
+    started = time.perf_counter()
+    for i, packet in enumerate(packets):
+        if rate:
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        pipeline.process_packet(packet)
+    return time.perf_counter() - started
+
+
+def run_replay(packets, rate=0, sink='stub', batch_size=None, interval=None, queue_size=100_000,
+               drain_timeout=60.0, sample_every=0.1, threshold=None, flow_labels=None, feature_dir=None):
+    from live_pipeline import LivePipeline, get_flow_key, DEFAULT_BATCH_SIZE, DEFAULT_INTERVAL
+    alert_sink = make_sink(sink)
+    assets, saved_threshold = load_live_assets()
+    threshold = saved_threshold if threshold is None else threshold
+    pipeline = LivePipeline(assets, threshold, alert_sink=alert_sink,
+                            batch_size=batch_size or DEFAULT_BATCH_SIZE,
+                            interval=DEFAULT_INTERVAL if interval is None else interval,
+                            queue_maxsize=queue_size)
+
+    # Warm up the models so the first batch doesn't pay for graph tracing (alerts discarded)
+    pipeline.alert_sink = lambda alert: None
+    pipeline.analyze_batch([((f'10.0.0.{i}', 1, '10.0.0.2', 80, 6), 60, time.perf_counter()) for i in range(2)])
+    pipeline.alert_sink = alert_sink
+    if feature_dir:
+        from feature_store import FeatureStore
+        pipeline.feature_store = FeatureStore(assets['model_columns'], directory=feature_dir)
+    pipeline.poll_alerts()
+    pipeline.stats.update({'flows': 0, 'alerts': 0})
+    pipeline.reset_metrics()
+
+    depth_samples = []
+    monitor_stop = threading.Event()
+
+    def monitor():
+        while not monitor_stop.wait(sample_every):
+            depth_samples.append((round(time.perf_counter() - started, 3), pipeline.packet_queue.qsize()))
+
+    started = time.perf_counter()
+    pipeline.started_at = started
+    pipeline.start()
+    threading.Thread(target=monitor, daemon=True).start()
+
+    replay_seconds = replay(pipeline, packets, rate)
+    drain_deadline = time.perf_counter() + drain_timeout
+    while not pipeline.packet_queue.empty() and time.perf_counter() < drain_deadline:
+        time.sleep(0.05)
+    undrained = pipeline.packet_queue.qsize()
+    pipeline.stop()  # waits for the analyzer's last batch
+    if hasattr(alert_sink, 'stop'):
+        alert_sink.stop()  # the batch writer's flush of queued alerts counts towards the total time
+    total_seconds = time.perf_counter() - started
+    monitor_stop.set()
+
+    distinct_flows = len({key for key in map(get_flow_key, packets) if key is not None})
+    scored = pipeline.stats['flows']
+    per_packet = {stage: [seconds / batch for seconds, batch in zip(values, pipeline.batch_sizes)]
+                  for stage, values in pipeline.stage_seconds.items()}
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config': {'packets': len(packets), 'rate': rate, 'sink': sink, 'batch_size': pipeline.batch_size,
+                   'interval': pipeline.interval, 'queue_size': queue_size, 'threshold': float(threshold)},
+        'seconds': {'replay': round(replay_seconds, 3), 'total': round(total_seconds, 3)},
+        'packets': {'offered': pipeline.stats['packets'], 'ignored': pipeline.stats['ignored'],
+                    'dropped': pipeline.stats['dropped'], 'scored': scored, 'left_in_queue': undrained},
+        'throughput': {'offered_pps': round(len(packets) / replay_seconds, 1),
+                       'scored_pps': round(scored / total_seconds, 1),
+                       'distinct_flows': distinct_flows,
+                       'flows_per_s': round(distinct_flows * scored / max(len(packets), 1) / total_seconds, 1)},
+        'alerts': {'count': pipeline.stats['alerts'], 'latency': percentiles_ms(pipeline.alert_latencies)},
+        'stage_latency_per_batch': {stage: percentiles_ms(values) for stage, values in pipeline.stage_seconds.items()},
+        'stage_latency_per_packet': {stage: percentiles_ms(values) for stage, values in per_packet.items()},
+        'queue_depth': {'max': max((depth for _, depth in depth_samples), default=0), 'samples': depth_samples},
+        'errors': pipeline.stats['errors'],
+    }
+    if hasattr(alert_sink, 'raw_sink'):
+        results['incidents'] = alert_sink.metrics()
+        results['alert_writer'] = alert_sink.raw_sink.metrics()
+    elif hasattr(alert_sink, 'metrics'):
+        results['alert_writer'] = alert_sink.metrics()
+    if pipeline.feature_store is not None:
+        results['feature_store'] = pipeline.feature_store.metrics()
+    if flow_labels:
+        results['alerts']['by_label'] = alerts_by_label(pipeline.poll_alerts(), packets, flow_labels)
+    return results
+
+
+def print_report(results):
+    print("\n" + "=" * 60)
+    print("⏱️  Replay report")
+    print("=" * 60)
+    pk, tp = results['packets'], results['throughput']
+    print(f"  Packets offered {pk['offered']:,}, scored {pk['scored']:,}, dropped {pk['dropped']:,}, "
+          f"left in queue {pk['left_in_queue']:,}")
+    print(f"  Offered {tp['offered_pps']:,.0f} pkt/s, scored {tp['scored_pps']:,.0f} pkt/s, "
+          f"{tp['flows_per_s']:,.0f} flows/s ({tp['distinct_flows']:,} distinct flows)")
+    print(f"  Max queue depth {results['queue_depth']['max']:,}")
+    for stage, stats in results['stage_latency_per_batch'].items():
+        if stats:
+            print(f"  {stage:<10} per batch p50 {stats['p50_ms']:9.3f} ms  p95 {stats['p95_ms']:9.3f} ms  "
+                  f"p99 {stats['p99_ms']:9.3f} ms")
+    latency = results['alerts']['latency']
+    if latency:
+        print(f"  Alerts {results['alerts']['count']:,}, latency p50 {latency['p50_ms']:,.1f} ms  "
+              f"p95 {latency['p95_ms']:,.1f} ms  p99 {latency['p99_ms']:,.1f} ms")
+    for label, counts in results['alerts'].get('by_label', {}).items():
+        print(f"    {label:<16} {counts['alerts']:>8,} alerts / {counts['packets']:>8,} packets")
+    writer = results.get('alert_writer')
+    if writer:
+        print(f"  Alert writer: {writer['written']:,} written in {writer['batches']:,} batches "
+              f"(mean {writer['mean_batch_size']}), lag p50 {writer['lag_p50_ms']} ms  p95 {writer['lag_p95_ms']} ms, "
+              f"spilled {writer['spilled']:,}")
+    incidents = results.get('incidents')
+    if incidents:
+        print(f"  Incidents: {incidents['incidents_opened']:,} from {incidents['alerts']:,} alerts, "
+              f"{incidents['raw_forwarded']:,} raw alerts kept, {incidents['incident_writes']:,} incident upserts "
+              f"({incidents['write_reduction']}x fewer rows written)")
+    features = results.get('feature_store')
+    if features:
+        print(f"  Feature store: {features['alert']:,} alert + {features['benign']:,} benign vectors, "
+              f"{features['shards_written']:,} shards, {features['mb_on_disk']:,.1f} MB")
+    if results['errors']:
+        print(f"  ⚠️  {results['errors']} analysis error(s)")
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a pcap through the live detection pipeline.")
+    parser.add_argument('--pcap', default=None, help="Capture to replay (default: a synthetic one)")
+    parser.add_argument('--packets', type=int, default=20_000, help="Synthetic packets, or max packets read")
+    parser.add_argument('--rate', type=float, default=0, help="Packets/s to offer (0 = as fast as possible)")
+    parser.add_argument('--sink', choices=['stub', 'sqlite', 'writer', 'incidents'], default='stub')
+    parser.add_argument('--batch-size', type=int, default=None, help="Analyzer batch size (default: the page's)")
+    parser.add_argument('--interval', type=float, default=None,
+                        help="Seconds between analysis passes (default: the page's; 0 = continuous)")
+    parser.add_argument('--queue-size', type=int, default=100_000, help="Packet queue bound (drops beyond it)")
+    parser.add_argument('--drain-timeout', type=float, default=60.0)
+    parser.add_argument('--threshold', type=float, default=None,
+                        help="Override the anomaly threshold (e.g. 0 makes every packet an alert, to load the sink)")
+    parser.add_argument('--feature-store', default=None, metavar='DIR',
+                        help="Keep the feature vectors of alerts and sampled benign flows here (feature_store.py)")
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    if args.pcap:
+        pcap_path = args.pcap
+    else:
+        pcap_path = os.path.join(tempfile.mkdtemp(), 'synthetic.pcap')
+        print(f"🔹 Writing {args.packets:,} synthetic packets to '{pcap_path}'...")
+        write_synthetic_pcap(pcap_path, args.packets)
+
+    started = time.perf_counter()
+    packets = read_pcap(pcap_path, limit=args.packets if args.pcap else None)
+    print(f"🔹 Loaded {len(packets):,} packets in {time.perf_counter() - started:.1f}s")
+
+    results = run_replay(packets, rate=args.rate, sink=args.sink, batch_size=args.batch_size,
+                         interval=args.interval, queue_size=args.queue_size, drain_timeout=args.drain_timeout,
+                         threshold=args.threshold, flow_labels=load_flow_labels(pcap_path),
+                         feature_dir=args.feature_store)
+    results['config']['pcap'] = args.pcap or 'synthetic'
+    print_report(results)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to '{args.output}'")
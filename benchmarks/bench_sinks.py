@@ -0,0 +1,163 @@
+"""
+Alert Sink Benchmark
+====================
+Writes the same synthetic alerts through each alert sink (alert_sinks.py)
+and reports rows/s:
+
+    direct   sink.write() in batches of --batch-size
+    writer   end to end through AlertWriter (queue, writer thread, batching)
+
+Sinks: SQLite in WAL mode and, for comparison, with the default rollback
+journal; rotating JSONL; rolling Parquet; PostgreSQL when --database-url is
+given (a scratch database: the alerts table there is appended to). The JSONL
+and Parquet outputs are then shipped into a fresh SQLite database to time the
+edge-to-central path.
+
+Run from the repository root:
+    python benchmarks/bench_sinks.py --rows 200000
+    python benchmarks/bench_sinks.py --rows 1000000 --database-url postgresql://user:pw@localhost/ids_bench
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = os.path.join(BENCH_DIR, 'results', 'sinks')
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results', 'sinks.json')
+# alerts-table column -> live pipeline alert key
+ALERT_KEYS = {'timestamp': 'timestamp', 'source_port': 'Source Port', 'destination_port': 'Destination Port',
+              'protocol': 'Protocol', 'known_attack_type': 'Attack Type', 'anomaly_detected': 'Is Anomaly',
+              'src_ip': 'Source IP', 'dst_ip': 'Destination IP', 'flow_id': 'Flow ID', 'rf_score': 'RF Score',
+              'ae_mse': 'Anomaly MSE', 'anomaly_threshold': 'Threshold', 'sensor_id': 'Sensor'}
+
+
+def synthetic_pipeline_alerts(n_rows, seed=42):
+    """Alerts as the live pipeline emits them (the AlertWriter's input)."""
+    from bench_alert_queries import synthetic_alerts
+    df = synthetic_alerts(n_rows, datetime.now() - timedelta(hours=1), 1 / 24, np.random.default_rng(seed))
+    return df[list(ALERT_KEYS)].rename(columns=ALERT_KEYS).to_dict('records')
+
+
+def make_sinks(database_url=None):
+    """name -> factory for a fresh sink writing under WORK_DIR."""
+    from sqlalchemy import create_engine
+    from database_setup import Base, Alert
+    from alert_sinks import DatabaseSink, SQLiteSink, JsonlSink, ParquetSink
+
+    def sqlite_rollback():
+        engine = create_engine(f"sqlite:///{os.path.join(WORK_DIR, 'rollback.db')}")
+        Base.metadata.create_all(engine, tables=[Alert.__table__])
+        return DatabaseSink(engine)
+
+    def postgresql():
+        engine = create_engine(database_url)
+        Base.metadata.create_all(engine, tables=[Alert.__table__])
+        return DatabaseSink(engine)
+
+    sinks = {
+        'sqlite_wal': lambda: SQLiteSink(os.path.join(WORK_DIR, 'wal.db')),
+        'sqlite_rollback_journal': sqlite_rollback,
+        'jsonl': lambda: JsonlSink(os.path.join(WORK_DIR, 'jsonl')),
+        'parquet': lambda: ParquetSink(os.path.join(WORK_DIR, 'parquet')),
+    }
+    if database_url:
+        sinks['postgresql'] = postgresql
+    return sinks
+
+
+def reset_work_dir():
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+    os.makedirs(WORK_DIR)
+
+
+def output_bytes():
+    total = 0
+    for root, _, files in os.walk(WORK_DIR):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def run_direct(make, rows, batch_size):
+    sink = make()
+    started = time.perf_counter()
+    for start in range(0, len(rows), batch_size):
+        sink.write(rows[start:start + batch_size])
+    sink.close()
+    seconds = time.perf_counter() - started
+    return {'seconds': round(seconds, 3), 'rows_per_s': round(len(rows) / seconds)}
+
+
+def run_writer(make, alerts, batch_size):
+    from alert_writer import AlertWriter
+    writer = AlertWriter(sink=make(), batch_size=batch_size, flush_interval=0.05, queue_maxsize=len(alerts) + 1,
+                         spill_path=os.path.join(WORK_DIR, 'spill.jsonl')).start()
+    started = time.perf_counter()
+    for alert in alerts:
+        writer.submit(alert)
+    writer.stop(timeout=3600)
+    seconds = time.perf_counter() - started
+    metrics = writer.metrics()
+    return {'seconds': round(seconds, 3), 'rows_per_s': round(len(alerts) / seconds), 'written': metrics['written'],
+            'spilled': metrics['spilled'], 'flush_p50_ms': metrics['flush_p50_ms']}
+
+
+def run_ship(directory):
+    """Ships a directory of finished files into a fresh SQLite (WAL) database."""
+    from alert_sinks import SQLiteSink, ship_files
+    path = os.path.join(WORK_DIR, 'central.db')
+    if os.path.exists(path):
+        os.remove(path)
+    sink = SQLiteSink(path)
+    started = time.perf_counter()
+    n_files, n_rows = ship_files(directory, sink, delete=True)
+    seconds = time.perf_counter() - started
+    sink.close()
+    return {'files': n_files, 'rows': n_rows, 'seconds': round(seconds, 3), 'rows_per_s': round(n_rows / seconds)}
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark each alert sink.")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--batch-size', type=int, default=500, help="Rows per sink write (the AlertWriter default)")
+    parser.add_argument('--database-url', default=None, help="Scratch PostgreSQL database to include")
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    reset_work_dir()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'default.db')}"  # before database_setup
+    from alert_writer import alert_row
+
+    alerts = synthetic_pipeline_alerts(args.rows)
+    rows = [alert_row(alert) for alert in alerts]
+    print(f"🔹 {args.rows:,} alerts, batches of {args.batch_size:,}")
+
+    results = {'created_at': datetime.now().isoformat(timespec='seconds'), 'rows': args.rows,
+               'batch_size': args.batch_size, 'sinks': {}, 'ship': {}}
+    for name, make in make_sinks(args.database_url).items():
+        reset_work_dir()
+        direct = run_direct(make, rows, args.batch_size)
+        direct['output_mb'] = round(output_bytes() / 1e6, 1)
+        reset_work_dir()
+        writer = run_writer(make, alerts, args.batch_size)
+        results['sinks'][name] = {'direct': direct, 'writer': writer}
+        print(f"⏱️  {name:<24} direct {direct['rows_per_s']:>10,} rows/s  writer {writer['rows_per_s']:>10,} rows/s  "
+              f"({direct['output_mb']:,.1f} MB)")
+        if name in ('jsonl', 'parquet'):
+            results['ship'][name] = run_ship(os.path.join(WORK_DIR, name))
+            print(f"⏱️  {'  ship ' + name + ' -> sqlite':<24} {results['ship'][name]['rows_per_s']:>17,} rows/s")
+    reset_work_dir()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to '{args.output}'")
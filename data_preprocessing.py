@@ -1,29 +1,156 @@
 import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.model_selection import train_test_split
 import joblib
 import numpy as np
+from split_store import save_split, SPLIT_DIR
+from feature_schema import find_redundant_columns, unpruned_schema, save_schema, print_schema_summary, SCHEMA_FILE
+
+try:
+    import resource  # Unix only; used for peak-RSS reporting
+except ImportError:
+    resource = None
 
 # --- 1. Load and Combine Data ---
 DATA_DIR = "MachineLearningCSV/MachineLearningCVE"
 
+# Non-numeric columns that may appear in the CICIDS2017 CSV variants
+TEXT_COLUMNS = {'Label', 'Flow ID', 'Timestamp', 'Source IP', 'Destination IP'}
+
+
+def report_stage(stage, started_at):
+    """Prints wall-clock time for a stage and the process peak RSS so far."""
+    elapsed = time.perf_counter() - started_at
+    if resource is not None:
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes on Linux
+        peak_mb = peak_kb / (1024 * 1024) if sys.platform == 'darwin' else peak_kb / 1024
+        print(f"⏱️  {stage}: {elapsed:.1f}s (peak RSS {peak_mb:,.0f} MB)")
+    else:
+        print(f"⏱️  {stage}: {elapsed:.1f}s")
+
+
+def read_clean_csv(file_path):
+    """
+    Parses one CSV with explicit float32 feature dtypes and drops inf/NaN rows
+    before the frame is handed back for concatenation.
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    dtypes = {col: ('category' if col.strip() in TEXT_COLUMNS else 'float32') for col in header}
+    try:
+        df = pd.read_csv(file_path, dtype=dtypes, engine='pyarrow')
+    except ImportError:
+        df = pd.read_csv(file_path, dtype=dtypes)
+    df.columns = df.columns.str.strip()
+
+    feature_cols = [col for col in df.columns if col not in TEXT_COLUMNS]
+    keep = np.isfinite(df[feature_cols].to_numpy()).all(axis=1)
+    if 'Label' in df.columns:
+        keep &= df['Label'].notna().to_numpy()
+    if not keep.all():
+        df = df[keep].reset_index(drop=True)
+    return df
+
+
+def load_file(file_path, cache_dir=None):
+    """Loads one cleaned CSV, reusing (or writing) its Parquet cache if enabled."""
+    if cache_dir is None:
+        return read_clean_csv(file_path)
+
+    cache_path = os.path.join(cache_dir, os.path.splitext(os.path.basename(file_path))[0] + '.parquet')
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(file_path):
+        print(f"🔹 Using cache: {cache_path}")
+        return pd.read_parquet(cache_path)
+
+    df = read_clean_csv(file_path)
+    df.to_parquet(cache_path, index=False)
+    return df
+
+
+def load_data(data_dir, cache_dir=None, max_workers=None):
+    """
+    Loads all CSV files from a directory into a single DataFrame.
+
+    Files are parsed in parallel and cleaned individually, then concatenated
+    once at the end. If `cache_dir` is given, each cleaned file is also stored
+    as Parquet there and reused on later runs while the CSV is unchanged.
+    """
+    files = sorted(os.path.join(data_dir, file) for file in os.listdir(data_dir) if file.endswith('.csv'))
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
 
-def load_data(data_dir):
-    """Loads all CSV files from a directory into a single DataFrame."""
-    combined_df = pd.DataFrame()
-    for file in os.listdir(data_dir):
-        if file.endswith('.csv'):
-            file_path = os.path.join(data_dir, file)
-            print(f"🔹 Loading: {file}")
-            df = pd.read_csv(file_path, low_memory=False)
-            combined_df = pd.concat([combined_df, df], ignore_index=True)
+    for file_path in files:
+        print(f"🔹 Loading: {os.path.basename(file_path)}")
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(files), os.cpu_count() or 1) or 1) as pool:
+        frames = list(pool.map(lambda path: load_file(path, cache_dir), files))
+
+    combined_df = pd.concat(frames, ignore_index=True)
+    if 'Label' in combined_df.columns:
+        combined_df['Label'] = combined_df['Label'].astype('category')
     return combined_df
 
 
-# --- 2. Preprocess the Dataset ---
-def preprocess_data(df):
-    """Cleans, encodes, and scales the dataset."""
+# --- 2. Collapse duplicate rows ---
+def float_bits(column):
+    """float32 bit pattern of a column, with -0.0 mapped to 0.0 (adding 0 does that)."""
+    return (np.asarray(column, dtype=np.float32) + np.float32(0)).view(np.uint32)
+
+
+def row_hashes(X, y=None):
+    """
+    64-bit hash of every row (and its label), computed column by column over
+    the float32 bit patterns so the work stays vectorised over rows.
+    """
+    hashes = np.full(len(X), 0xcbf29ce484222325, dtype=np.uint64)
+    prime, shift = np.uint64(0x100000001b3), np.uint64(29)
+    columns = [X[:, j] for j in range(X.shape[1])] + ([y] if y is not None else [])
+    for column in columns:
+        hashes ^= float_bits(column).astype(np.uint64)
+        hashes *= prime
+        hashes ^= hashes >> shift
+    return hashes
+
+
+def collapse_duplicates(X, y):
+    """
+    Keeps the first occurrence of every distinct (features, label) row and
+    returns (X_unique, y_unique, counts), where counts is the number of
+    identical rows each unique row stands for (used as its sample weight).
+    """
+    _, first_idx, groups = np.unique(row_hashes(X, y), return_index=True, return_inverse=True)
+    # Rows with equal hashes are checked against the first row of their group, so a hash
+    # collision can't merge two different rows; colliding groups are regrouped exactly
+    columns = [X[:, j] for j in range(X.shape[1])] + [y]
+    representative = first_idx[groups]
+    differs = np.zeros(len(X), dtype=bool)
+    for column in columns:
+        bits = float_bits(column)
+        differs |= bits != bits[representative]
+    if differs.any():
+        collided = np.flatnonzero(np.isin(groups, groups[differs]))
+        rows = np.ascontiguousarray(np.column_stack([float_bits(column)[collided] for column in columns]))
+        _, exact = np.unique(rows.view(np.dtype((np.void, rows.shape[1] * 4))).ravel(), return_inverse=True)
+        groups = groups.copy()
+        groups[collided] = len(first_idx) + exact
+    _, first_idx, counts = np.unique(groups, return_index=True, return_counts=True)
+    order = np.argsort(first_idx)  # keep the original row order
+    first_idx, counts = first_idx[order], counts[order]
+    return X[first_idx], y[first_idx], counts.astype(np.float32)
+
+
+# --- 3. Preprocess the Dataset ---
+def preprocess_data(df, dedup=True, prune=True):
+    """
+    Cleans, encodes, and scales the dataset. With `prune`, constant, duplicate
+    and near-perfectly correlated columns are dropped (see feature_schema.py).
+    With `dedup`, exact duplicate rows are collapsed and returned as
+    count-based sample weights (else all ones).
+    """
     print("\n🔹 Starting preprocessing...")
     print("Initial shape:", df.shape)
 
@@ -32,42 +159,100 @@ def preprocess_data(df):
     if 'Flow ID' in df.columns and 'Timestamp' in df.columns:
         df.drop(columns=['Flow ID', 'Timestamp'], inplace=True)
 
-    df.replace([np.inf, -np.inf], np.nan, inplace=True)
-    df.dropna(inplace=True)
+    # load_data already cleans per file; this only copies when something slipped through
+    finite = np.isfinite(df.drop(columns='Label').to_numpy(dtype=np.float32)).all(axis=1) & df['Label'].notna().to_numpy()
+    if not finite.all():
+        df = df[finite]
 
     print("Shape after dropping nulls/infinities:", df.shape)
 
     label_encoder = LabelEncoder()
-    df['Label'] = label_encoder.fit_transform(df['Label'])
+    df['Label'] = label_encoder.fit_transform(df['Label']).astype(np.int32)
     joblib.dump(label_encoder, 'label_encoder.pkl')
     print("LabelEncoder saved to 'label_encoder.pkl'")
 
-    X = df.drop('Label', axis=1)
-    y = df['Label']
+    X = df.drop('Label', axis=1).astype(np.float32, copy=False)
+    y = df['Label'].to_numpy()
+    columns = X.columns
+    X = X.to_numpy()
+
+    if prune:
+        schema = find_redundant_columns(X, columns)
+        print_schema_summary(schema)
+        X = X[:, [list(columns).index(col) for col in schema['columns']]]
+        columns = pd.Index(schema['columns'])
+    else:
+        schema = unpruned_schema(columns)
+    save_schema(schema, SCHEMA_FILE)
+    print(f"Feature schema saved to '{SCHEMA_FILE}'")
 
     # This is the line you were adding
-    joblib.dump(X.columns, 'model_columns.pkl')
+    joblib.dump(columns, 'model_columns.pkl')
     print("Model columns saved to 'model_columns.pkl'")
 
+    if dedup:
+        rows_before = len(X)
+        X, y, weights = collapse_duplicates(X, y)
+        print(f"Collapsed duplicates: {rows_before:,} -> {len(X):,} unique rows "
+              f"({1 - len(X) / rows_before:.1%} fewer)")
+    else:
+        weights = np.ones(len(X), dtype=np.float32)
+
+    # Weighted fit gives the same mean/std as fitting on every original row. Fitting on a
+    # frame keeps the feature names, so the apps can pass DataFrames without warnings.
     scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    scaler.fit(pd.DataFrame(X, columns=columns, copy=False), sample_weight=weights)
+    X_scaled = scaler.transform(pd.DataFrame(X, columns=columns, copy=False))
     joblib.dump(scaler, 'scaler.pkl')
     print("StandardScaler saved to 'scaler.pkl'")
 
-    return X_scaled, y
+    return X_scaled, y, weights
 
 
-# --- 3. Main execution block ---
-if __name__ == "__main__":
-    full_df = load_data(DATA_DIR)
+# --- 4. Full pipeline ---
+def run_preprocessing(data_dir=DATA_DIR, cache_dir=None, max_workers=None, dedup=True, prune=True):
+    """Load, clean, deduplicate, scale and split the dataset, then write the split store."""
+    run_started = time.perf_counter()
+    stage_started = time.perf_counter()
+    full_df = load_data(data_dir, cache_dir=cache_dir, max_workers=max_workers)
+    report_stage("Load", stage_started)
 
-    X_processed, y_processed = preprocess_data(full_df)
+    stage_started = time.perf_counter()
+    rows_loaded = len(full_df)
+    X_processed, y_processed, weights = preprocess_data(full_df, dedup=dedup, prune=prune)
+    del full_df
+    report_stage("Preprocess", stage_started)
 
     print("\n🔹 Splitting data into training and testing sets (80/20)...")
-    X_train, X_test, y_train, y_test = train_test_split(X_processed, y_processed, test_size=0.2, random_state=42,
-                                                        stratify=y_processed)
+    stage_started = time.perf_counter()
+    # Duplicates are already collapsed, so identical rows can't land on both sides
+    X_train, X_test, y_train, y_test, w_train, w_test = train_test_split(
+        X_processed, y_processed, weights, test_size=0.2, random_state=42, stratify=y_processed)
 
-    joblib.dump((X_train, X_test, y_train, y_test), 'train_test_data.pkl')
+    arrays = {'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test}
+    if dedup:
+        arrays.update({'w_train': w_train, 'w_test': w_test})
+    save_split(arrays, metadata={'rows_loaded': rows_loaded, 'rows_unique': len(X_processed), 'deduplicated': dedup,
+                                 'n_features': int(X_processed.shape[1]), 'feature_schema': SCHEMA_FILE})
+    report_stage("Split and save", stage_started)
+    report_stage("Total", run_started)
 
     print("\n✅ Preprocessing complete!")
-    print("Processed and split data saved to 'train_test_data.pkl'")
\ No newline at end of file
+    print(f"Processed and split data saved to '{SPLIT_DIR}/' (float32 .npy arrays + manifest.json)")
+
+
+# --- 5. Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load, clean, scale and split the CICIDS2017 CSVs.")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--parquet-cache', default=None, metavar='DIR',
+                        help="Store cleaned per-file Parquet here and reuse it on later runs")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel CSV parsers (default: one per file)")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="Keep exact duplicate rows instead of collapsing them into sample weights")
+    parser.add_argument('--no-prune', action='store_true',
+                        help="Keep constant, duplicate and near-perfectly correlated feature columns")
+    args = parser.parse_args()
+
+    run_preprocessing(args.data_dir, cache_dir=args.parquet_cache, max_workers=args.workers, dedup=not args.no_dedup,
+                      prune=not args.no_prune)
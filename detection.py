@@ -0,0 +1,43 @@
+"""
+Detection Scoring
+=================
+The scoring steps shared by the live pipeline and the benchmarks: scale the
+features, classify with the Random Forest, measure the autoencoder
+reconstruction error, and fuse both into one attack/benign verdict.
+"""
+
+import numpy as np
+
+BENIGN_LABEL = 'BENIGN'
+AE_PREDICT_BATCH_SIZE = 4096  # Keras' default of 32 makes large batches needlessly slow
+
+
+def reconstruction_errors(autoencoder, X_scaled, batch_size=AE_PREDICT_BATCH_SIZE):
+    """Per-row mean squared reconstruction error."""
+    X_scaled = np.asarray(X_scaled, dtype=np.float32)
+    reconstructions = autoencoder.predict(X_scaled, batch_size=batch_size, verbose=0)
+    return np.mean(np.square(X_scaled - reconstructions), axis=1)
+
+
+def fused_verdict(rf_labels, ae_errors, threshold):
+    """A flow is an attack if the Random Forest names an attack or the autoencoder flags an anomaly."""
+    anomalies = ae_errors > threshold
+    return (np.asarray(rf_labels) != BENIGN_LABEL) | anomalies, anomalies
+
+
+def score_features(df_features, scaler, rf_model, label_encoder, autoencoder, threshold):
+    """
+    Scores a frame already projected onto the model columns. Returns a dict of
+    per-row arrays: rf_labels, rf_scores (probability of the predicted label),
+    ae_errors, anomalies and is_attack.
+    """
+    X_scaled = scaler.transform(df_features)
+    # predict() is the argmax of predict_proba(), so this costs the same and keeps the probability
+    rf_proba = rf_model.predict_proba(X_scaled)
+    rf_best = rf_proba.argmax(axis=1)
+    rf_labels = label_encoder.inverse_transform(rf_model.classes_[rf_best])
+    rf_scores = rf_proba[np.arange(len(rf_best)), rf_best]
+    ae_errors = reconstruction_errors(autoencoder, X_scaled)
+    is_attack, anomalies = fused_verdict(rf_labels, ae_errors, threshold)
+    return {'rf_labels': rf_labels, 'rf_scores': rf_scores, 'ae_errors': ae_errors, 'anomalies': anomalies,
+            'is_attack': is_attack}
@@ -5,9 +5,11 @@ Shows raw packets captured and whether they're being detected as attacks.
 
 import joblib
 import numpy as np
+import pandas as pd
 from scapy.all import sniff, IP, TCP, UDP
 from tensorflow.keras.models import load_model
 import time
+from feature_schema import load_schema, project_features
 
 print("=" * 70)
 print("NMAP DETECTION DIAGNOSTIC TOOL")
@@ -22,6 +24,7 @@ try:
     scaler = joblib.load('scaler.pkl')
     label_encoder = joblib.load('label_encoder.pkl')
     model_columns = joblib.load('model_columns.pkl')
+    feature_schema = load_schema()
     print("    ✅ All models loaded successfully")
 except Exception as e:
     print(f"    ❌ Error loading models: {e}")
@@ -56,7 +59,7 @@ def analyze_packet(packet):
     packet_count += 1
     
     # Extract features (same as Live Analysis)
-    features = {col: 0 for col in model_columns}
+    features = {}
     features['Flow Duration'] = 1000000
     features['Tot Fwd Pkts'] = 1
     features['TotLen Fwd Pkts'] = len(packet)
@@ -64,7 +67,7 @@ def analyze_packet(packet):
     features['Fwd Pkt Len Min'] = len(packet)
     features['Fwd Pkt Len Mean'] = len(packet)
     
-    df = np.array([[features[col] for col in model_columns]])
+    df = project_features(pd.DataFrame([features]), model_columns, feature_schema)
     X_scaled = scaler.transform(df)
     
     # Predict
@@ -0,0 +1,120 @@
+"""
+Feature Schema
+==============
+Finds feature columns that carry no extra information and records which
+ones the models actually use:
+
+    constant     - the same value in every row (e.g. 'Bwd PSH Flags')
+    duplicate    - bit-for-bit equal to an earlier column
+                   (e.g. 'Fwd Header Length.1' -> 'Fwd Header Length')
+    correlated   - |Pearson r| >= threshold with an earlier kept column
+
+The reduced column list is saved as model_columns.pkl as before, and the full
+mapping goes to feature_schema.json. Consumers call `project_features()` to
+turn a raw feature frame into the reduced matrix. It fills a kept column from
+a dropped exact duplicate when only the duplicate's name is present.
+"""
+
+import os
+import json
+import numpy as np
+
+SCHEMA_FILE = 'feature_schema.json'
+DEFAULT_CORR_THRESHOLD = 0.9999
+
+
+def find_redundant_columns(X, columns, corr_threshold=DEFAULT_CORR_THRESHOLD, sample_rows=200_000, seed=42):
+    """
+    Returns the schema dict for the float matrix `X` with names `columns`.
+    Constant and duplicate columns are checked on every row; correlation is
+    estimated on a random sample of `sample_rows` rows.
+    """
+    columns = [str(col) for col in columns]
+    n_rows = len(X)
+
+    # --- Constant columns ---
+    constant_mask = X.min(axis=0) == X.max(axis=0) if n_rows else np.zeros(len(columns), dtype=bool)
+    constant = [columns[j] for j in np.flatnonzero(constant_mask)]
+
+    # --- Exact duplicates (hash each column's bytes, then confirm equality) ---
+    duplicate_of = {}
+    first_by_hash = {}
+    for j in np.flatnonzero(~constant_mask):
+        column = np.ascontiguousarray(X[:, j])
+        key = hash(column.tobytes())
+        match = next((k for k in first_by_hash.get(key, []) if np.array_equal(X[:, k], column)), None)
+        if match is None:
+            first_by_hash.setdefault(key, []).append(j)
+        else:
+            duplicate_of[columns[j]] = columns[match]
+
+    # --- Near-perfectly correlated columns (greedy, earlier column wins) ---
+    candidates = [j for j in np.flatnonzero(~constant_mask) if columns[j] not in duplicate_of]
+    correlated_with = {}
+    if len(candidates) > 1 and n_rows > 1:
+        rows = np.random.default_rng(seed).choice(n_rows, size=min(sample_rows, n_rows), replace=False)
+        sample = np.asarray(X[np.sort(rows)][:, candidates], dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.abs(np.corrcoef(sample, rowvar=False))
+        kept = []
+        for i, j in enumerate(candidates):
+            match = next((k for k in kept if corr[i, k] >= corr_threshold), None)
+            if match is None:
+                kept.append(i)
+            else:
+                correlated_with[columns[j]] = [columns[candidates[match]], round(float(corr[i, match]), 6)]
+
+    dropped = set(constant) | set(duplicate_of) | set(correlated_with)
+    return {
+        'input_columns': columns,
+        'columns': [col for col in columns if col not in dropped],
+        'constant': constant,
+        'duplicate_of': duplicate_of,
+        'correlated_with': correlated_with,
+        'corr_threshold': corr_threshold,
+    }
+
+
+def unpruned_schema(columns, corr_threshold=None):
+    """Schema that keeps every column (preprocessing run with pruning disabled)."""
+    columns = [str(col) for col in columns]
+    return {'input_columns': columns, 'columns': columns, 'constant': [], 'duplicate_of': {},
+            'correlated_with': {}, 'corr_threshold': corr_threshold}
+
+
+def save_schema(schema, path=SCHEMA_FILE):
+    with open(path, 'w') as f:
+        json.dump(schema, f, indent=2)
+
+
+def load_schema(path=SCHEMA_FILE):
+    """Returns the saved schema, or None for models trained before feature pruning."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def project_features(df, model_columns, schema=None):
+    """
+    Reindexes a raw feature DataFrame to `model_columns` (missing columns are 0).
+    With a schema, a kept column that is absent is taken from a dropped exact
+    duplicate of it if that one is present.
+    """
+    if schema:
+        for dropped, kept in schema['duplicate_of'].items():
+            if kept not in df.columns and dropped in df.columns:
+                df = df.rename(columns={dropped: kept})
+    return df.reindex(columns=model_columns, fill_value=0)
+
+
+def print_schema_summary(schema):
+    n_in, n_out = len(schema['input_columns']), len(schema['columns'])
+    print(f"Feature pruning: {n_in} -> {n_out} columns "
+          f"({len(schema['constant'])} constant, {len(schema['duplicate_of'])} duplicate, "
+          f"{len(schema['correlated_with'])} correlated)")
+    for dropped, kept in schema['duplicate_of'].items():
+        print(f"    '{dropped}' duplicates '{kept}'")
+    for dropped, (kept, r) in schema['correlated_with'].items():
+        print(f"    '{dropped}' ~ '{kept}' (|r|={r})")
+
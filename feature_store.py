@@ -0,0 +1,228 @@
+"""
+Feature Store
+=============
+Keeps the feature vectors behind live decisions, so alerts can be explained
+later and the models retrained on our own traffic. For every analyzed batch
+the LivePipeline hands the store the features the models scored (projected
+onto the model columns, before scaling) and the scores. The store keeps:
+
+    alert    every flagged flow, keyed by its alert's alert_uid
+    benign   a random BENIGN_FRACTION of the other flows
+
+Rows are buffered and written as zstd-compressed Parquet shards: one float32
+column per model column, plus alert_uid, timestamp, sensor_id, flow_id,
+kind, rf_score, ae_mse, is_anomaly and Label (the Random Forest's label). A
+shard is written to `<name>.part` and renamed once complete. The oldest
+shards are deleted to keep the directory under FEATURE_STORE_MAX_MB.
+
+Shards have the layout out_of_core.py trains from (feature columns + Label):
+    python out_of_core.py --shards preprocessed_cache/*.parquet feature_store/*.parquet
+Label is the model's own verdict, so retraining on unreviewed rows repeats
+its mistakes; load_features(labels=...) applies analyst corrections.
+"""
+
+import os
+import sys
+import glob
+import time
+import socket
+import argparse
+import threading
+from datetime import datetime
+
+import numpy as np
+
+FEATURE_DIR = os.getenv('FEATURE_STORE_DIR', 'feature_store')
+BENIGN_FRACTION = float(os.getenv('FEATURE_STORE_BENIGN_FRACTION', 0.01))
+MAX_BYTES = int(float(os.getenv('FEATURE_STORE_MAX_MB', 2048)) * 1024 * 1024)
+SHARD_ROWS = 50_000
+FLUSH_SECONDS = 300  # a quiet sensor still writes its buffered rows this often
+SENSOR_ID = os.getenv('IDS_SENSOR_ID', socket.gethostname())
+META_COLUMNS = ['alert_uid', 'timestamp', 'sensor_id', 'flow_id', 'kind', 'rf_score', 'ae_mse', 'is_anomaly', 'Label']
+
+
+def shard_schema(columns):
+    import pyarrow as pa
+    types = {'timestamp': pa.timestamp('us'), 'rf_score': pa.float32(), 'ae_mse': pa.float32(),
+             'is_anomaly': pa.bool_()}
+    return pa.schema([(col, pa.float32()) for col in columns]
+                     + [(col, types.get(col, pa.string())) for col in META_COLUMNS])
+
+
+def shard_paths(directory=FEATURE_DIR):
+    """Finished shards, oldest first."""
+    return sorted(glob.glob(os.path.join(directory, 'features-*.parquet')), key=os.path.getmtime)
+
+
+class FeatureStore:
+    """Buffers the kept rows of each scored batch and writes them as Parquet shards."""
+
+    def __init__(self, columns, directory=FEATURE_DIR, benign_fraction=BENIGN_FRACTION, shard_rows=SHARD_ROWS,
+                 flush_seconds=FLUSH_SECONDS, max_bytes=MAX_BYTES, seed=None):
+        self.columns = [str(col) for col in columns]
+        self.directory = directory
+        self.benign_fraction = benign_fraction
+        self.shard_rows = shard_rows
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.pending = []  # (timestamp, features, metadata) per recorded batch
+        self.pending_rows = 0
+        self.last_flush = time.monotonic()
+        self.write_thread = None
+        self.counters = {'alert': 0, 'benign': 0, 'rows_written': 0, 'shards_written': 0, 'shards_evicted': 0,
+                         'rows_dropped': 0}
+        self.bytes_on_disk = 0
+        self.last_error = None
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, features, scores, alert_uids, flow_ids, timestamp=None):
+        """
+        Keeps the rows of one scored batch that raised an alert (alert_uids[i]
+        is set) and a sample of the rest. `features` are the rows the models
+        scored, `scores` the dict from detection.score_features.
+        """
+        is_alert = np.array([uid is not None for uid in alert_uids], dtype=bool)
+        rows = np.flatnonzero(is_alert | (self.rng.random(len(is_alert)) < self.benign_fraction))
+        if len(rows):
+            kinds = np.where(is_alert[rows], 'alert', 'benign')
+            metadata = {
+                'alert_uid': np.array([alert_uids[i] for i in rows], dtype=object),
+                'sensor_id': np.full(len(rows), SENSOR_ID, dtype=object),
+                'flow_id': np.array([flow_ids[i] for i in rows], dtype=object),
+                'kind': kinds,
+                'rf_score': np.asarray(scores['rf_scores'], dtype=np.float32)[rows],
+                'ae_mse': np.asarray(scores['ae_errors'], dtype=np.float32)[rows],
+                'is_anomaly': np.asarray(scores['anomalies'], dtype=bool)[rows],
+                'Label': np.asarray(scores['rf_labels']).astype(str)[rows],
+            }
+            with self.lock:
+                self.pending.append((timestamp or datetime.now(), np.asarray(features, dtype=np.float32)[rows],
+                                     metadata))
+                self.pending_rows += len(rows)
+                n_alerts = int(is_alert[rows].sum())
+                self.counters['alert'] += n_alerts
+                self.counters['benign'] += len(rows) - n_alerts
+        if self.pending_rows >= self.shard_rows or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush(wait=False)  # the analyzer doesn't wait for the shard to be compressed and written
+
+    def flush(self, wait=True):
+        """
+        Writes the buffered rows as one shard and trims the store. With
+        wait=False the shard is written by a background thread; one write
+        runs at a time, so at most one shard is held in memory besides the buffer.
+        """
+        with self.lock:
+            pending, self.pending, self.pending_rows = self.pending, [], 0
+            self.last_flush = time.monotonic()
+        if self.write_thread is not None:
+            self.write_thread.join()
+            self.write_thread = None
+        if not pending:
+            return
+        if wait:
+            self._write(pending)
+        else:
+            self.write_thread = threading.Thread(target=self._write, args=(pending,), daemon=True)
+            self.write_thread.start()
+
+    def _write(self, pending):
+        try:
+            self._write_shard(pending)
+            self.trim()
+        except Exception as e:
+            # Dropped rather than kept, so a full disk can't grow the buffer without bound
+            self.counters['rows_dropped'] += sum(len(features) for _, features, _ in pending)
+            self.last_error = str(e)
+
+    def _write_shard(self, pending):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = shard_schema(self.columns)
+        features = np.concatenate([batch for _, batch, _ in pending])
+        by_column = np.ascontiguousarray(features.T)
+        metadata = {name: np.concatenate([meta[name] for _, _, meta in pending]) for name in pending[0][2]}
+        metadata['timestamp'] = np.concatenate([np.full(len(batch), np.datetime64(ts, 'us'))
+                                                for ts, batch, _ in pending])
+        arrays = [pa.array(values) for values in by_column]
+        arrays += [pa.array(metadata[name], type=schema.field(name).type) for name in META_COLUMNS]
+        path = os.path.join(self.directory, f"features-{SENSOR_ID}-{datetime.now():%Y%m%dT%H%M%S%f}.parquet")
+        pq.write_table(pa.Table.from_arrays(arrays, schema=schema), path + '.part', compression='zstd')
+        os.replace(path + '.part', path)
+        self.counters['rows_written'] += len(features)
+        self.counters['shards_written'] += 1
+        return path
+
+    def trim(self):
+        """Deletes the oldest shards until the store fits in max_bytes (the newest shard is always kept)."""
+        shards = [(path, os.path.getsize(path)) for path in shard_paths(self.directory)]
+        total = sum(size for _, size in shards)
+        while len(shards) > 1 and total > self.max_bytes:
+            path, size = shards.pop(0)
+            os.remove(path)
+            total -= size
+            self.counters['shards_evicted'] += 1
+        self.bytes_on_disk = total
+
+    def metrics(self):
+        return dict(self.counters, pending=self.pending_rows, mb_on_disk=round(self.bytes_on_disk / 1e6, 1),
+                    last_error=self.last_error)
+
+
+# --- Loading ---
+def load_features(directory=FEATURE_DIR, columns=None, kinds=('alert', 'benign'), since=None, labels=None):
+    """
+    Stored rows as (X float32 [rows, columns], labels, metadata DataFrame),
+    oldest first. `columns` defaults to model_columns.pkl; features a shard
+    lacks are 0, as in out_of_core.py. `labels` maps alert_uid -> corrected
+    label and overrides the model's label for those alerts.
+    """
+    import joblib
+    import pandas as pd
+    import pyarrow.parquet as pq
+    columns = [str(col) for col in (columns if columns is not None else joblib.load('model_columns.pkl'))]
+    filters = [('kind', 'in', list(kinds))] + ([('timestamp', '>=', since)] if since is not None else [])
+    X_parts, meta_parts = [], []
+    for path in shard_paths(directory):
+        available = set(pq.ParquetFile(path).schema_arrow.names)
+        df = pq.read_table(path, columns=[col for col in columns if col in available] + META_COLUMNS,
+                           filters=filters).to_pandas()
+        X_parts.append(df.reindex(columns=columns, fill_value=0).to_numpy(dtype=np.float32))
+        meta_parts.append(df[META_COLUMNS])
+    if not X_parts:
+        return np.empty((0, len(columns)), dtype=np.float32), np.array([], dtype=str), pd.DataFrame(columns=META_COLUMNS)
+    metadata = pd.concat(meta_parts, ignore_index=True)
+    y = metadata['Label']
+    if labels:
+        y = metadata['alert_uid'].map(labels).fillna(y)
+    return np.concatenate(X_parts), y.to_numpy(dtype=str), metadata
+
+
+def features_for_alerts(alert_uids, directory=FEATURE_DIR):
+    """The stored rows (features and metadata) of the given alerts, indexed by alert_uid."""
+    import pandas as pd
+    import pyarrow.parquet as pq
+    frames = [pq.read_table(path, filters=[('alert_uid', 'in', list(alert_uids))]).to_pandas()
+              for path in shard_paths(directory)]
+    frames = [frame for frame in frames if len(frame)]
+    return pd.concat(frames, ignore_index=True).set_index('alert_uid') if frames else pd.DataFrame()
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the stored feature vectors.")
+    parser.add_argument('--directory', default=FEATURE_DIR)
+    args = parser.parse_args()
+    try:
+        import pyarrow.parquet as pq
+        paths = shard_paths(args.directory)
+        if not paths:
+            print(f"🔹 No feature shards in '{args.directory}'")
+            sys.exit(0)
+        counts = pq.read_table(paths, columns=['kind', 'Label']).to_pandas().value_counts()
+        print(f"🔹 {len(paths):,} shards, {sum(map(os.path.getsize, paths)) / 1e6:,.1f} MB in '{args.directory}'")
+        print(counts.rename('rows').to_string())
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
@@ -4,140 +4,189 @@ Synthetic Attack Traffic Generator
 Generates synthetic network traffic CSV files with known attack patterns.
 Use these with File Analysis page to test your models.
 
+Each class is drawn as one NumPy block: either from the hand-written
+profiles below (noise plus attack-specific feature ranges) or, with
+--from-training, from a per-class mean/covariance fitted on the training
+split. Large outputs are streamed in chunks to CSV or Parquet.
+
 Run: python generate_attack_traffic.py
-Output: synthetic_benign.csv, synthetic_ddos.csv, synthetic_portscan.csv
+Output: synthetic_benign.csv, synthetic_ddos.csv, synthetic_portscan.csv, synthetic_mixed_traffic.csv
+
+Load-test data:
+    python generate_attack_traffic.py --rows 50000000 --output load_test.parquet
+    python generate_attack_traffic.py --rows 1000000 --mix BENIGN=0.8 DDoS=0.2 --from-training --output mix.csv
 """
 
+import os
+import time
+import argparse
 import pandas as pd
 import numpy as np
 import joblib
 
-def generate_synthetic_traffic():
+DEFAULT_MIX = {'BENIGN': 0.5, 'DDoS': 0.2, 'PortScan': 0.15, 'Infiltration': 0.15}
+CHUNK_ROWS = 1_000_000
+
+# Per-class profile: noise std, clip bounds, and attack-specific columns set
+# from a uniform (low, high) range or a list of choices (only if the column exists)
+PROFILES = {
+    'BENIGN': {'std': 0.5, 'clip': (-2, 2), 'columns': {}},
+    'DDoS': {'std': 2.0, 'clip': (-1e6, 1e7), 'columns': {
+        'Flow Duration': (10000, 100000),
+        'Total Fwd Packets': (500, 5000),
+        'Total Length of Fwd Packets': (100000, 1000000),
+        'Destination Port': [80, 443, 8080],
+        'Init_Win_bytes_backward': (10000, 200000),
+        'Max Packet Length': (1200, 65535),
+        'Subflow Fwd Bytes': (10000, 500000),
+    }},
+    'PortScan': {'std': 1.5, 'clip': (-1e5, 1e6), 'columns': {
+        'Total Fwd Packets': (100, 500),
+        'Total Length of Fwd Packets': (5000, 50000),
+    }},
+    'Infiltration': {'std': 1.8, 'clip': (-1e6, 1e7), 'columns': {
+        'Flow Duration': (50000, 200000),
+        'Total Fwd Packets': (200, 1000),
+    }},
+}
+
+
+# --- Class statistics from the training split ---
+def fit_class_stats(max_rows_per_class=200_000, seed=42):
+    """
+    Per-class (mean, covariance factor, column min, column max) in raw feature
+    units, fitted on the saved training split (weighted if it is deduplicated).
+    Also returns each class's share of the training rows.
+    """
+    from split_store import load_split, load_weights
+    X_train, y_train = load_split('X_train', 'y_train')
+    w_train, = load_weights('w_train')
+    scaler = joblib.load('scaler.pkl')
+    label_encoder = joblib.load('label_encoder.pkl')
+    rng = np.random.default_rng(seed)
+
+    counts = np.bincount(np.asarray(y_train), weights=w_train, minlength=len(label_encoder.classes_))
+    stats, shares = {}, {}
+    for code, label in enumerate(label_encoder.classes_):
+        rows = np.flatnonzero(np.asarray(y_train) == code)
+        if len(rows) == 0:
+            continue
+        if len(rows) > max_rows_per_class:
+            rows = np.sort(rng.choice(rows, max_rows_per_class, replace=False))
+        X = scaler.inverse_transform(np.asarray(X_train[rows], dtype=np.float64))
+        weights = None if w_train is None else np.asarray(w_train[rows], dtype=np.float64)
+        mean = np.average(X, axis=0, weights=weights)
+        cov = np.cov(X, rowvar=False, aweights=weights) if len(rows) > 1 else np.zeros((X.shape[1],) * 2)
+        # Eigen-factor instead of Cholesky: class covariances are often singular
+        eigvals, eigvecs = np.linalg.eigh(np.atleast_2d(cov))
+        factor = eigvecs * np.sqrt(np.clip(eigvals, 0, None))
+        stats[label] = (mean, factor, X.min(axis=0), X.max(axis=0))
+        shares[label] = counts[code] / counts.sum()
+    return stats, shares
+
+
+# --- Row generation ---
+def class_block(label, n_rows, model_columns, rng, stats=None):
+    """An (n_rows, n_features) float32 block for one class."""
+    if stats and label in stats:
+        mean, factor, low, high = stats[label]
+        noise = rng.standard_normal((n_rows, factor.shape[1]), dtype=np.float32)
+        block = mean.astype(np.float32) + noise @ factor.T.astype(np.float32)
+        return np.clip(block, low, high, out=block)
+
+    if label not in PROFILES:
+        raise ValueError(f"No profile or training statistics for class '{label}'")
+    profile = PROFILES[label]
+    block = rng.standard_normal((n_rows, len(model_columns)), dtype=np.float32)
+    block *= profile['std']
+    index = {col: i for i, col in enumerate(model_columns)}
+    for col, spec in profile['columns'].items():
+        if col in index:
+            block[:, index[col]] = (rng.choice(spec, n_rows) if isinstance(spec, list)
+                                    else rng.uniform(spec[0], spec[1], n_rows))
+    return np.clip(block, *profile['clip'], out=block)
+
+
+def generate_block(n_rows, mix, model_columns, rng, stats=None):
+    """
+    (X, codes, labels): a column-major float32 feature matrix, each row's class
+    code drawn from the `mix` proportions, and the class names the codes index.
+    """
+    labels = list(mix)
+    shares = np.array([mix[label] for label in labels], dtype=np.float64)
+    codes = rng.choice(len(labels), size=n_rows, p=shares / shares.sum()).astype(np.int8)
+    # Column-major so every feature column is contiguous for Arrow/pandas
+    X = np.empty((n_rows, len(model_columns)), dtype=np.float32, order='F')
+    for code, label in enumerate(labels):
+        rows = np.flatnonzero(codes == code)
+        if len(rows):
+            X[rows] = class_block(label, len(rows), model_columns, rng, stats)
+    return X, codes, labels
+
+
+def generate_rows(n_rows, mix, model_columns, rng, stats=None):
+    """A DataFrame of `n_rows` rows whose labels follow the `mix` proportions."""
+    X, codes, labels = generate_block(n_rows, mix, model_columns, rng, stats)
+    df = pd.DataFrame(X, columns=model_columns, copy=False)
+    df['Label'] = np.array(labels, dtype=object)[codes]
+    return df
+
+
+def write_rows(path, n_rows, mix, model_columns, chunk_rows=CHUNK_ROWS, seed=42, stats=None):
+    """Streams `n_rows` generated rows to a .csv or .parquet file, one chunk at a time."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    rng = np.random.default_rng(seed)
+    writer = None
+    try:
+        for start in range(0, n_rows, chunk_rows):
+            X, codes, labels = generate_block(min(chunk_rows, n_rows - start), mix, model_columns, rng, stats)
+            columns = [pa.array(X[:, j]) for j in range(X.shape[1])]
+            columns.append(pa.DictionaryArray.from_arrays(codes, labels))
+            table = pa.Table.from_arrays(columns, names=list(model_columns) + ['Label'])
+            if writer is None:
+                # Random floats don't dictionary-encode; only the label column benefits
+                writer = (pq.ParquetWriter(path, table.schema, use_dictionary=['Label'])
+                          if path.endswith('.parquet') else pa_csv.CSVWriter(path, table.schema))
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def parse_mix(items):
+    """['BENIGN=0.8', 'DDoS=0.2'] -> {'BENIGN': 0.8, 'DDoS': 0.2}"""
+    mix = {}
+    for item in items:
+        label, _, share = item.rpartition('=')
+        mix[label] = float(share)
+    return mix
+
+
+def generate_synthetic_traffic(seed=None):
     """Generate synthetic traffic samples with attack patterns."""
-    
+
     # Load model columns to know what features to generate
     try:
         model_columns = joblib.load('model_columns.pkl')
     except FileNotFoundError:
         print("❌ model_columns.pkl not found. Run data_preprocessing.py first.")
         return False
-    
+
     print(f"Generating synthetic traffic with {len(model_columns)} features...")
-    
-    # --- BENIGN TRAFFIC ---
-    print("\n[1] Generating BENIGN traffic...")
-    benign_samples = []
-    for i in range(100):
-        # Build sample as dict keyed by column name to ensure correct mapping
-        sample = {col: float(np.random.randn() * 0.5) for col in model_columns}
-        # Keep values moderate for benign traffic
-        for k in sample:
-            sample[k] = float(np.clip(sample[k], -2, 2))
-        benign_samples.append(sample)
-    
-    df_benign = pd.DataFrame(benign_samples, columns=model_columns)
-    df_benign['Label'] = 'BENIGN'
-    df_benign.to_csv('synthetic_benign.csv', index=False)
-    print(f"    ✅ Generated 100 benign samples → synthetic_benign.csv")
-    
-    # --- DDoS ATTACK TRAFFIC ---
-    print("\n[2] Generating DDoS attack traffic...")
-    ddos_samples = []
-    for i in range(50):
-        # Start from a noisy baseline then set attack-specific fields by name
-        sample = {col: float(np.random.randn() * 2) for col in model_columns}
-        # DDoS characteristics: high flow duration, high forward packet counts, high forward bytes
-        if 'Flow Duration' in sample:
-            sample['Flow Duration'] = float(np.random.uniform(10000, 100000))
-        if 'Total Fwd Packets' in sample:
-            sample['Total Fwd Packets'] = float(np.random.uniform(500, 5000))
-        if 'Total Length of Fwd Packets' in sample:
-            sample['Total Length of Fwd Packets'] = float(np.random.uniform(100000, 1000000))
-        # Also set other high-importance features to attackish values
-        if 'Destination Port' in sample:
-            sample['Destination Port'] = float(np.random.choice([80, 443, 8080]))
-        if 'Init_Win_bytes_backward' in sample:
-            sample['Init_Win_bytes_backward'] = float(np.random.uniform(10000, 200000))
-        if 'Max Packet Length' in sample:
-            sample['Max Packet Length'] = float(np.random.uniform(1200, 65535))
-        if 'Subflow Fwd Bytes' in sample:
-            sample['Subflow Fwd Bytes'] = float(np.random.uniform(10000, 500000))
-        # Clip to reasonable numeric bounds
-        for k in sample:
-            sample[k] = float(np.clip(sample[k], -1e6, 1e7))
-        ddos_samples.append(sample)
-    
-    df_ddos = pd.DataFrame(ddos_samples, columns=model_columns)
-    df_ddos['Label'] = 'DDoS'
-    df_ddos.to_csv('synthetic_ddos.csv', index=False)
-    print(f"    ✅ Generated 50 DDoS samples → synthetic_ddos.csv")
-    
-    # --- PORT SCAN TRAFFIC ---
-    print("\n[3] Generating Port Scan attack traffic...")
-    portscan_samples = []
-    for i in range(50):
-        sample = {col: float(np.random.randn() * 1.5) for col in model_columns}
-        # Port scan characteristics: moderate packet counts, low-to-moderate bytes
-        if 'Total Fwd Packets' in sample:
-            sample['Total Fwd Packets'] = float(np.random.uniform(100, 500))
-        if 'Total Length of Fwd Packets' in sample:
-            sample['Total Length of Fwd Packets'] = float(np.random.uniform(5000, 50000))
-        for k in sample:
-            sample[k] = float(np.clip(sample[k], -1e5, 1e6))
-        portscan_samples.append(sample)
-    
-    df_portscan = pd.DataFrame(portscan_samples, columns=model_columns)
-    df_portscan['Label'] = 'PortScan'
-    df_portscan.to_csv('synthetic_portscan.csv', index=False)
-    print(f"    ✅ Generated 50 Port Scan samples → synthetic_portscan.csv")
-    
-    # --- MIXED ATTACK TRAFFIC (for realistic testing) ---
-    print("\n[4] Generating mixed attack traffic...")
-    mixed_samples = []
-    mixed_labels = []
-    
-    for i in range(200):
-        attack_type = np.random.choice(['BENIGN', 'DDoS', 'PortScan', 'Infiltration'], p=[0.5, 0.2, 0.15, 0.15])
-        
-        if attack_type == 'BENIGN':
-            sample = {col: float(np.random.randn() * 0.5) for col in model_columns}
-            for k in sample:
-                sample[k] = float(np.clip(sample[k], -2, 2))
-        elif attack_type == 'DDoS':
-            sample = {col: float(np.random.randn() * 2) for col in model_columns}
-            if 'Flow Duration' in sample:
-                sample['Flow Duration'] = float(np.random.uniform(10000, 100000))
-            if 'Total Fwd Packets' in sample:
-                sample['Total Fwd Packets'] = float(np.random.uniform(500, 5000))
-            if 'Total Length of Fwd Packets' in sample:
-                sample['Total Length of Fwd Packets'] = float(np.random.uniform(100000, 1000000))
-            for k in sample:
-                sample[k] = float(np.clip(sample[k], -1e6, 1e7))
-        elif attack_type == 'PortScan':
-            sample = {col: float(np.random.randn() * 1.5) for col in model_columns}
-            if 'Total Fwd Packets' in sample:
-                sample['Total Fwd Packets'] = float(np.random.uniform(100, 500))
-            if 'Total Length of Fwd Packets' in sample:
-                sample['Total Length of Fwd Packets'] = float(np.random.uniform(5000, 50000))
-            for k in sample:
-                sample[k] = float(np.clip(sample[k], -1e5, 1e6))
-        else:  # Infiltration
-            sample = {col: float(np.random.randn() * 1.8) for col in model_columns}
-            if 'Flow Duration' in sample:
-                sample['Flow Duration'] = float(np.random.uniform(50000, 200000))
-            if 'Total Fwd Packets' in sample:
-                sample['Total Fwd Packets'] = float(np.random.uniform(200, 1000))
-            for k in sample:
-                sample[k] = float(np.clip(sample[k], -1e6, 1e7))
-        
-        mixed_samples.append(sample)
-        mixed_labels.append(attack_type)
-    
-    df_mixed = pd.DataFrame(mixed_samples, columns=model_columns)
-    df_mixed['Label'] = mixed_labels
-    df_mixed.to_csv('synthetic_mixed_traffic.csv', index=False)
-    print(f"    ✅ Generated 200 mixed samples → synthetic_mixed_traffic.csv")
-    
+    rng = np.random.default_rng(seed)
+    outputs = [
+        ("BENIGN traffic", 'synthetic_benign.csv', {'BENIGN': 1.0}, 100),
+        ("DDoS attack traffic", 'synthetic_ddos.csv', {'DDoS': 1.0}, 50),
+        ("Port Scan attack traffic", 'synthetic_portscan.csv', {'PortScan': 1.0}, 50),
+        ("mixed attack traffic", 'synthetic_mixed_traffic.csv', DEFAULT_MIX, 200),
+    ]
+    for step, (description, path, mix, n_rows) in enumerate(outputs, start=1):
+        print(f"\n[{step}] Generating {description}...")
+        generate_rows(n_rows, mix, model_columns, rng).to_csv(path, index=False)
+        print(f"    ✅ Generated {n_rows} samples → {path}")
+
     print("\n" + "=" * 60)
     print("✅ Synthetic traffic generation complete!")
     print("=" * 60)
@@ -158,13 +207,55 @@ def generate_synthetic_traffic():
     print("  print(df.head())")
     print("  PY")
     print("=" * 60)
-    
+
     return True
 
+
+def generate_load_test_file(path, n_rows, mix, chunk_rows=CHUNK_ROWS, seed=42, from_training=False):
+    """Writes a large generated file and reports rows/s. `mix=None` uses the default (or training) mixture."""
+    try:
+        model_columns = joblib.load('model_columns.pkl')
+    except FileNotFoundError:
+        print("❌ model_columns.pkl not found. Run data_preprocessing.py first.")
+        return False
+
+    stats = None
+    if from_training:
+        print("🔹 Fitting per-class mean/covariance on the training split...")
+        stats, shares = fit_class_stats(seed=seed)
+        mix = mix or shares  # default to the training class mixture
+
+    mix = mix or DEFAULT_MIX
+    print(f"🔹 Writing {n_rows:,} rows x {len(model_columns)} features to '{path}' "
+          f"({ {label: round(share, 3) for label, share in mix.items()} })...")
+    started = time.perf_counter()
+    write_rows(path, n_rows, mix, model_columns, chunk_rows, seed, stats)
+    elapsed = time.perf_counter() - started
+    print(f"✅ {n_rows:,} rows, {os.path.getsize(path) / 1e6:,.1f} MB in {elapsed:.1f}s "
+          f"({n_rows / elapsed:,.0f} rows/s)")
+    return True
+
+
 if __name__ == "__main__":
     import sys
+    parser = argparse.ArgumentParser(description="Generate synthetic labelled flow rows.")
+    parser.add_argument('--rows', type=int, default=None,
+                        help="Write one large file with this many rows instead of the four sample CSVs")
+    parser.add_argument('--output', default='synthetic_load_test.parquet', help=".csv or .parquet")
+    parser.add_argument('--mix', nargs='+', default=None, metavar='LABEL=SHARE',
+                        help="Class mixture (default: %s, or the training mixture with --from-training)"
+                             % ' '.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()))
+    parser.add_argument('--from-training', action='store_true',
+                        help="Sample each class from a mean/covariance fitted on the training split")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
     try:
-        success = generate_synthetic_traffic()
+        if args.rows is None:
+            success = generate_synthetic_traffic()
+        else:
+            success = generate_load_test_file(args.output, args.rows, parse_mix(args.mix) if args.mix else None,
+                                              args.chunk_rows, args.seed, args.from_training)
         sys.exit(0 if success else 1)
     except Exception as e:
         print(f"\n❌ Error: {e}")
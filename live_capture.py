@@ -2,6 +2,7 @@ import joblib
 import pandas as pd
 import numpy as np
 from scapy.all import sniff
+from feature_schema import load_schema, project_features
 
 # --- 1. Load Pre-trained Assets ---
 print("🔹 Loading saved model and preprocessors...")
@@ -10,6 +11,7 @@ try:
     scaler = joblib.load('scaler.pkl')
     label_encoder = joblib.load('label_encoder.pkl')
     model_columns = joblib.load('model_columns.pkl')
+    feature_schema = load_schema()
     print("✅ Assets loaded successfully.")
 except FileNotFoundError:
     print("❌ Error: Required model assets not found. Make sure all .pkl files are present.")
@@ -26,7 +28,7 @@ def process_packet(packet):
         # NOTE: Many features from the original dataset are flow-based (aggregates over time).
         # We are approximating them on a per-packet basis here.
         
-        feature_dict = {col: 0 for col in model_columns} # Initialize all features to 0
+        feature_dict = {} # Features not set here are filled with 0 by project_features
 
         if packet.haslayer('IP'):
             feature_dict['Source Port'] = packet.sport
@@ -44,7 +46,7 @@ def process_packet(packet):
             feature_dict['Fwd Packet Length Mean'] = len(packet[UDP].payload)
             
         # Create a DataFrame from the extracted features
-        df_packet = pd.DataFrame([feature_dict], columns=model_columns)
+        df_packet = project_features(pd.DataFrame([feature_dict]), model_columns, feature_schema)
         
         # --- Preprocessing and Prediction ---
         # Scale the features using the loaded scaler
@@ -0,0 +1,251 @@
+"""
+Live Detection Pipeline
+=======================
+The capture -> queue -> analyze -> alert path used by the Live Analysis page,
+factored out of the page so that it can also be driven in-process by the
+pcap replay benchmark (benchmarks/bench_replay.py):
+
+    sniffer thread:   process_packet(packet) -> packet_queue
+    analyzer thread:  packet_queue -> featurize -> score_features -> alert sink
+                                                                 -> notifier (optional)
+                                                                 -> feature store (optional)
+
+The pipeline keeps counters (packets, drops, flows, alerts), queue-depth
+samples and per-stage latencies, which the page and the benchmark report.
+"""
+
+import os
+import time
+import uuid
+import socket
+import hashlib
+import threading
+from collections import deque
+from queue import Queue, Empty, Full
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from scapy.all import IP, TCP, UDP
+
+from feature_schema import project_features
+from detection import score_features
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_INTERVAL = 2.0  # seconds between analysis passes
+METRIC_SAMPLES = 10_000  # latency/queue-depth samples kept; the pipeline lives for the whole capture
+SENSOR_ID = os.getenv('IDS_SENSOR_ID', socket.gethostname())
+
+
+# --- Packet -> flow record ---
+def get_flow_key(packet):
+    """Extract 5-tuple from packet."""
+    try:
+        if IP in packet:
+            if TCP in packet:
+                return (packet[IP].src, packet[TCP].sport, packet[IP].dst, packet[TCP].dport, 6)
+            elif UDP in packet:
+                return (packet[IP].src, packet[UDP].sport, packet[IP].dst, packet[UDP].dport, 17)
+    except Exception:
+        pass
+    return None
+
+
+def flow_id(flow_key):
+    """Stable id for a 5-tuple, the same for both directions of the conversation."""
+    src_ip, src_port, dst_ip, dst_port, proto = flow_key
+    ends = sorted([(str(src_ip), int(src_port)), (str(dst_ip), int(dst_port))])
+    return hashlib.blake2b(repr((ends, int(proto))).encode(), digest_size=8).hexdigest()
+
+
+def featurize(records):
+    """Feature rows for (flow_key, packet_length) records; only the features we can derive per packet."""
+    rows = []
+    for _, pkt_len in records:
+        rows.append({
+            'Flow Duration': 100000,
+            'Tot Fwd Pkts': 1,
+            'TotLen Fwd Pkts': pkt_len,
+            'Fwd Pkt Len Max': pkt_len,
+            'Fwd Pkt Len Min': pkt_len,
+            'Fwd Pkt Len Mean': pkt_len,
+            'Fwd Pkt Len Std': 0,
+            'Fwd Pkts/s': 1,
+            'Fwd IAT Mean': 0,
+            'Fwd IAT Std': 0,
+            'Fwd IAT Max': 0,
+            'Fwd IAT Min': 0,
+        })
+    return pd.DataFrame(rows)
+
+
+# --- Alert sinks ---
+def database_alert_sink(alert):
+    """Writes one alert row through SQLAlchemy, synchronously. Use alert_writer.AlertWriter to batch in the background."""
+    from database_setup import Session, Alert
+    from alert_writer import alert_row
+    session = Session()
+    try:
+        session.add(Alert(**alert_row(alert)))
+        session.commit()
+    except Exception:
+        session.rollback()
+    finally:
+        session.close()
+
+
+class LivePipeline:
+    """
+    Owns the packet/result queues and the analyzer loop. `assets` is a dict with
+    scaler, rf_model, label_encoder, autoencoder, model_columns and
+    feature_schema; `threshold` is the autoencoder anomaly threshold. With a
+    `feature_store` (feature_store.FeatureStore), the scored feature vectors
+    of alerts and a sample of benign flows are kept, keyed by 'Alert ID'. With
+    a `notifier` (notifications.NotificationDispatcher), alerts are also
+    counted into the email digests.
+    """
+
+    def __init__(self, assets, threshold, alert_sink=database_alert_sink, batch_size=DEFAULT_BATCH_SIZE,
+                 interval=DEFAULT_INTERVAL, queue_maxsize=0, threshold_sketch=None, feature_store=None,
+                 notifier=None):
+        self.assets = assets
+        self.threshold = threshold
+        self.alert_sink = alert_sink
+        self.batch_size = batch_size
+        self.interval = interval
+        self.threshold_sketch = threshold_sketch  # updated with RF-BENIGN errors when set
+        self.feature_store = feature_store
+        self.notifier = notifier
+        self.packet_queue = Queue(maxsize=queue_maxsize)
+        self.results_queue = Queue()
+        self.stop_event = threading.Event()
+        self.stats = {'packets': 0, 'dropped': 0, 'ignored': 0, 'flows': 0, 'alerts': 0, 'errors': 0}
+        self.thread = None
+        self.last_error = None
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        """Clears the latency, batch-size and queue-depth samples (the newest METRIC_SAMPLES of each are kept)."""
+        self.stage_seconds = {stage: deque(maxlen=METRIC_SAMPLES) for stage in ('featurize', 'score', 'sink')}
+        self.batch_sizes = deque(maxlen=METRIC_SAMPLES)
+        self.alert_latencies = deque(maxlen=METRIC_SAMPLES)  # seconds from packet capture to alert written
+        self.queue_depths = deque(maxlen=METRIC_SAMPLES)  # (seconds since start, queue depth)
+        self.started_at = time.perf_counter()
+
+    # --- Capture side ---
+    def process_packet(self, packet):
+        """Sniffer callback: queue the packet's flow key and length."""
+        self.enqueue(get_flow_key(packet), len(packet))
+
+    def enqueue(self, flow_key, pkt_len, captured_at=None):
+        if flow_key is None:
+            self.stats['ignored'] += 1
+            return
+        self.stats['packets'] += 1
+        try:
+            self.packet_queue.put_nowait((flow_key, pkt_len, captured_at or time.perf_counter()))
+        except Full:
+            self.stats['dropped'] += 1
+
+    # --- Analysis side ---
+    def drain(self):
+        """Takes up to batch_size queued packets."""
+        buffer = []
+        while len(buffer) < self.batch_size:
+            try:
+                buffer.append(self.packet_queue.get_nowait())
+            except Empty:
+                break
+        return buffer
+
+    def analyze_batch(self, buffer):
+        """Scores one batch of queued packets and emits alerts for attacks."""
+        started = time.perf_counter()
+        df_predict = project_features(featurize([(key, length) for key, length, _ in buffer]),
+                                      self.assets['model_columns'], self.assets.get('feature_schema'))
+        featurized = time.perf_counter()
+
+        scores = score_features(df_predict, self.assets['scaler'], self.assets['rf_model'],
+                                self.assets['label_encoder'], self.assets['autoencoder'], self.threshold)
+        scored = time.perf_counter()
+        if self.threshold_sketch is not None:
+            self.threshold_sketch.update(scores['ae_errors'][scores['rf_labels'] == 'BENIGN'])
+
+        alert_uids = [None] * len(buffer)
+        for idx in np.flatnonzero(scores['is_attack']):
+            flow_key, _, captured_at = buffer[idx]
+            src_ip, src_port, dst_ip, dst_port, proto = flow_key
+            alert_uids[idx] = uuid.uuid4().hex
+            alert = {
+                'timestamp': datetime.now(),
+                'Alert ID': alert_uids[idx],
+                'Flow ID': flow_id(flow_key),
+                'Source IP': src_ip,
+                'Source Port': src_port,
+                'Destination IP': dst_ip,
+                'Destination Port': dst_port,
+                'Protocol': proto,
+                'Attack Type': str(scores['rf_labels'][idx]),
+                'RF Score': float(scores['rf_scores'][idx]),
+                'Anomaly MSE': float(scores['ae_errors'][idx]),
+                'Threshold': float(self.threshold),
+                'Is Anomaly': bool(scores['anomalies'][idx]),
+                'Sensor': SENSOR_ID,
+            }
+            self.alert_sink(alert)
+            if self.notifier is not None:
+                self.notifier.notify_alert(alert)
+            self.alert_latencies.append(time.perf_counter() - captured_at)
+            self.results_queue.put(alert)
+            self.stats['alerts'] += 1
+        if self.feature_store is not None:
+            self.feature_store.record(df_predict, scores, alert_uids, [flow_id(key) for key, _, _ in buffer])
+        finished = time.perf_counter()
+
+        self.stats['flows'] += len(buffer)
+        self.batch_sizes.append(len(buffer))
+        self.stage_seconds['featurize'].append(featurized - started)
+        self.stage_seconds['score'].append(scored - featurized)
+        self.stage_seconds['sink'].append(finished - scored)
+
+    def run(self):
+        """Analyzer loop: every `interval` seconds, score up to `batch_size` queued packets."""
+        while not self.stop_event.is_set():
+            if self.interval:
+                self.stop_event.wait(self.interval)
+            self.queue_depths.append((time.perf_counter() - self.started_at, self.packet_queue.qsize()))
+            buffer = self.drain()
+            if not buffer:
+                if not self.interval:
+                    self.stop_event.wait(0.01)
+                continue
+            try:
+                self.analyze_batch(buffer)
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.last_error = e
+
+    def start(self):
+        """Starts the analyzer thread; a no-op while the previous one is still running."""
+        if self.thread is not None and self.thread.is_alive():
+            return self.thread
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self, timeout=None):
+        """Stops the analyzer and waits for its current batch, then flushes the feature store."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join((self.interval or 0) + 10 if timeout is None else timeout)
+        if self.feature_store is not None and not (self.thread is not None and self.thread.is_alive()):
+            self.feature_store.flush()
+
+    def poll_alerts(self):
+        alerts = []
+        while True:
+            try:
+                alerts.append(self.results_queue.get_nowait())
+            except Empty:
+                return alerts
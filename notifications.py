@@ -0,0 +1,516 @@
+"""
+Email Notifications
+===================
+Sends email from background threads, so neither a Streamlit request nor the
+live analyzer ever waits on SMTP:
+
+    send(to, subject, html)   one message (invite codes, rejections), queued
+    notify_alert(alert)       counted into a digest for each ALERT_EMAIL_RECIPIENTS
+                              address; one email per DIGEST_MAX_ALERTS alerts
+                              or DIGEST_SECONDS, whichever comes first
+
+A scheduler thread applies a per-recipient token bucket (NOTIFY_BURST
+messages at once, refilled at NOTIFY_RATE_PER_HOUR). A message over the limit
+waits until a token frees up; a digest over the limit keeps collecting alerts,
+so an attack turns into a few large digests rather than a mail storm.
+SMTP_POOL_SIZE worker threads deliver the messages over pooled connections:
+each is opened (STARTTLS, login) once and reused, NOOP-checked after sitting
+idle and reopened if the server dropped it. Failed sends are retried with
+exponential backoff.
+
+SMTP settings are the ones auth.py always used (SMTP_SERVER, SMTP_PORT,
+SENDER_EMAIL, SENDER_PASSWORD). With SENDER_PASSWORD set, the server must
+offer STARTTLS before the login, or the connection is refused. Without a
+password (e.g. LocalSMTPServer) STARTTLS is used only when offered.
+
+LocalSMTPServer is a minimal in-process SMTP server that keeps what it
+receives in memory, for development and benchmarks:
+    python notifications.py --local-smtp --port 8025
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=8025 SENDER_EMAIL=ids@localhost python notifications.py --test-email you@example.com
+"""
+
+import os
+import sys
+import html
+import time
+import heapq
+import atexit
+import smtplib
+import argparse
+import itertools
+import threading
+import socketserver
+from collections import Counter, deque
+from datetime import datetime
+from email import message_from_bytes
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from queue import Queue, LifoQueue, Empty, Full
+
+import numpy as np
+
+POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', 2))
+RATE_PER_HOUR = float(os.getenv('NOTIFY_RATE_PER_HOUR', 30))  # per recipient; 0 disables the limit
+BURST = int(os.getenv('NOTIFY_BURST', 5))
+ALERT_RECIPIENTS = [address.strip() for address in os.getenv('ALERT_EMAIL_RECIPIENTS', '').split(',')
+                    if address.strip()]
+DIGEST_MAX_ALERTS = int(os.getenv('DIGEST_MAX_ALERTS', 1000))
+DIGEST_SECONDS = float(os.getenv('DIGEST_SECONDS', 120))
+DIGEST_SAMPLE = 10  # alerts listed one by one in a digest
+MAX_SOURCES_TRACKED = 10_000  # per digest; spoofed floods count the rest as "other"
+
+
+def build_message(sender, to, subject, body):
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = to
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'html'))
+    return msg
+
+
+# --- SMTP connections ---
+class SMTPPool:
+    """SMTP connections that are opened (STARTTLS, login) once and reused for many messages."""
+
+    def __init__(self, host, port, sender, password=None, timeout=30, probe_after=30.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.timeout = timeout
+        self.probe_after = probe_after  # idle seconds after which a connection is NOOP-checked before use
+        self.idle = LifoQueue()  # (connection, last used); the most recently used is the likeliest to be alive
+        self.connections_opened = 0
+
+    def _open(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        server.ehlo()
+        if server.has_extn('starttls'):
+            server.starttls()
+            server.ehlo()
+        elif self.password:
+            # Never send credentials in the clear; an unencrypted session is only for password-less
+            # relays such as LocalSMTPServer
+            self._close(server)
+            raise smtplib.SMTPNotSupportedError(f"{self.host}:{self.port} does not offer STARTTLS; "
+                                                f"refusing to log in without encryption")
+        if self.password:
+            server.login(self.sender, self.password)
+        self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _get(self):
+        try:
+            server, last_used = self.idle.get_nowait()
+        except Empty:
+            return self._open()
+        if time.monotonic() - last_used < self.probe_after:
+            return server
+        try:
+            if server.noop()[0] == 250:
+                return server
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._close(server)
+        return self._open()
+
+    def send(self, message):
+        """Sends over an idle connection (or a new one); a connection the server dropped is reopened once."""
+        server = self._get()
+        try:
+            try:
+                server.send_message(message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self._close(server)
+                server = self._open()
+                server.send_message(message)
+        except Exception:
+            self._close(server)  # the session may be mid-transaction; start the next send on a fresh one
+            raise
+        self.idle.put((server, time.monotonic()))
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self.idle.get_nowait()
+            except Empty:
+                return
+            self._close(server)
+
+
+def smtp_pool_from_env():
+    return SMTPPool(os.getenv('SMTP_SERVER', 'smtp.gmail.com'), int(os.getenv('SMTP_PORT', '587')),
+                    os.getenv('SENDER_EMAIL'), os.getenv('SENDER_PASSWORD'))
+
+
+# --- Rate limiting ---
+class RateLimiter:
+    """Token bucket per recipient: up to `burst` messages at once, refilled at `per_hour` an hour."""
+
+    def __init__(self, per_hour=RATE_PER_HOUR, burst=BURST):
+        self.rate = per_hour / 3600.0
+        self.burst = burst
+        self.buckets = {}  # recipient -> (tokens, updated)
+
+    def acquire(self, recipient, now):
+        """Takes a token and returns 0, or returns the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        tokens, updated = self.buckets.get(recipient, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self.buckets[recipient] = (tokens - 1, now)
+            return 0.0
+        self.buckets[recipient] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+
+# --- Alert digests ---
+class _Digest:
+    __slots__ = ('opened', 'count', 'first_seen', 'last_seen', 'attack_types', 'sources', 'anomalies', 'sample')
+
+    def __init__(self, now):
+        self.opened = now
+        self.count = 0
+        self.first_seen = None
+        self.last_seen = None
+        self.attack_types = Counter()
+        self.sources = Counter()
+        self.anomalies = 0
+        self.sample = []
+
+    def add(self, alert):
+        self.count += 1
+        self.first_seen = self.first_seen or alert['timestamp']
+        self.last_seen = alert['timestamp']
+        self.attack_types[alert['Attack Type']] += 1
+        source = alert.get('Source IP')
+        self.sources[source if source in self.sources or len(self.sources) < MAX_SOURCES_TRACKED else 'other'] += 1
+        self.anomalies += bool(alert.get('Is Anomaly'))
+        if len(self.sample) < DIGEST_SAMPLE:
+            self.sample.append(alert)
+
+    def render(self):
+        """(subject, html body)."""
+        types = ', '.join(name for name, _ in self.attack_types.most_common(3))
+        subject = f"IDS alert digest: {self.count:,} alert{'s' if self.count != 1 else ''} ({types})"
+
+        def rows(counter):
+            return ''.join(f"<tr><td>{html.escape(str(key))}</td><td>{count:,}</td></tr>"
+                           for key, count in counter.most_common(10))
+
+        sample = ''.join(
+            f"<tr><td>{alert['timestamp']:%Y-%m-%d %H:%M:%S}</td><td>{html.escape(str(alert.get('Source IP')))}</td>"
+            f"<td>{html.escape(str(alert.get('Destination IP')))}:{alert['Destination Port']}</td>"
+            f"<td>{html.escape(str(alert['Attack Type']))}</td><td>{alert.get('RF Score') or 0:.2f}</td></tr>"
+            for alert in self.sample)
+        body = f"""
+        <html>
+            <body>
+                <h2>{self.count:,} alerts between {self.first_seen:%Y-%m-%d %H:%M:%S} and {self.last_seen:%H:%M:%S}</h2>
+                <p>{self.anomalies:,} were also flagged as anomalies by the autoencoder.</p>
+                <h3>By attack type</h3>
+                <table>{rows(self.attack_types)}</table>
+                <h3>Top sources</h3>
+                <table>{rows(self.sources)}</table>
+                <h3>First alerts</h3>
+                <table><tr><th>Time</th><th>Source</th><th>Destination</th><th>Type</th><th>RF score</th></tr>{sample}</table>
+                <p>Investigate them on the Live Analysis and Alert Investigation pages.</p>
+            </body>
+        </html>
+        """
+        return subject, body
+
+
+# --- Dispatcher ---
+class NotificationDispatcher:
+    """Queues emails and alert digests and delivers them from background threads."""
+
+    def __init__(self, pool=None, sender=None, workers=POOL_SIZE, rate_per_hour=RATE_PER_HOUR, burst=BURST,
+                 alert_recipients=None, digest_max_alerts=DIGEST_MAX_ALERTS, digest_seconds=DIGEST_SECONDS,
+                 queue_maxsize=1000, max_retries=3, retry_backoff=1.0):
+        self.pool = pool if pool is not None else smtp_pool_from_env()
+        self.sender = sender or self.pool.sender
+        self.workers = workers
+        self.limiter = RateLimiter(rate_per_hour, burst)
+        self.alert_recipients = list(ALERT_RECIPIENTS if alert_recipients is None else alert_recipients)
+        self.digest_max_alerts = digest_max_alerts
+        self.digest_seconds = digest_seconds
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.incoming = Queue(maxsize=queue_maxsize)
+        self.ready = Queue()  # rate-limit checked, waiting for a worker
+        self.deferred = []  # heap of (due, seq, message) held back by the rate limit
+        self.sequence = itertools.count()
+        self.digests = {}  # recipient -> _Digest
+        self.digest_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.counters = {'queued': 0, 'sent': 0, 'retries': 0, 'failed': 0, 'dropped': 0, 'rate_limited': 0,
+                         'alerts': 0, 'digests': 0}
+        self.send_seconds = deque(maxlen=1000)
+        self.lags = deque(maxlen=1000)  # seconds from queued to delivered
+        self.last_error = None
+
+    # --- Producer side ---
+    def send(self, to, subject, body):
+        """Queues one HTML email without blocking; False if the queue is full."""
+        try:
+            self.incoming.put_nowait((build_message(self.sender, to, subject, body), time.perf_counter()))
+        except Full:
+            self.counters['dropped'] += 1
+            return False
+        self.counters['queued'] += 1
+        return True
+
+    def notify_alert(self, alert):
+        """Counts a live pipeline alert into each alert recipient's digest."""
+        if not self.alert_recipients:
+            return
+        now = time.monotonic()
+        with self.digest_lock:
+            self.counters['alerts'] += 1
+            for recipient in self.alert_recipients:
+                digest = self.digests.get(recipient)
+                if digest is None:
+                    digest = self.digests[recipient] = _Digest(now)
+                digest.add(alert)
+
+    # --- Threads ---
+    def start(self):
+        self.stop_event.clear()
+        self.threads = [threading.Thread(target=self.schedule, daemon=True, name='notify-scheduler')]
+        self.threads += [threading.Thread(target=self.work, daemon=True, name=f'notify-worker-{i}')
+                         for i in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        """Sends everything still queued or collected, ignoring the rate limit, then closes the connections."""
+        self.stop_event.set()
+        deadline = time.monotonic() + timeout
+        for thread in self.threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        self.pool.close()
+
+    def schedule(self):
+        """Moves queued messages and due digests past the rate limit onto the ready queue."""
+        while not self.stop_event.is_set():
+            self.release(timeout=0.2)
+        self.release(timeout=0, final=True)
+        for _ in range(self.workers):
+            self.ready.put(None)
+
+    def release(self, timeout, final=False):
+        try:
+            item = self.incoming.get(timeout=timeout) if timeout else self.incoming.get_nowait()
+            while True:
+                heapq.heappush(self.deferred, (0.0, next(self.sequence), item))
+                item = self.incoming.get_nowait()
+        except Empty:
+            pass
+        now = time.monotonic()
+        while self.deferred and (final or self.deferred[0][0] <= now):
+            _, _, item = heapq.heappop(self.deferred)
+            wait = 0.0 if final else self.limiter.acquire(item[0]['To'], now)
+            if wait:
+                self.counters['rate_limited'] += 1
+                heapq.heappush(self.deferred, (now + wait, next(self.sequence), item))
+            else:
+                self.ready.put(item)
+        with self.digest_lock:
+            due = [recipient for recipient, digest in self.digests.items()
+                   if final or digest.count >= self.digest_max_alerts or now - digest.opened >= self.digest_seconds]
+            # A digest over the rate limit stays open and keeps collecting alerts
+            due = [recipient for recipient in due if final or not self.limiter.acquire(recipient, now)]
+            digests = [(recipient, self.digests.pop(recipient)) for recipient in due]
+        for recipient, digest in digests:
+            subject, body = digest.render()
+            self.ready.put((build_message(self.sender, recipient, subject, body), time.perf_counter()))
+            self.counters['digests'] += 1
+
+    def work(self):
+        while True:
+            item = self.ready.get()
+            if item is None:
+                return
+            self.deliver(*item)
+
+    def deliver(self, message, queued_at):
+        """Sends one message, retrying with backoff."""
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                self.pool.send(message)
+            except Exception as e:
+                self.last_error = e
+                if attempt < self.max_retries:
+                    self.counters['retries'] += 1
+                    self.stop_event.wait(self.retry_backoff * 2 ** attempt)
+                continue
+            finished = time.perf_counter()
+            self.send_seconds.append(finished - started)
+            self.lags.append(finished - queued_at)
+            self.counters['sent'] += 1
+            self.last_error = None
+            return True
+        self.counters['failed'] += 1
+        return False
+
+    # --- Metrics ---
+    def metrics(self):
+        sends = np.asarray(self.send_seconds)
+        lags = np.asarray(self.lags)
+        with self.digest_lock:
+            collecting = sum(digest.count for digest in self.digests.values())
+        return dict(
+            self.counters,
+            waiting=self.incoming.qsize() + self.ready.qsize() + len(self.deferred),
+            digest_alerts=collecting,
+            connections_opened=self.pool.connections_opened,
+            send_p50_ms=round(float(np.percentile(sends, 50)) * 1000, 1) if len(sends) else None,
+            lag_p95_ms=round(float(np.percentile(lags, 95)) * 1000, 1) if len(lags) else None,
+            last_error=str(self.last_error) if self.last_error else None,
+        )
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """The process-wide dispatcher, configured from the environment and started on first use."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher().start()
+            atexit.register(_dispatcher.stop)
+        return _dispatcher
+
+
+# --- Local SMTP stand-in ---
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, *lines):
+        if self.server.latency:
+            time.sleep(self.server.latency)  # one network round-trip per reply
+        self.wfile.write(''.join(f"{line}\r\n" for line in lines).encode())
+
+    def handle(self):
+        with self.server.lock:
+            self.server.sessions += 1
+        self.reply('220 localhost IDS local SMTP')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self.reply('250-localhost', '250 8BITMIME')
+            elif verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = command[10:].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command[8:].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for line in self.rfile:
+                    if line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(line[1:] if line.startswith(b'..') else line)
+                self.server.store(sender, recipients, b''.join(data))
+                self.reply('250 OK queued')
+            elif verb in ('NOOP', 'RSET'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Accepts mail on localhost and keeps it in `messages` (email.message.Message).
+    No STARTTLS or AUTH. `latency` seconds are added to every reply to stand in
+    for a remote server's round-trips; `sessions` counts connections.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, on_message=None):
+        super().__init__((host, port), _SMTPHandler)
+        self.latency = latency
+        self.on_message = on_message
+        self.messages = []
+        self.sessions = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def store(self, sender, recipients, data):
+        message = message_from_bytes(data)
+        with self.lock:
+            self.messages.append(message)
+        if self.on_message is not None:
+            self.on_message(message)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True, name='local-smtp').start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local SMTP stand-in or send a test email.")
+    parser.add_argument('--local-smtp', action='store_true', help="Serve the in-memory SMTP stand-in until Ctrl+C")
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--test-email', metavar='ADDRESS', help="Send one test message through the dispatcher")
+    args = parser.parse_args()
+
+    try:
+        if args.local_smtp:
+            server = LocalSMTPServer(port=args.port, on_message=lambda message: print(
+                f"📧 {datetime.now():%H:%M:%S} to {message['To']}: {message['Subject']}"))
+            print(f"🔹 Local SMTP listening on 127.0.0.1:{server.port}")
+            server.serve_forever()
+        elif args.test_email:
+            dispatcher = NotificationDispatcher(workers=1).start()
+            if not dispatcher.sender:
+                print("❌ Set SENDER_EMAIL (and SMTP_SERVER, SMTP_PORT, SENDER_PASSWORD) first")
+                sys.exit(1)
+            dispatcher.send(args.test_email, "IDS test email", "<p>Email notifications are working.</p>")
+            dispatcher.stop()
+            metrics = dispatcher.metrics()
+            if metrics['sent']:
+                print(f"✅ Sent to {args.test_email} in {metrics['send_p50_ms']:,.0f} ms")
+            else:
+                print(f"❌ Not sent: {metrics['last_error']}")
+                sys.exit(1)
+        else:
+            parser.print_help()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,295 @@
+"""
+Out-of-Core Training
+====================
+Trains the scaler, XGBoost, the Autoencoder and the Isolation Forest from
+sharded data that does not fit in memory (e.g. CICIDS2017 + CSE-CIC-IDS2018 +
+our own captures). Everything is driven from one chunked source:
+
+  * Pass 1 fits the StandardScaler with `partial_fit` and collects the labels.
+  * XGBoost trains from an external-memory DMatrix fed by a `DataIter`.
+  * The Autoencoder is fed by a streaming batch generator (tf.data) and its
+    threshold comes from a streaming quantile sketch of held-out errors.
+  * The Isolation Forest is trained on a reservoir sample of BENIGN rows.
+
+Supported shards:
+  * `.parquet` files with the feature columns plus a `Label` column (for
+    example the cleaned cache written by `data_preprocessing.py --parquet-cache`,
+    or the live feature vectors kept by `feature_store.py`)
+  * `.npy` float32 feature matrices with a sibling `<name>.labels.npy`
+
+Run: python out_of_core.py --shards preprocessed_cache/*.parquet captures/*.parquet
+"""
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from threshold_sketch import QuantileSketch, SKETCH_FILE, DEFAULT_TARGET_FPR
+from feature_schema import load_schema, save_schema, unpruned_schema, SCHEMA_FILE
+from feature_store import META_COLUMNS
+
+DEFAULT_CHUNK_ROWS = 250_000
+
+
+class ChunkedSource:
+    """
+    Iterates over shards in fixed-size chunks and assigns each row to the
+    train or test part deterministically, so every pass sees the same split.
+    """
+
+    def __init__(self, shard_paths, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS, test_size=0.2, seed=42):
+        self.shard_paths = list(shard_paths)
+        if not self.shard_paths:
+            raise FileNotFoundError("No shards given")
+        self.columns = list(columns) if columns is not None else self._shard_columns(self.shard_paths[0])
+        self.chunk_rows = chunk_rows
+        self.test_size = test_size
+        self.seed = seed
+        self.scaler = None
+        self.label_encoder = None
+
+    @staticmethod
+    def _shard_columns(path):
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            # Feature-store shards also carry alert metadata next to the features
+            return [name for name in pq.ParquetFile(path).schema_arrow.names if name not in META_COLUMNS]
+        return list(joblib.load('model_columns.pkl'))
+
+    def _raw_chunks(self, path):
+        """Yields (features float32, string labels) for one shard."""
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(path)
+            available = set(parquet_file.schema_arrow.names)
+            missing = [col for col in self.columns if col not in available]
+            if missing:
+                print(f"⚠️  {os.path.basename(path)} lacks {len(missing)} feature column(s); filling with 0")
+            wanted = [col for col in self.columns if col in available] + ['Label']
+            for batch in parquet_file.iter_batches(batch_size=self.chunk_rows, columns=wanted):
+                df = batch.to_pandas().reindex(columns=self.columns + ['Label'], fill_value=0)
+                yield df[self.columns].to_numpy(dtype=np.float32), df['Label'].astype(str).to_numpy()
+        elif path.endswith('.npy'):
+            X = np.load(path, mmap_mode='r')
+            labels = np.load(path[:-len('.npy')] + '.labels.npy', mmap_mode='r', allow_pickle=False)
+            for start in range(0, len(X), self.chunk_rows):
+                yield (np.asarray(X[start:start + self.chunk_rows], dtype=np.float32),
+                       np.asarray(labels[start:start + self.chunk_rows]).astype(str))
+        else:
+            raise ValueError(f"Unsupported shard type: {path}")
+
+    def chunks(self, part='all', scaled=True, encoded=True):
+        """
+        Yields cleaned (X, y) chunks from `part` ('train', 'test' or 'all').
+        X is scaled and y label-encoded once `fit_preprocessors` has run.
+        """
+        for shard_idx, path in enumerate(self.shard_paths):
+            for chunk_idx, (X, labels) in enumerate(self._raw_chunks(path)):
+                keep = np.isfinite(X).all(axis=1)
+                if part != 'all':
+                    rng = np.random.default_rng([self.seed, shard_idx, chunk_idx])
+                    in_test = rng.random(len(X)) < self.test_size
+                    keep &= in_test if part == 'test' else ~in_test
+                if not keep.all():
+                    X, labels = X[keep], labels[keep]
+                if not len(X):
+                    continue
+                if scaled and self.scaler is not None:
+                    X = self.scaler.transform(X)
+                y = self.label_encoder.transform(labels).astype(np.int32) if encoded and self.label_encoder else labels
+                yield X, y
+
+    def fit_preprocessors(self):
+        """Pass 1: fits the scaler incrementally and the label encoder on all labels seen."""
+        scaler = StandardScaler()
+        labels_seen = set()
+        n_rows = 0
+        for X, labels in self.chunks(part='all', scaled=False, encoded=False):
+            scaler.partial_fit(X)
+            labels_seen.update(np.unique(labels).tolist())
+            n_rows += len(X)
+        self.scaler = scaler
+        self.label_encoder = LabelEncoder().fit(sorted(labels_seen))
+        print(f"✅ Scaler fitted on {n_rows:,} rows, {len(self.label_encoder.classes_)} classes")
+        return n_rows
+
+    def benign_label(self):
+        return int(self.label_encoder.transform(['BENIGN'])[0])
+
+
+# --- XGBoost from external memory ---
+def _make_shard_iter(source, part, cache_prefix):
+    import xgboost as xgb
+
+    class ShardDataIter(xgb.DataIter):
+        """Feeds scaled chunks to XGBoost; pages are cached on disk under `cache_prefix`."""
+
+        def __init__(self):
+            self._chunks = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self._chunks is None:
+                self._chunks = source.chunks(part)
+            try:
+                X, y = next(self._chunks)
+            except StopIteration:
+                return 0
+            input_data(data=X, label=y)
+            return 1
+
+        def reset(self):
+            self._chunks = None
+
+    return ShardDataIter()
+
+
+def train_xgboost_external(source, cache_dir='xgb_cache', num_boost_round=500, n_jobs=-1):
+    import xgboost as xgb
+    from xgb_model_io import save_xgb_model, XGB_MODEL_FILE
+
+    os.makedirs(cache_dir, exist_ok=True)
+    dtrain = xgb.DMatrix(_make_shard_iter(source, 'train', os.path.join(cache_dir, 'train')))
+    dvalid = xgb.DMatrix(_make_shard_iter(source, 'test', os.path.join(cache_dir, 'valid')))
+    params = {
+        'objective': 'multi:softprob',
+        'num_class': len(source.label_encoder.classes_),
+        'tree_method': 'hist',
+        'eval_metric': 'mlogloss',
+        'nthread': n_jobs if n_jobs and n_jobs > 0 else os.cpu_count(),
+        'seed': 42,
+    }
+    print("--- Training XGBoost from external memory ---")
+    booster = xgb.train(params, dtrain, num_boost_round=num_boost_round, evals=[(dvalid, 'valid')],
+                        early_stopping_rounds=20, verbose_eval=25)
+    booster = booster[:booster.best_iteration + 1]
+    save_xgb_model(booster, {
+        'objective': 'multi:softprob',
+        'num_class': params['num_class'],
+        'n_features': len(source.columns),
+        'class_names': [str(name) for name in source.label_encoder.classes_],
+        'best_iteration': int(booster.num_boosted_rounds() - 1),
+    })
+    print(f"💾 XGBoost model saved to '{XGB_MODEL_FILE}'")
+    return booster
+
+
+# --- Autoencoder from a streaming batch generator ---
+def benign_batches(source, part, batch_size, shuffle=True, seed=42):
+    """Yields BENIGN-only batches; rows are shuffled within each chunk."""
+    rng = np.random.default_rng(seed)
+    benign = source.benign_label()
+    for X, y in source.chunks(part):
+        X = X[y == benign]
+        if shuffle:
+            X = X[rng.permutation(len(X))]
+        for start in range(0, len(X), batch_size):
+            batch = X[start:start + batch_size]
+            yield batch, batch
+
+
+def train_autoencoder_streaming(source, batch_size=1024, epochs=50):
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from train_autoencoder import build_autoencoder, scaled_learning_rate
+
+    n_features = len(source.columns)
+    signature = (tf.TensorSpec(shape=(None, n_features), dtype=tf.float32),
+                 tf.TensorSpec(shape=(None, n_features), dtype=tf.float32))
+
+    def dataset(part, shuffle):
+        return tf.data.Dataset.from_generator(
+            lambda: benign_batches(source, part, batch_size, shuffle=shuffle),
+            output_signature=signature).prefetch(tf.data.AUTOTUNE)
+
+    print("--- Training Autoencoder from streaming batches ---")
+    autoencoder = build_autoencoder(n_features, learning_rate=scaled_learning_rate(batch_size))
+    early_stopping = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    autoencoder.fit(dataset('train', True), epochs=epochs, validation_data=dataset('test', False),
+                    callbacks=[early_stopping], verbose=1)
+
+    # Benign error sketch accumulated chunk by chunk over held-out BENIGN rows
+    sketch = QuantileSketch()
+    for batch, _ in benign_batches(source, 'test', batch_size * 16, shuffle=False):
+        sketch.update(np.mean(np.square(batch - autoencoder.predict(batch, verbose=0)), axis=1))
+    threshold = sketch.threshold_for_fpr(DEFAULT_TARGET_FPR)
+    print(f"Calculated Anomaly Threshold ({DEFAULT_TARGET_FPR:.2%} FPR): {threshold:.4f}")
+
+    autoencoder.save('ids_autoencoder_model.keras')
+    joblib.dump(threshold, 'autoencoder_threshold.pkl')
+    sketch.save(SKETCH_FILE)
+    print("💾 Autoencoder model saved to 'ids_autoencoder_model.keras'")
+    print("💾 Anomaly threshold saved to 'autoencoder_threshold.pkl'")
+    return autoencoder, threshold
+
+
+# --- Isolation Forest on a reservoir sample ---
+def reservoir_sample(chunks, k, seed=42):
+    """Uniform sample of k rows from a stream of row chunks (vectorised Algorithm R)."""
+    rng = np.random.default_rng(seed)
+    reservoir = None
+    seen = 0
+    for X in chunks:
+        if reservoir is None:
+            reservoir = np.empty((k, X.shape[1]), dtype=X.dtype)
+        fill = min(max(k - seen, 0), len(X))
+        reservoir[seen:seen + fill] = X[:fill]
+        rest = X[fill:]
+        if len(rest):
+            positions = seen + fill + np.arange(len(rest))
+            slots = (rng.random(len(rest)) * (positions + 1)).astype(np.int64)
+            take = slots < k
+            # Duplicate slots keep the later row, matching the sequential algorithm
+            reservoir[slots[take]] = rest[take]
+        seen += len(X)
+    if reservoir is None:
+        raise ValueError("No rows available for sampling")
+    return reservoir[:min(seen, k)]
+
+
+def train_iforest_sampled(source, sample_size=200_000, n_jobs=-1):
+    from sklearn.ensemble import IsolationForest
+
+    benign = source.benign_label()
+    sample = reservoir_sample((X[y == benign] for X, y in source.chunks('train')), sample_size)
+    print(f"--- Training Isolation Forest on a reservoir sample of {len(sample):,} BENIGN rows ---")
+    iforest_model = IsolationForest(n_estimators=100, contamination='auto', random_state=42, n_jobs=n_jobs)
+    iforest_model.fit(sample)
+    joblib.dump(iforest_model, 'ids_iforest_model.pkl')
+    print("💾 Unsupervised model saved to 'ids_iforest_model.pkl'")
+    return iforest_model
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the IDS models from shards larger than RAM.")
+    parser.add_argument('--shards', nargs='+', required=True, help=".parquet files or .npy feature matrices")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--models', nargs='+', default=['xgb', 'autoencoder', 'iforest'],
+                        choices=['xgb', 'autoencoder', 'iforest'])
+    parser.add_argument('--reservoir-size', type=int, default=200_000)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    args = parser.parse_args()
+
+    # Reuse the pruned column list from an earlier in-memory preprocessing run if there is one
+    schema = load_schema()
+    source = ChunkedSource(sorted(args.shards), columns=schema['columns'] if schema else None,
+                           chunk_rows=args.chunk_rows)
+    source.fit_preprocessors()
+    joblib.dump(source.scaler, 'scaler.pkl')
+    joblib.dump(source.label_encoder, 'label_encoder.pkl')
+    joblib.dump(pd.Index(source.columns), 'model_columns.pkl')
+    if schema is None:
+        save_schema(unpruned_schema(source.columns), SCHEMA_FILE)
+    print("💾 Scaler, label encoder and model columns saved")
+
+    if 'xgb' in args.models:
+        train_xgboost_external(source)
+    if 'autoencoder' in args.models:
+        train_autoencoder_streaming(source, batch_size=args.batch_size)
+    if 'iforest' in args.models:
+        train_iforest_sampled(source, sample_size=args.reservoir_size)
+
+    print("\n✅ Out-of-core training complete!")
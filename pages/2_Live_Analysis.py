@@ -3,23 +3,27 @@ from auth import require_login
 import pandas as pd
 import joblib
 import numpy as np
-from scapy.all import sniff, IP, TCP, UDP
+from scapy.all import sniff
 import time
 import threading
+from collections import deque
 from tensorflow.keras.models import load_model
-from queue import Queue
-from database_setup import Session, Alert
-from datetime import datetime
+from alert_queries import AlertFeed, alert_filter_controls, render_alert_log
+from feature_schema import load_schema
+from live_pipeline import LivePipeline
+from alert_writer import AlertWriter
+from alert_aggregator import IncidentAggregator
+from alert_archive import stream_writer
+from alert_storage import RollupCounter, ensure_partitions
+from feature_store import FeatureStore
+from notifications import ALERT_RECIPIENTS, get_dispatcher
+from threshold_sketch import QuantileSketch, SKETCH_FILE, TARGET_FPR_CHOICES, DEFAULT_TARGET_FPR
 
 st.set_page_config(page_title="Advanced Live IDS", layout="wide")
 require_login()
 st.title("🛡️ Advanced Live IDS")
 st.write("Real-time network intrusion detection using packet capture.")
 
-# --- Global state ---
-packet_queue = Queue()
-results_queue = Queue()
-
 # --- Load Assets ---
 @st.cache_resource
 def load_assets():
@@ -30,130 +34,78 @@ def load_assets():
         scaler = joblib.load('scaler.pkl')
         label_encoder = joblib.load('label_encoder.pkl')
         model_columns = joblib.load('model_columns.pkl')
-        return rf_model, autoencoder_model, autoencoder_threshold, scaler, label_encoder, model_columns
+        feature_schema = load_schema()
+        return rf_model, autoencoder_model, autoencoder_threshold, scaler, label_encoder, model_columns, feature_schema
     except FileNotFoundError as e:
         st.error(f"❌ Error loading assets: {e}")
-        return None, None, None, None, None, None
+        return None, None, None, None, None, None, None
+
+rf_model, autoencoder_model, autoencoder_threshold, scaler, label_encoder, model_columns, feature_schema = load_assets()
+
+
+@st.cache_resource
+def load_threshold_sketch():
+    """Benign reconstruction-error sketch saved with the autoencoder (None for older models)."""
+    try:
+        return QuantileSketch.load(SKETCH_FILE)
+    except FileNotFoundError:
+        return None
+
+
+# --- Anomaly threshold selection ---
+threshold_sketch = load_threshold_sketch()
+learn_from_live = False
+if threshold_sketch is not None:
+    st.sidebar.subheader("Anomaly Threshold")
+    target_fpr = st.sidebar.selectbox("Target false-positive rate", TARGET_FPR_CHOICES,
+                                      index=TARGET_FPR_CHOICES.index(DEFAULT_TARGET_FPR),
+                                      format_func=lambda fpr: f"{fpr:.2%}")
+    autoencoder_threshold = threshold_sketch.threshold_for_fpr(target_fpr)
+    st.sidebar.caption(f"Threshold: {autoencoder_threshold:.4f} (from {threshold_sketch.count:,} benign samples)")
+    learn_from_live = st.sidebar.checkbox("Learn from live BENIGN traffic", value=False,
+                                          help="Adds the errors of flows the Random Forest classifies as BENIGN to the sketch")
+    if st.sidebar.button("💾 Save threshold sketch"):
+        threshold_sketch.save(SKETCH_FILE)
+        st.sidebar.success(f"Saved to '{SKETCH_FILE}'")
 
-rf_model, autoencoder_model, autoencoder_threshold, scaler, label_encoder, model_columns = load_assets()
+RAW_ALERTS_SHOWN = 500
+REFRESH_SECONDS = 2
+# Streamlit 1.33+ can rerun just the live panel on a timer; older versions rerun the whole page
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
 
 # --- Initialize Session State ---
 if 'sniffing' not in st.session_state:
     st.session_state.sniffing = False
 if 'detected_alerts' not in st.session_state:
-    st.session_state.detected_alerts = []
+    st.session_state.detected_alerts = deque(maxlen=RAW_ALERTS_SHOWN)  # ring of the newest raw alerts
+    st.session_state.alerts_received = 0
+    st.session_state.alert_feed = AlertFeed()
 
-# --- Packet Processing ---
-def get_flow_key(packet):
-    """Extract 5-tuple from packet."""
-    try:
-        if IP in packet:
-            if TCP in packet:
-                return (packet[IP].src, packet[TCP].sport, packet[IP].dst, packet[TCP].dport, 6)
-            elif UDP in packet:
-                return (packet[IP].src, packet[UDP].sport, packet[IP].dst, packet[UDP].dport, 17)
-    except:
-        pass
-    return None
-
-def process_packet(packet):
-    """Capture packet and put in queue."""
-    flow_key = get_flow_key(packet)
-    if flow_key:
-        packet_queue.put((flow_key, len(packet)))
-
-# --- Analysis Thread ---
-def analyze_packets():
-    """Continuously analyze buffered packets."""
-    packet_buffer = []
-    
-    while st.session_state.get('sniffing', False):
-        time.sleep(2)  # Analyze every 2 seconds
-        
-        # Collect buffered packets
-        while not packet_queue.empty() and len(packet_buffer) < 100:
-            try:
-                packet_buffer.append(packet_queue.get_nowait())
-            except:
-                break
-        
-        if not packet_buffer:
-            continue
-        
-        # Process batch
-        try:
-            flows_to_predict = []
-            for flow_key, pkt_len in packet_buffer:
-                features = {col: 0 for col in model_columns}
-                features['Flow Duration'] = 100000
-                features['Tot Fwd Pkts'] = 1
-                features['TotLen Fwd Pkts'] = pkt_len
-                features['Fwd Pkt Len Max'] = pkt_len
-                features['Fwd Pkt Len Min'] = pkt_len
-                features['Fwd Pkt Len Mean'] = pkt_len
-                features['Fwd Pkt Len Std'] = 0
-                features['Fwd Pkts/s'] = 1
-                features['Fwd IAT Mean'] = 0
-                features['Fwd IAT Std'] = 0
-                features['Fwd IAT Max'] = 0
-                features['Fwd IAT Min'] = 0
-                
-                flows_to_predict.append((flow_key, features))
-            
-            # Convert to DataFrame
-            df_predict = pd.DataFrame([f for _, f in flows_to_predict]).reindex(columns=model_columns, fill_value=0)
-            X_scaled = scaler.transform(df_predict)
-            
-            # Predictions
-            rf_preds = label_encoder.inverse_transform(rf_model.predict(X_scaled))
-            reconstructions = autoencoder_model.predict(X_scaled, verbose=0)
-            mse = np.mean(np.power(X_scaled - reconstructions, 2), axis=1)
-            ae_preds = (mse > autoencoder_threshold)
-            
-            # Find attacks
-            for idx, (flow_key, _) in enumerate(flows_to_predict):
-                is_attack = (rf_preds[idx] != 'BENIGN') or ae_preds[idx]
-                
-                if is_attack:
-                    src_ip, src_port, dst_ip, dst_port, proto = flow_key
-                    alert = {
-                        'timestamp': datetime.now(),
-                        'Source IP': src_ip,
-                        'Source Port': src_port,
-                        'Destination IP': dst_ip,
-                        'Destination Port': dst_port,
-                        'Protocol': proto,
-                        'Attack Type': str(rf_preds[idx]),
-                        'Anomaly MSE': float(mse[idx]),
-                        'Threshold': float(autoencoder_threshold)
-                    }
-                    
-                    # Log to database
-                    session = Session()
-                    try:
-                        db_alert = Alert(
-                            timestamp=alert['timestamp'],
-                            source_port=alert['Source Port'],
-                            destination_port=alert['Destination Port'],
-                            protocol=alert['Protocol'],
-                            total_length_fwd_packets=0,
-                            known_attack_type=alert['Attack Type'],
-                            anomaly_detected=ae_preds[idx]
-                        )
-                        session.add(db_alert)
-                        session.commit()
-                    except Exception as e:
-                        session.rollback()
-                    finally:
-                        session.close()
-                    
-                    results_queue.put(alert)
-            
-            packet_buffer.clear()
-            
-        except Exception as e:
-            st.error(f"Analysis error: {e}")
-            packet_buffer.clear()
+# --- Detection pipeline ---
+# Kept in session_state so its queues and counters survive Streamlit reruns
+def get_pipeline():
+    if 'live_pipeline' not in st.session_state:
+        assets = {'scaler': scaler, 'rf_model': rf_model, 'label_encoder': label_encoder,
+                  'autoencoder': autoencoder_model, 'model_columns': model_columns, 'feature_schema': feature_schema}
+        # Alerts are collapsed into incidents; incidents and a sample of raw alerts are written in the
+        # background, so the analyzer never waits on the database. Every alert is counted into the rollups
+        # Every alert also goes to the Parquet archive's stream (alert_archive.py) for investigation
+        st.session_state.alert_writer = AlertWriter()
+        st.session_state.archive_stream = stream_writer()
+        st.session_state.incidents = IncidentAggregator(raw_sink=st.session_state.alert_writer,
+                                                        rollups=RollupCounter(),
+                                                        stream_sink=st.session_state.archive_stream)
+        # Feature vectors of alerts (and a sample of benign flows) are kept for explanation and retraining
+        st.session_state.feature_store = FeatureStore(model_columns)
+        # With ALERT_EMAIL_RECIPIENTS set, alerts are also mailed out as rate-limited digests
+        st.session_state.live_pipeline = LivePipeline(assets, autoencoder_threshold,
+                                                      alert_sink=st.session_state.incidents,
+                                                      feature_store=st.session_state.feature_store,
+                                                      notifier=get_dispatcher() if ALERT_RECIPIENTS else None)
+    pipeline = st.session_state.live_pipeline
+    pipeline.threshold = autoencoder_threshold
+    pipeline.threshold_sketch = threshold_sketch if learn_from_live else None
+    return pipeline
 
 # --- UI Controls ---
 col1, col2 = st.columns(2)
@@ -161,16 +113,24 @@ col1, col2 = st.columns(2)
 if col1.button('🔴 Start Capture', type="primary", key="start"):
     if not st.session_state.sniffing:
         st.session_state.sniffing = True
-        st.session_state.detected_alerts = []
+        st.session_state.detected_alerts = deque(maxlen=RAW_ALERTS_SHOWN)
+        st.session_state.alerts_received = 0
         
         # Start analyzer thread
-        analyzer = threading.Thread(target=analyze_packets, daemon=True)
-        analyzer.start()
+        pipeline = get_pipeline()
+        try:
+            ensure_partitions()  # no-op unless alerts is partitioned (PostgreSQL)
+        except Exception as e:
+            print(f"⚠️ Could not create alert partitions: {e}")  # alerts still land in the default partition
+        st.session_state.alert_writer.start()
+        st.session_state.archive_stream.start()
+        st.session_state.incidents.start()
+        pipeline.start()
         
         # Start sniffer thread
         def sniff_packets():
-            sniff(prn=process_packet, store=0, iface=None, 
-                  stop_filter=lambda p: not st.session_state.sniffing)
+            sniff(prn=pipeline.process_packet, store=0, iface=None,
+                  stop_filter=lambda p: pipeline.stop_event.is_set())
         
         sniffer = threading.Thread(target=sniff_packets, daemon=True)
         sniffer.start()
@@ -179,61 +139,93 @@ if col1.button('🔴 Start Capture', type="primary", key="start"):
 
 if col2.button('⏹️ Stop Capture', key="stop"):
     st.session_state.sniffing = False
+    get_pipeline().stop()
+    st.session_state.incidents.stop()  # writes open incidents, then flushes the alert writer and archive stream
     st.rerun()
 
-if st.session_state.sniffing:
-    st.success("🟢 **CAPTURING** - Run nmap now: `nmap -sS -p 1-1000 localhost`")
-    
-    # Poll for results
-    while not results_queue.empty():
-        try:
-            alert = results_queue.get_nowait()
-            st.session_state.detected_alerts.append(alert)
-        except:
-            break
-    
-    # Display detected attacks
-    if st.session_state.detected_alerts:
+# --- Live panel ---
+# Everything drawn here is bounded: new alerts are drained from the pipeline into a fixed-size ring, the
+# incident table is capped, and the database feed only reads rows added since its last poll
+def live_panel():
+    pipeline = get_pipeline()
+    new_alerts = pipeline.poll_alerts()
+    st.session_state.detected_alerts.extend(new_alerts)
+    st.session_state.alerts_received += len(new_alerts)
+    stats = pipeline.stats
+    st.caption(f"Packets: {stats['packets']:,} | Dropped: {stats['dropped']:,} | Flows scored: {stats['flows']:,} "
+               f"| Alerts: {stats['alerts']:,} | Queued: {pipeline.packet_queue.qsize():,}")
+    writer = st.session_state.alert_writer.metrics()
+    incidents = st.session_state.incidents.metrics()
+    st.caption(f"Incidents: {incidents['open_incidents']:,} open, {incidents['incidents_closed']:,} closed "
+               f"| Raw alerts kept: {incidents['raw_forwarded']:,} of {incidents['alerts']:,} "
+               f"| DB writes: {writer['written']:,} in {writer['batches']:,} batches | Queued: {writer['queued']:,} "
+               f"| Lag p95: {writer['lag_p95_ms'] or 0:,.0f} ms | Spilled to disk: {writer['spilled']:,}")
+    if pipeline.last_error is not None:
+        st.error(f"Analysis error: {pipeline.last_error}")
+    if writer['last_error']:
+        st.warning(f"Alert writer: {writer['last_error']}")
+    stream = st.session_state.archive_stream.metrics()
+    if stream['last_error']:
+        st.warning(f"Archive stream: {stream['last_error']} ({stream['spilled']:,} alerts spilled to disk)")
+    if incidents['last_error']:
+        st.warning(f"Incidents: {incidents['last_error']} ({incidents['pending_closed']:,} closed incidents waiting, "
+                   f"{incidents['incidents_dropped']:,} dropped)")
+    rollups = st.session_state.incidents.rollups.metrics()
+    if rollups['last_error']:
+        st.warning(f"Alert rollups: {rollups['last_error']} ({rollups['pending_keys']:,} counts waiting, "
+                   f"{rollups['alerts_dropped']:,} alerts dropped from the counts)")
+    features = st.session_state.feature_store.metrics()
+    st.caption(f"Feature vectors kept: {features['alert']:,} alerts, {features['benign']:,} benign "
+               f"| Written: {features['rows_written']:,} in {features['shards_written']:,} shards "
+               f"({features['mb_on_disk']:,.1f} MB) | Buffered: {features['pending']:,}")
+    if features['last_error']:
+        st.warning(f"Feature store: {features['last_error']}")
+    if pipeline.notifier is not None:
+        mail = pipeline.notifier.metrics()
+        st.caption(f"Alert emails: {mail['digests']:,} digests, {mail['sent']:,} emails sent "
+                   f"| Collecting: {mail['digest_alerts']:,} alerts | Failed: {mail['failed']:,}")
+        if mail['last_error']:
+            st.warning(f"Alert emails: {mail['last_error']}")
+
+    # Display detected attacks, one row per incident
+    if st.session_state.alerts_received:
         st.write("---")
         st.header("🚨 Detected Attacks")
-        df_alerts = pd.DataFrame(st.session_state.detected_alerts)
-        st.dataframe(df_alerts, use_container_width=True)
+        st.dataframe(pd.DataFrame(st.session_state.incidents.snapshot()), use_container_width=True)
+        with st.expander(f"Raw alerts (newest {len(st.session_state.detected_alerts):,} "
+                         f"of {st.session_state.alerts_received:,})"):
+            st.dataframe(pd.DataFrame(list(st.session_state.detected_alerts)), use_container_width=True)
     else:
         st.info("⏳ Waiting for attacks... (Scanning now?)")
-    
-    time.sleep(2)
-    st.rerun()
+
+    # Alerts stored by every sensor writing to this database
+    feed = st.session_state.alert_feed
+    try:
+        feed.poll()
+        with st.expander(f"Stored alerts, all sensors (newest {len(feed.rows):,})"):
+            st.dataframe(feed.frame(), use_container_width=True)
+    except Exception as e:
+        st.warning(f"Alert feed: {e}")
+
+
+if fragment is not None:
+    live_panel = fragment(run_every=REFRESH_SECONDS)(live_panel)
+
+if st.session_state.sniffing:
+    st.success("🟢 **CAPTURING** - Run nmap now: `nmap -sS -p 1-1000 localhost`")
+    live_panel()
+    if fragment is None:
+        time.sleep(REFRESH_SECONDS)
+        st.rerun()
 else:
     st.info("Click **Start Capture** to begin monitoring")
 
 # --- Historical Alert Log ---
+# Filtered and paged in SQL and cached for a few seconds; with fragments it is not redrawn by the live panel's reruns
 st.write("---")
 st.header("📊 Historical Alert Log")
 
-session = Session()
 try:
-    alerts = session.query(Alert).order_by(Alert.timestamp.desc()).limit(500).all()
-    if alerts:
-        df_log = pd.DataFrame([{
-            'Timestamp': a.timestamp,
-            'Source Port': a.source_port,
-            'Destination Port': a.destination_port,
-            'Protocol': a.protocol,
-            'Attack Type': a.known_attack_type,
-            'Is Anomaly': a.anomaly_detected
-        } for a in alerts])
-        
-        # Filters
-        col_filter1, col_filter2 = st.columns(2)
-        attack_types = df_log['Attack Type'].unique().tolist()
-        selected_attack = col_filter1.multiselect('Filter by Attack Type', attack_types, default=attack_types)
-        df_filtered = df_log[df_log['Attack Type'].isin(selected_attack)]
-        
-        st.dataframe(df_filtered, use_container_width=True)
-        st.write(f"**Total alerts: {len(df_filtered)}**")
-    else:
-        st.info("No alerts in database yet.")
+    render_alert_log('live_log', alert_filter_controls('live_log'))
 except Exception as e:
     st.error(f"Error loading alerts: {e}")
-finally:
-    session.close()
@@ -5,9 +5,11 @@ import joblib
 import seaborn as sns
 import matplotlib.pyplot as plt
 from sklearn.metrics import classification_report, confusion_matrix, roc_curve, auc
-import numpy as np
 import os
-from database_setup import Session, Alert
+from datetime import date, timedelta
+from alert_storage import port_label, rollup_counts, rollup_series
+from split_store import load_split
+from alert_queries import alert_filter_controls, render_alert_log, count_alerts_by
 
 
 # --- Simple User Authentication ---
@@ -22,12 +24,12 @@ st.write("This page shows the performance of the trained Random Forest model and
 @st.cache_resource
 def load_assets_for_evaluation():
     try:
-        _, X_test, _, y_test = joblib.load('train_test_data.pkl')
+        X_test, y_test = load_split('X_test', 'y_test')
         model = joblib.load('ids_rf_model.pkl')
         label_encoder = joblib.load('label_encoder.pkl')
         return X_test, y_test, model, label_encoder
     except FileNotFoundError:
-        st.error("Could not find necessary .pkl files. Please run the training scripts first.")
+        st.error("Could not find the preprocessed test split or model files. Please run the preprocessing and training scripts first.")
         return None, None, None, None
 
 # --- Load data ---
@@ -80,42 +82,57 @@ if model is not None:
         st.info("Model does not support probability prediction for ROC curve.")
 
     # --- HISTORICAL LOG SECTION - READING FROM DATABASE ---
+    # Filters, counts and paging run in SQL over the whole history (alert_queries.py); totals come from incidents
     st.write("---")
     st.header("Historical Alert Log")
-    session = Session()
     try:
-        alerts = session.query(Alert).order_by(Alert.timestamp.desc()).limit(1000).all() # Get last 1000 alerts
-        if alerts:
-            df_log = pd.DataFrame([alert.__dict__ for alert in alerts])
-            if '_sa_instance_state' in df_log.columns:
-                df_log = df_log.drop(columns=['_sa_instance_state'])
+        st.subheader("Filter Alerts")
+        filters = alert_filter_controls('perf_log')
+        if render_alert_log('perf_log', filters) == 0:
+            st.info("No alerts match these filters. Start the live analysis to generate alerts.")
+        elif st.checkbox("Break down all matching alerts by attack type", key='perf_log_breakdown'):
+            st.dataframe(count_alerts_by('known_attack_type', filters).rename('Alerts'), use_container_width=True)
+    except Exception as e:
+        st.error(f"Error retrieving alerts from database: {e}")
+
+    # --- ALERT HISTORY SECTION - READING FROM THE ROLLUP TABLES ---
+    # Counts come from the per-minute/hour rollups (every alert, not just the sampled raw rows),
+    # so ranges of months stay fast
+    st.write("---")
+    st.header("Alert History")
+    today = date.today()
+    history_range = st.date_input("History Range", [today - timedelta(days=30), today], key='history_range')
+    if len(history_range) == 2:
+        start = pd.Timestamp(history_range[0]).to_pydatetime()
+        end = (pd.Timestamp(history_range[1]) + pd.Timedelta(days=1)).to_pydatetime()
+        try:
+            type_counts = rollup_counts(start, end)
+            if type_counts.empty:
+                st.info("No alerts in this range.")
+            else:
+                history_attack = st.selectbox("History Attack Type",
+                                              ["All"] + type_counts['known_attack_type'].tolist())
+                attack_filter = None if history_attack == "All" else history_attack
 
-            # --- Filtering UI ---
-            st.subheader("Filter Alerts")
-            attack_types = df_log['known_attack_type'].unique().tolist()
-            selected_attack = st.selectbox("Attack Type", ["All"] + attack_types)
-            min_date = df_log['timestamp'].min()
-            max_date = df_log['timestamp'].max()
-            date_range = st.date_input("Date Range", [min_date, max_date])
-            filtered = df_log.copy()
-            if selected_attack != "All":
-                filtered = filtered[filtered['known_attack_type'] == selected_attack]
-            if len(date_range) == 2:
-                filtered = filtered[(filtered['timestamp'] >= pd.to_datetime(date_range[0])) & (filtered['timestamp'] <= pd.to_datetime(date_range[1]))]
+                # --- Alert Count Plot ---
+                st.subheader("Alert Counts by Type")
+                fig_count, ax_count = plt.subplots()
+                type_counts.set_index('known_attack_type')['alerts'].plot(kind='bar', ax=ax_count)
+                ax_count.set_ylabel('Count')
+                ax_count.set_title('Alert Counts by Attack Type')
+                st.pyplot(fig_count)
 
-            st.dataframe(filtered)
+                st.subheader("Alerts Over Time")
+                series = rollup_series(start, end, attack_type=attack_filter)
+                fig_time, ax_time = plt.subplots(figsize=(12, 4))
+                series.plot(ax=ax_time)
+                ax_time.set_ylabel('Alerts')
+                st.pyplot(fig_time)
 
-            # --- Alert Count Plot ---
-            st.subheader("Alert Counts by Type")
-            alert_counts = filtered['known_attack_type'].value_counts()
-            fig_count, ax_count = plt.subplots()
-            alert_counts.plot(kind='bar', ax=ax_count)
-            ax_count.set_ylabel('Count')
-            ax_count.set_title('Alert Counts by Attack Type')
-            st.pyplot(fig_count)
-        else:
-            st.info("No alerts have been logged yet. Start the live analysis to generate alerts.")
-    except Exception as e:
-        st.error(f"Error retrieving alerts from database: {e}")
-    finally:
-        session.close()
\ No newline at end of file
+                st.subheader("Top Destination Ports")
+                ports = rollup_counts(start, end, by='destination_port', attack_type=attack_filter).head(20)
+                ports['destination_port'] = ports['destination_port'].map(port_label)
+                st.dataframe(ports.rename(columns={'destination_port': 'Destination Port', 'alerts': 'Alerts',
+                                                   'anomalies': 'Anomalies'}), use_container_width=True)
+        except Exception as e:
+            st.error(f"Error retrieving alert history: {e}")
@@ -1,5 +1,6 @@
 import streamlit as st
 from auth import require_login, list_invite_requests, approve_invite_request, reject_invite_request, rerun_streamlit
+from notifications import get_dispatcher
 
 require_login()
 
@@ -10,6 +11,13 @@ if not st.session_state.get('is_admin'):
 st.set_page_config(page_title="Admin - Invite Requests", layout="wide")
 st.title("🔔 Admin — Invite Requests")
 
+# --- Email delivery (emails are sent in the background) ---
+mail = get_dispatcher().metrics()
+if mail['queued']:
+    st.caption(f"Emails: {mail['sent']:,} sent | {mail['waiting']:,} waiting | {mail['failed']:,} failed")
+if mail['last_error']:
+    st.warning(f"Email delivery: {mail['last_error']}")
+
 # --- Filter by Status ---
 status_filter = st.selectbox("Filter by Status", ["All", "pending", "approved", "rejected"])
 filtered_status = None if status_filter == "All" else status_filter
@@ -0,0 +1,98 @@
+import time
+import streamlit as st
+import matplotlib.pyplot as plt
+from datetime import date, datetime, timedelta
+from auth import require_login
+from alert_archive import (ARCHIVE_DIR, DIMENSIONS, METRICS, TIME_BUCKETS, archive_attack_types, archive_status,
+                           connect, investigate)
+
+require_login()
+
+st.set_page_config(page_title="Alert Investigation", layout="wide")
+st.title("🔎 Alert Investigation")
+st.write("Ad-hoc questions over the full alert history: the Parquet alert archive, queried in-process with DuckDB.")
+
+# --- Archive connection ---
+# One DuckDB connection per server process; each query runs on its own cursor
+@st.cache_resource
+def get_connection():
+    return connect(ARCHIVE_DIR)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_attack_types():
+    return archive_attack_types(get_connection().cursor())
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def run_investigation(filters, group_by, metric, bucket, top_k):
+    started = time.perf_counter()
+    result = investigate(get_connection().cursor(), filters, group_by, metric, bucket, top_k)
+    return result, time.perf_counter() - started
+
+
+status = archive_status(ARCHIVE_DIR)
+if not status['files']:
+    st.info(f"No archived alerts in '{ARCHIVE_DIR}' yet. Export them with `python alert_archive.py --export`.")
+    st.stop()
+stream_note = (f"every alert since {status['stream_started']:%Y-%m-%d %H:%M}" if status['stream_started']
+               else "no streamed alerts yet")
+st.caption(f"Archive: {status['files']:,} files, {status['bytes'] / 1e6:,.1f} MB, "
+           f"from {status['first_date']}; {stream_note}")
+
+# --- Question ---
+st.subheader("Question")
+metric_col, group_col = st.columns(2)
+metric = metric_col.selectbox("Metric", list(METRICS), index=list(METRICS).index('Distinct Destination Ports'))
+group_by = group_col.multiselect("Group by", list(DIMENSIONS), default=['Source IP'])
+bucket_col, top_col = st.columns(2)
+bucket = bucket_col.selectbox("Time bucket", ['None'] + list(TIME_BUCKETS),
+                              help="With a bucket, the metric per bucket for each of the top groups")
+top_k = top_col.number_input("Top K groups", min_value=1, max_value=1000, value=20)
+
+# --- Filters ---
+st.subheader("Filters")
+today = date.today()
+type_col, date_col = st.columns(2)
+attack_types = type_col.multiselect("Attack Type", load_attack_types())
+date_range = date_col.date_input("Date Range", [today - timedelta(days=30), today])
+src_col, dst_col, flag_col = st.columns(3)
+src_ip = src_col.text_input("Source IP").strip()
+dst_ip = dst_col.text_input("Destination IP").strip()
+anomalies_only = flag_col.checkbox("Only anomalies")
+filters = {'attack_types': tuple(attack_types), 'src_ip': src_ip or None, 'dst_ip': dst_ip or None,
+           'anomalies_only': anomalies_only}
+if len(date_range) == 2:
+    filters['start'] = datetime.combine(date_range[0], datetime.min.time())
+    filters['end'] = datetime.combine(date_range[1], datetime.min.time()) + timedelta(days=1)
+
+# --- Answer ---
+st.write("---")
+try:
+    result, seconds = run_investigation(filters, tuple(group_by), metric,
+                                        None if bucket == 'None' else bucket, int(top_k))
+    st.caption(f"{len(result):,} rows in {seconds * 1000:,.0f} ms")
+    sampled_until = status['sampled_until']
+    if sampled_until is not None and filters.get('start', datetime.min) < sampled_until:
+        # Exported from the alerts table, which keeps only the first alerts of each incident and 1 in 100
+        st.warning(f"Alerts before {sampled_until:%Y-%m-%d %H:%M} were archived from the alerts table, which keeps "
+                   f"only a sample of each incident's alerts; counts and distinct values for that period undercount.")
+    if result.empty:
+        st.info("No archived alerts match this question.")
+    elif bucket == 'None':
+        st.dataframe(result, use_container_width=True)
+    else:
+        # One line per group: the group's dimension values joined into a label
+        labels = result[list(group_by)].astype(str).agg(' / '.join, axis=1) if group_by else metric
+        series = result.assign(Group=labels).pivot_table(index='Time', columns='Group', values=metric,
+                                                         aggfunc='first')
+        fig, ax = plt.subplots(figsize=(12, 5))
+        series.plot(ax=ax, legend=len(series.columns) <= 20)
+        ax.set_ylabel(metric)
+        st.pyplot(fig)
+        with st.expander("Data"):
+            st.dataframe(result, use_container_width=True)
+    if not result.empty:
+        st.download_button("Download CSV", result.to_csv(index=False), file_name="alert_investigation.csv")
+except Exception as e:
+    st.error(f"Error querying the alert archive: {e}")
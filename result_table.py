@@ -0,0 +1,123 @@
+"""
+Paginated Result Tables
+=======================
+Keeps large result sets server-side as NumPy column arrays and only sends the
+visible page to the browser. Sorting and filtering work on row-index arrays,
+so the underlying columns are never copied or reordered.
+
+Used by the File Analysis page. The historical alert-log views filter and page
+in SQL instead (alert_queries.py).
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+class ResultTable:
+    """A column-oriented result set with index-based filter, sort and paging."""
+
+    def __init__(self, columns):
+        self.columns = {name: np.asarray(values) for name, values in columns.items()}
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"All columns must have the same length, got {sorted(lengths)}")
+        self.n_rows = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_frame(cls, df):
+        """Wrap a DataFrame's columns without materialising a row-wise copy."""
+        return cls({col: df[col].to_numpy() for col in df.columns})
+
+    def __len__(self):
+        return self.n_rows
+
+    # --- Filters (each returns a boolean mask over all rows) ---
+    def mask_isin(self, column, values):
+        return np.isin(self.columns[column], list(values))
+
+    def mask_range(self, column, low=None, high=None):
+        values = self.columns[column]
+        mask = np.ones(self.n_rows, dtype=bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask
+
+    def mask_true(self, column):
+        return self.columns[column].astype(bool)
+
+    # --- Row selection ---
+    def select(self, mask=None, sort_by=None, ascending=True):
+        """Return the row indices that pass `mask`, ordered by `sort_by`."""
+        rows = np.arange(self.n_rows) if mask is None else np.flatnonzero(mask)
+        if sort_by is not None and len(rows):
+            order = np.argsort(self.columns[sort_by][rows], kind='stable')
+            if not ascending:
+                order = order[::-1]
+            rows = rows[order]
+        return rows
+
+    def page(self, rows, page, page_size):
+        """Materialise only the requested page of `rows` as a DataFrame."""
+        visible = rows[page * page_size:(page + 1) * page_size]
+        return pd.DataFrame({name: values[visible] for name, values in self.columns.items()})
+
+    def value_counts(self, column, rows=None):
+        values = self.columns[column] if rows is None else self.columns[column][rows]
+        labels, counts = np.unique(values.astype(str), return_counts=True)
+        return pd.Series(counts, index=labels, name='count').sort_values(ascending=False)
+
+
+def render_result_table(table, key, base_mask=None, category_columns=(), flag_columns=(),
+                        range_columns=(), default_sort=None, default_ascending=False, page_size=100):
+    """
+    Draws filter/sort/page controls for `table` and displays one page of rows.
+
+    Returns the selected row indices so callers can summarise the filtered set
+    (e.g. counts per class) without rebuilding a DataFrame.
+    """
+    mask = np.ones(len(table), dtype=bool) if base_mask is None else base_mask.copy()
+
+    if category_columns or flag_columns or range_columns:
+        filter_cols = st.columns(len(category_columns) + len(flag_columns) + len(range_columns))
+        widgets = iter(filter_cols)
+
+        for column in category_columns:
+            options = sorted(np.unique(table.columns[column][mask].astype(str)).tolist())
+            selected = next(widgets).multiselect(f"Filter by {column}", options, key=f"{key}_cat_{column}")
+            if selected:
+                mask &= table.mask_isin(column, selected)
+
+        for column in flag_columns:
+            if next(widgets).checkbox(f"Only {column}", key=f"{key}_flag_{column}"):
+                mask &= table.mask_true(column)
+
+        for column in range_columns:
+            values = table.columns[column]
+            low, high = (float(values.min()), float(values.max())) if len(values) else (0.0, 1.0)
+            if high <= low:
+                high = low + 1.0
+            selected_low, selected_high = next(widgets).slider(
+                f"{column} range", min_value=low, max_value=high, value=(low, high), key=f"{key}_range_{column}")
+            if (selected_low, selected_high) != (low, high):
+                mask &= table.mask_range(column, selected_low, selected_high)
+
+    sort_col, order_col, page_col = st.columns(3)
+    column_names = list(table.columns)
+    sort_index = column_names.index(default_sort) + 1 if default_sort in column_names else 0
+    sort_by = sort_col.selectbox("Sort by", ["(none)"] + column_names, index=sort_index, key=f"{key}_sort")
+    ascending = order_col.radio("Order", ["Descending", "Ascending"], index=1 if default_ascending else 0,
+                                horizontal=True, key=f"{key}_order") == "Ascending"
+
+    rows = table.select(mask, sort_by=None if sort_by == "(none)" else sort_by, ascending=ascending)
+    n_pages = max(1, -(-len(rows) // page_size))
+    page = page_col.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1,
+                                 step=1, key=f"{key}_page") - 1
+
+    st.dataframe(table.page(rows, page, page_size), use_container_width=True)
+    first = page * page_size + 1 if len(rows) else 0
+    last = min((page + 1) * page_size, len(rows))
+    st.caption(f"Rows {first:,}–{last:,} of {len(rows):,} (filtered from {len(table):,})")
+    return rows
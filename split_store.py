@@ -0,0 +1,100 @@
+"""
+Train/Test Split Store
+======================
+Stores the preprocessed train/test split as separate .npy arrays plus a small
+JSON manifest, so each consumer can memory-map only the arrays it needs.
+Memory-mapped arrays are shared through the OS page cache, which lets several
+trainers run side by side without each holding a private copy of the data.
+
+Layout:
+    train_test_data/
+        manifest.json
+        X_train.npy  X_test.npy  (float32)
+        y_train.npy  y_test.npy  (int32)
+        w_train.npy  w_test.npy  (float32 sample weights, deduplicated splits only)
+"""
+
+import os
+import json
+from datetime import datetime
+import numpy as np
+import joblib
+
+SPLIT_DIR = 'train_test_data'
+MANIFEST_FILE = 'manifest.json'
+LEGACY_SPLIT_FILE = 'train_test_data.pkl'
+SPLIT_ORDER = ('X_train', 'X_test', 'y_train', 'y_test')
+ARRAY_DTYPES = {
+    'X_train': np.float32,
+    'X_test': np.float32,
+    'y_train': np.int32,
+    'y_test': np.int32,
+    'w_train': np.float32,
+    'w_test': np.float32,
+}
+
+
+def save_split(arrays, split_dir=SPLIT_DIR, metadata=None):
+    """Writes each named array as .npy and records shapes/dtypes (and `metadata`) in the manifest."""
+    os.makedirs(split_dir, exist_ok=True)
+    manifest_path = os.path.join(split_dir, MANIFEST_FILE)
+    # The old manifest goes first and the new one is renamed into place last, so a crash
+    # halfway leaves no split rather than a manifest pointing at a mix of old and new arrays
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    manifest = {'created_at': datetime.now().isoformat(timespec='seconds'), 'arrays': {}}
+    if metadata:
+        manifest['metadata'] = metadata
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values, dtype=ARRAY_DTYPES.get(name))
+        path = os.path.join(split_dir, f'{name}.npy')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp_path, path)
+        manifest['arrays'][name] = {'file': f'{name}.npy', 'shape': list(values.shape), 'dtype': str(values.dtype)}
+
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+def load_manifest(split_dir=SPLIT_DIR):
+    with open(os.path.join(split_dir, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def load_split(*names, split_dir=SPLIT_DIR, mmap_mode='r'):
+    """
+    Returns the requested arrays (default: X_train, X_test, y_train, y_test) as
+    a tuple, memory-mapped read-only unless `mmap_mode` is None.
+
+    Falls back to the legacy `train_test_data.pkl` if no manifest exists yet.
+    Raises FileNotFoundError if neither is present.
+    """
+    names = names or SPLIT_ORDER
+    manifest_path = os.path.join(split_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        if not os.path.exists(LEGACY_SPLIT_FILE):
+            raise FileNotFoundError(f"No split found in '{split_dir}/' or '{LEGACY_SPLIT_FILE}'")
+        legacy = dict(zip(SPLIT_ORDER, joblib.load(LEGACY_SPLIT_FILE)))
+        return tuple(np.asarray(legacy[name]) for name in names)
+
+    arrays = load_manifest(split_dir)['arrays']
+    missing = [name for name in names if name not in arrays]
+    if missing:
+        raise FileNotFoundError(f"Split in '{split_dir}/' has no array(s): {', '.join(missing)}")
+    return tuple(np.load(os.path.join(split_dir, arrays[name]['file']), mmap_mode=mmap_mode) for name in names)
+
+
+def load_weights(*names, split_dir=SPLIT_DIR, mmap_mode='r'):
+    """
+    Returns the requested sample-weight arrays (default: w_train, w_test), with
+    None for any the split doesn't have (legacy or non-deduplicated splits).
+    """
+    names = names or ('w_train', 'w_test')
+    manifest_path = os.path.join(split_dir, MANIFEST_FILE)
+    arrays = load_manifest(split_dir)['arrays'] if os.path.exists(manifest_path) else {}
+    return tuple(np.load(os.path.join(split_dir, arrays[name]['file']), mmap_mode=mmap_mode)
+                 if name in arrays else None for name in names)
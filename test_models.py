@@ -12,6 +12,7 @@ import pandas as pd
 import numpy as np
 from tensorflow.keras.models import load_model
 import sys
+from split_store import load_split
 
 def test_models():
     print("=" * 60)
@@ -65,7 +66,7 @@ def test_models():
     # --- Load test data ---
     print("\n[2] Loading test data...")
     try:
-        _, X_test, _, y_test = joblib.load('train_test_data.pkl')
+        X_test, y_test = load_split('X_test', 'y_test')
         print(f"    ✅ Test data loaded ({len(X_test)} samples)")
     except FileNotFoundError:
         print("    ❌ Test data NOT found. Run data_preprocessing.py first.")
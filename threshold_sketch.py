@@ -0,0 +1,160 @@
+"""
+Anomaly Threshold Sketch
+========================
+A mergeable quantile sketch of autoencoder reconstruction errors on BENIGN
+traffic. Values are counted in logarithmic buckets (the DDSketch scheme), so
+every quantile is accurate to within a fixed relative error, the sketch has a
+bounded size no matter how many values it has seen, and two sketches merge by
+adding bucket counts.
+
+The sketch is filled in one streaming pass during training and saved next to
+the model. Operators can then pick a target false-positive rate (e.g. 0.1%)
+at runtime; the threshold is the matching upper quantile, without
+recomputing any losses. The same sketch can keep absorbing live BENIGN
+traffic.
+"""
+
+import json
+import math
+import threading
+import numpy as np
+
+SKETCH_FILE = 'autoencoder_threshold_sketch.json'
+DEFAULT_TARGET_FPR = 0.01
+TARGET_FPR_CHOICES = [0.01, 0.001, 0.0001]
+
+
+class QuantileSketch:
+    """Relative-error quantile sketch over positive values (log-spaced buckets)."""
+
+    def __init__(self, relative_accuracy=0.005, min_value=1e-12):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = np.zeros(0, dtype=np.int64)
+        self.offset = 0  # bucket index of bins[0]
+        self.zero_count = 0  # values <= min_value
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._lock = threading.Lock()
+
+    # --- Updates ---
+    def _grow(self, low, high):
+        if not len(self.bins):
+            self.bins = np.zeros(high - low + 1, dtype=np.int64)
+            self.offset = low
+            return
+        new_low, new_high = min(low, self.offset), max(high, self.offset + len(self.bins) - 1)
+        if (new_low, new_high) != (self.offset, self.offset + len(self.bins) - 1):
+            grown = np.zeros(new_high - new_low + 1, dtype=np.int64)
+            grown[self.offset - new_low:self.offset - new_low + len(self.bins)] = self.bins
+            self.bins, self.offset = grown, new_low
+
+    def update(self, values, counts=None):
+        """
+        Adds a batch of values (vectorised; NaN/inf are ignored). `counts` gives
+        integer multiplicities per value, e.g. duplicate counts of deduplicated rows.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        counts = np.ones(len(values), dtype=np.int64) if counts is None else \
+            np.rint(np.asarray(counts, dtype=np.float64).ravel()).astype(np.int64)
+        finite = np.isfinite(values)
+        values, counts = values[finite], counts[finite]
+        if not len(values):
+            return
+        positive = values > self.min_value
+        indices = np.ceil(np.log(values[positive]) / self._log_gamma).astype(np.int64)
+        with self._lock:
+            self.zero_count += int(counts[~positive].sum())
+            self.count += int(counts.sum())
+            self.total += float(np.dot(values, counts))
+            self.total_sq += float(np.dot(np.square(values), counts))
+            if len(indices):
+                low, high = int(indices.min()), int(indices.max())
+                self._grow(low, high)
+                np.add.at(self.bins, indices - self.offset, counts[positive])
+
+    def merge(self, other):
+        """Adds another sketch's counts into this one (same accuracy required)."""
+        if not math.isclose(self.gamma, other.gamma):
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        with self._lock:
+            if len(other.bins):
+                self._grow(other.offset, other.offset + len(other.bins) - 1)
+                start = other.offset - self.offset
+                self.bins[start:start + len(other.bins)] += other.bins
+            self.zero_count += other.zero_count
+            self.count += other.count
+            self.total += other.total
+            self.total_sq += other.total_sq
+        return self
+
+    # --- Queries ---
+    def _bucket_value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q):
+        with self._lock:
+            if self.count == 0:
+                raise ValueError("Sketch is empty")
+            rank = q * (self.count - 1)
+            if rank < self.zero_count:
+                return 0.0
+            cumulative = np.cumsum(self.bins) + self.zero_count
+            position = int(np.searchsorted(cumulative, rank, side='right'))
+            position = min(position, len(self.bins) - 1)
+            return float(self._bucket_value(self.offset + position))
+
+    def threshold_for_fpr(self, target_fpr=DEFAULT_TARGET_FPR):
+        """Error above which only `target_fpr` of BENIGN traffic falls."""
+        return self.quantile(1.0 - target_fpr)
+
+    def mean(self):
+        return self.total / self.count if self.count else float('nan')
+
+    def std(self):
+        if not self.count:
+            return float('nan')
+        return math.sqrt(max(self.total_sq / self.count - self.mean() ** 2, 0.0))
+
+    def histogram(self):
+        """(bucket representative values, counts) for the non-empty buckets, for plotting."""
+        nonzero = np.flatnonzero(self.bins)
+        return self._bucket_value(self.offset + nonzero), self.bins[nonzero]
+
+    # --- Persistence ---
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'min_value': self.min_value,
+            'offset': self.offset,
+            'bins': self.bins.tolist(),
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'total': self.total,
+            'total_sq': self.total_sq,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'], data['min_value'])
+        sketch.offset = data['offset']
+        sketch.bins = np.asarray(data['bins'], dtype=np.int64)
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.total = data['total']
+        sketch.total_sq = data['total_sq']
+        return sketch
+
+    def save(self, path=SKETCH_FILE):
+        with self._lock:
+            data = self.to_dict()
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path=SKETCH_FILE):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,226 @@
+"""
+High-Rate Traffic Replay
+========================
+Sends pre-built frames through a raw socket to exercise live capture (for
+example on loopback while the Live Analysis page is sniffing). Frames are
+built once, either read from a pcap file or crafted as a UDP flood, then sent
+in bursts:
+
+    * at a fixed target rate (token bucket), or as fast as possible
+    * with the pcap's original timing, optionally sped up (--speed)
+
+The achieved packet and bit rates are reported at the end. Raw sockets need
+root (Linux) or Administrator rights.
+
+Sockets:
+    l2  AF_PACKET on the interface; frames are sent as captured (Linux only)
+    l3  raw IPv4 socket with IP_HDRINCL; the Ethernet header is stripped
+
+Run: sudo python traffic_replay.py --udp 127.0.0.1 --rate 50000 --duration 10
+     sudo python traffic_replay.py --pcap synthetic_traffic.pcap --timing original --speed 5
+"""
+
+import sys
+import time
+import socket
+import struct
+import argparse
+import numpy as np
+
+ETH_HEADER = 14
+ETH_P_IP = 0x0800
+PCAP_MAGIC = {b'\xd4\xc3\xb2\xa1': ('<', 1e-6), b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+              b'\x4d\x3c\xb2\xa1': ('<', 1e-9), b'\xa1\xb2\x3c\x4d': ('>', 1e-9)}
+DEFAULT_BURST = 64
+
+
+# --- Frame sources ---
+def read_pcap_frames(path, limit=None):
+    """(relative timestamps in seconds, list of frame bytes) from a classic Ethernet pcap."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] not in PCAP_MAGIC:
+        raise ValueError(f"'{path}' is not a classic pcap file (pcapng is not supported)")
+    endian, tick = PCAP_MAGIC[data[:4]]
+    record = struct.Struct(endian + 'IIII')
+    timestamps, frames = [], []
+    offset = 24
+    while offset + 16 <= len(data) and (limit is None or len(frames) < limit):
+        ts_sec, ts_frac, incl_len, _ = record.unpack_from(data, offset)
+        offset += 16
+        frames.append(data[offset:offset + incl_len])
+        timestamps.append(ts_sec + ts_frac * tick)
+        offset += incl_len
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    return timestamps - (timestamps[0] if len(timestamps) else 0), frames
+
+
+def build_udp_frames(target_ip, n_frames=1024, payload_size=1024, dport=None, seed=42):
+    """UDP flood frames with random source (and, unless fixed, destination) ports, crafted once up front."""
+    from scapy.all import Ether, IP, UDP
+    rng = np.random.default_rng(seed)
+    payload = rng.integers(0, 256, payload_size, dtype=np.uint8).tobytes()
+    frames = []
+    for sport, random_dport in zip(rng.integers(1024, 65535, n_frames), rng.integers(1024, 65535, n_frames)):
+        packet = (Ether(src='00:00:00:00:00:00', dst='00:00:00:00:00:00') / IP(dst=target_ip)
+                  / UDP(sport=int(sport), dport=int(dport or random_dport)) / payload)
+        frames.append(bytes(packet))
+    return frames
+
+
+# --- Pacing ---
+class TokenBucket:
+    """Allows `rate` packets/s on average with bursts of up to `burst` packets."""
+
+    def __init__(self, rate, burst=DEFAULT_BURST):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0) * 2  # headroom so oversleeping doesn't forfeit tokens
+        self.tokens = self.burst
+        self.updated = time.perf_counter()
+
+    def take(self, n):
+        """Blocks until `n` tokens are available, then spends them."""
+        while True:
+            now = time.perf_counter()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= n:
+                self.tokens -= n
+                return
+            wait = (n - self.tokens) / self.rate
+            if wait > 0.0005:
+                time.sleep(wait)  # sleep() oversleeps by ~50-100 us, so spin for short waits
+
+
+# --- Sending ---
+def open_socket(mode, interface):
+    if mode == 'l2':
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_IP))
+        sock.bind((interface, 0))
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_RAW)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_HDRINCL, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+    return sock
+
+
+def make_send(sock, mode):
+    """A send(frame) callable for the socket mode."""
+    if mode == 'l2':
+        return sock.send
+
+    def send_l3(frame):
+        packet = frame[ETH_HEADER:]
+        sock.sendto(packet, (socket.inet_ntoa(packet[16:20]), 0))
+    return send_l3
+
+
+def replay_frames(send, frames, timestamps=None, rate=0, speed=1.0, loops=1, duration=None, burst=DEFAULT_BURST):
+    """
+    Sends `frames` `loops` times (0 = until `duration` expires). With
+    `timestamps` (original timing) each frame waits for its scheduled time
+    divided by `speed`; otherwise bursts of `burst` frames are paced to
+    `rate` packets/s by a token bucket (0 = max rate). Returns counters for
+    the report.
+    """
+    stats = {'packets': 0, 'bytes': 0, 'errors': 0, 'last_error': None}
+    bucket = TokenBucket(rate, burst) if rate and timestamps is None else None
+    span = (timestamps[-1] / speed if timestamps is not None and len(timestamps) else 0.0)
+    n_frames = len(frames)
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+    loop = 0
+    try:
+        while (loops == 0 or loop < loops) and frames:
+            loop_start = started + loop * span
+            for i, frame in enumerate(frames):
+                if i % burst == 0:
+                    if deadline and time.perf_counter() >= deadline:
+                        break
+                    if bucket is not None:
+                        bucket.take(min(burst, n_frames - i))
+                if timestamps is not None:
+                    delay = loop_start + timestamps[i] / speed - time.perf_counter()
+                    if delay > 0.0005:
+                        time.sleep(delay)
+                try:
+                    send(frame)
+                    stats['packets'] += 1
+                    stats['bytes'] += len(frame)
+                except OSError as e:  # ENOBUFS (queue full), EMSGSIZE (frame above the route MTU), ...
+                    stats['errors'] += 1
+                    stats['last_error'] = str(e)
+            loop += 1
+            if deadline and time.perf_counter() >= deadline:
+                break
+    except KeyboardInterrupt:
+        print("\n🛑 Replay stopped.")
+    stats['seconds'] = time.perf_counter() - started
+    stats['loops'] = loop
+    return stats
+
+
+def print_report(stats, target_rate=0):
+    seconds = max(stats['seconds'], 1e-9)
+    pps = stats['packets'] / seconds
+    print(f"\n✅ Sent {stats['packets']:,} packets ({stats['bytes'] / 1e6:,.1f} MB) in {seconds:.2f}s "
+          f"over {stats['loops']} loop(s)")
+    print(f"⏱️  Achieved {pps:,.0f} packets/s, {stats['bytes'] * 8 / seconds / 1e6:,.1f} Mbit/s")
+    if target_rate:
+        print(f"🎯 Target {target_rate:,.0f} packets/s ({pps / target_rate:.1%} achieved)")
+    if stats['errors']:
+        print(f"⚠️  {stats['errors']:,} send errors (last: {stats['last_error']})")
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay pcap frames or a UDP flood through a raw socket.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--pcap', help="Classic pcap file to replay (e.g. from generate_pcap.py)")
+    source.add_argument('--udp', metavar='TARGET_IP', help="Send a UDP flood to this address")
+    parser.add_argument('--interface', default='lo', help="Interface for l2 sending")
+    parser.add_argument('--mode', choices=['l2', 'l3'], default='l2' if hasattr(socket, 'AF_PACKET') else 'l3')
+    parser.add_argument('--rate', type=float, default=0, help="Packets/s (0 = as fast as possible)")
+    parser.add_argument('--timing', choices=['rate', 'original'], default='rate',
+                        help="'original' replays with the pcap's inter-packet gaps (divided by --speed)")
+    parser.add_argument('--speed', type=float, default=1.0)
+    parser.add_argument('--loops', type=int, default=1, help="Times to replay the frames (0 = until --duration)")
+    parser.add_argument('--duration', type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument('--limit', type=int, default=None, help="Read at most this many pcap frames")
+    parser.add_argument('--frames', type=int, default=1024, help="Distinct UDP frames to pre-build")
+    parser.add_argument('--payload-size', type=int, default=1024)
+    parser.add_argument('--dport', type=int, default=None, help="Fixed UDP destination port (default: random)")
+    parser.add_argument('--burst', type=int, default=DEFAULT_BURST, help="Frames sent per pacing step")
+    args = parser.parse_args()
+
+    if args.pcap:
+        try:
+            timestamps, frames = read_pcap_frames(args.pcap, args.limit)
+        except FileNotFoundError:
+            print(f"❌ '{args.pcap}' not found. Generate one with generate_pcap.py.")
+            sys.exit(1)
+        print(f"🔹 Loaded {len(frames):,} frames spanning {timestamps[-1] if len(frames) else 0:.1f}s from '{args.pcap}'")
+    else:
+        timestamps = None
+        frames = build_udp_frames(args.udp, args.frames, args.payload_size, args.dport)
+        print(f"🔹 Built {len(frames):,} UDP frames of {len(frames[0]):,} bytes for {args.udp}")
+    if args.timing == 'rate':
+        timestamps = None
+    loops = 0 if args.duration and args.loops == 1 else args.loops
+
+    try:
+        sock = open_socket(args.mode, args.interface)
+    except PermissionError:
+        print("❌ Raw sockets need root (Linux) or Administrator rights.")
+        sys.exit(1)
+
+    target = f"{args.rate:,.0f} packets/s" if args.rate and timestamps is None else (
+        f"original timing x{args.speed:g}" if timestamps is not None else "max rate")
+    print(f"🚀 Sending via {args.mode} ({args.interface if args.mode == 'l2' else 'IPv4'}) at {target}. "
+          f"Press Ctrl+C to stop.")
+    try:
+        stats = replay_frames(make_send(sock, args.mode), frames, timestamps, args.rate, args.speed, loops,
+                              args.duration, args.burst)
+    finally:
+        sock.close()
+    print_report(stats, args.rate if timestamps is None else 0)
@@ -0,0 +1,276 @@
+"""
+Training Orchestrator
+=====================
+Runs preprocessing and every model trainer as one DAG:
+
+    preprocess ──┬── random_forest   (train_models.py)
+                 ├── xgboost         (train_xgboost.py)
+                 ├── autoencoder     (train_autoencoder.py)
+                 └── iforest         (train_unsupervised.py)
+
+The split is loaded once (memory-mapped) and shared by all trainers, which
+run concurrently with explicit CPU budgets so that RF and XGBoost don't both
+grab every core. A stage is skipped when the content hashes of its inputs
+and code match the last successful run and its outputs still exist. Figures
+are written to files instead of blocking on plt.show(), and a per-stage
+timing report is printed and saved to training_report.json.
+
+Run: python train_all.py [--cpus 16] [--force] [--only xgboost autoencoder]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import matplotlib
+matplotlib.use('Agg')  # headless: trainers save figures instead of showing them
+
+import joblib
+from data_preprocessing import DATA_DIR, run_preprocessing
+from split_store import SPLIT_DIR, MANIFEST_FILE, load_manifest, load_split, load_weights
+
+STATE_FILE = 'train_state.json'
+REPORT_FILE = 'training_report.json'
+FIGURES_DIR = 'figures'
+
+PREPROCESS_OUTPUTS = ['scaler.pkl', 'label_encoder.pkl', 'model_columns.pkl', 'feature_schema.json',
+                      os.path.join(SPLIT_DIR, MANIFEST_FILE)]
+
+# Code every trainer runs: split loading and the shared sample weights
+TRAINER_CODE = ['split_store.py', 'training_utils.py']
+
+# deps: upstream stages; code: files whose content is part of the stage hash;
+# outputs: artifacts that must exist for a skip; cpu_share: relative CPU budget.
+STAGES = {
+    'preprocess': {'deps': [], 'code': ['data_preprocessing.py', 'split_store.py', 'feature_schema.py'],
+                   'outputs': PREPROCESS_OUTPUTS, 'cpu_share': 1.0},
+    'random_forest': {'deps': ['preprocess'], 'code': ['train_models.py'] + TRAINER_CODE,
+                      'outputs': ['ids_rf_model.pkl'], 'cpu_share': 0.4},
+    'xgboost': {'deps': ['preprocess'], 'code': ['train_xgboost.py', 'xgb_model_io.py'] + TRAINER_CODE,
+                'outputs': ['ids_xgb_model.ubj', 'ids_xgb_model.meta.json'], 'cpu_share': 0.3},
+    'autoencoder': {'deps': ['preprocess'], 'code': ['train_autoencoder.py', 'threshold_sketch.py'] + TRAINER_CODE,
+                    'outputs': ['ids_autoencoder_model.keras', 'autoencoder_threshold.pkl',
+                                'autoencoder_threshold_sketch.json'], 'cpu_share': 0.2},
+    'iforest': {'deps': ['preprocess'], 'code': ['train_unsupervised.py'] + TRAINER_CODE,
+                'outputs': ['ids_iforest_model.pkl'], 'cpu_share': 0.1},
+}
+
+
+# --- Content hashing ---
+class DigestCache:
+    """SHA-256 of files, memoised by (size, mtime) so unchanged GB-sized arrays aren't re-read."""
+
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+
+    def file_digest(self, path):
+        stat = os.stat(path)
+        key = f"{stat.st_size}:{stat.st_mtime_ns}"
+        cached = self.entries.get(path)
+        if cached and cached['key'] == key:
+            return cached['sha256']
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        self.entries[path] = {'key': key, 'sha256': sha.hexdigest()}
+        return self.entries[path]['sha256']
+
+    def digest(self, paths, extra=''):
+        sha = hashlib.sha256(extra.encode())
+        for path in sorted(paths):
+            sha.update(path.encode())
+            sha.update(self.file_digest(path).encode())
+        return sha.hexdigest()
+
+
+def split_files():
+    manifest = load_manifest()
+    return [os.path.join(SPLIT_DIR, MANIFEST_FILE)] + \
+        [os.path.join(SPLIT_DIR, entry['file']) for entry in manifest['arrays'].values()]
+
+
+def stage_inputs(name, data_dir):
+    """Data files a stage reads (code files are added separately)."""
+    if name == 'preprocess':
+        if not os.path.isdir(data_dir):
+            return []
+        return [os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith('.csv')]
+    return split_files() + ['label_encoder.pkl']
+
+
+# --- CPU budgets ---
+def cpu_budgets(stage_names, total_cpus):
+    """Splits `total_cpus` between concurrently running stages by their cpu_share."""
+    shares = {name: STAGES[name]['cpu_share'] for name in stage_names}
+    total_share = sum(shares.values()) or 1.0
+    return {name: max(1, int(round(total_cpus * share / total_share))) for name, share in shares.items()}
+
+
+# --- Shared training context ---
+class TrainingContext:
+    """Loads the split, its sample weights and the label encoder once, on first use, for all trainers."""
+
+    def __init__(self, figures_dir):
+        self.figures_dir = figures_dir
+        self._lock = threading.Lock()
+        self._data = None
+        self.weights = (None, None)
+
+    def data(self):
+        with self._lock:
+            if self._data is None:
+                X_train, X_test, y_train, y_test = load_split('X_train', 'X_test', 'y_train', 'y_test')
+                self.weights = load_weights('w_train', 'w_test')
+                label_encoder = joblib.load('label_encoder.pkl')
+                self._data = (X_train, X_test, y_train, y_test, label_encoder)
+            return self._data
+
+    def figure_path(self, name):
+        return os.path.join(self.figures_dir, name)
+
+
+def run_random_forest(ctx, n_jobs):
+    from train_models import train_tree_models
+    X_train, X_test, y_train, y_test, label_encoder = ctx.data()
+    w_train, w_test = ctx.weights
+    train_tree_models(X_train, y_train, X_test, y_test, label_encoder.classes_, n_jobs=n_jobs,
+                      figure_dir=ctx.figures_dir, w_train=w_train, w_test=w_test)
+
+
+def run_xgboost(ctx, n_jobs):
+    from train_xgboost import train_and_evaluate_xgboost
+    X_train, X_test, y_train, y_test, label_encoder = ctx.data()
+    w_train, w_test = ctx.weights
+    train_and_evaluate_xgboost(X_train, y_train, X_test, y_test, label_encoder.classes_, n_jobs=n_jobs,
+                               figure_path=ctx.figure_path('confusion_matrix_xgboost.png'),
+                               w_train=w_train, w_test=w_test)
+
+
+def run_autoencoder(ctx, n_jobs):
+    from train_autoencoder import train_and_evaluate_autoencoder, configure_threading
+    # TF's thread pools are process-wide and fixed once the runtime starts
+    configure_threading(n_jobs, min(2, n_jobs))
+    X_train, X_test, y_train, y_test, label_encoder = ctx.data()
+    w_train, w_test = ctx.weights
+    train_and_evaluate_autoencoder(X_train, X_test, y_train, y_test, label_encoder,
+                                   figure_path=ctx.figure_path('autoencoder_loss_distribution.png'),
+                                   w_train=w_train, w_test=w_test)
+
+
+def run_iforest(ctx, n_jobs):
+    from train_unsupervised import train_isolation_forest
+    X_train, _, y_train, _, label_encoder = ctx.data()
+    train_isolation_forest(X_train, y_train, label_encoder, n_jobs=n_jobs, w_train=ctx.weights[0])
+
+
+# --- DAG execution ---
+def train_all(total_cpus=None, force=False, only=None, data_dir=DATA_DIR, cache_dir=None, figures_dir=FIGURES_DIR):
+    total_cpus = total_cpus or os.cpu_count() or 1
+    os.makedirs(figures_dir, exist_ok=True)
+    state = {}
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+    digests = DigestCache(state.get('files'))
+    done_digests = state.get('stages', {})
+    ctx = TrainingContext(figures_dir)
+
+    runners = {
+        'preprocess': lambda n_jobs: run_preprocessing(data_dir, cache_dir=cache_dir, max_workers=n_jobs),
+        'random_forest': lambda n_jobs: run_random_forest(ctx, n_jobs),
+        'xgboost': lambda n_jobs: run_xgboost(ctx, n_jobs),
+        'autoencoder': lambda n_jobs: run_autoencoder(ctx, n_jobs),
+        'iforest': lambda n_jobs: run_iforest(ctx, n_jobs),
+    }
+    selected = set(only or STAGES)
+    trainers = [name for name in STAGES if name != 'preprocess' and name in selected]
+    budgets = cpu_budgets(trainers, total_cpus)
+    budgets['preprocess'] = total_cpus
+
+    report = {}
+    state_lock = threading.Lock()
+
+    def stage_digest(name):
+        inputs = stage_inputs(name, data_dir)
+        return digests.digest(inputs + STAGES[name]['code'], extra=name)
+
+    def run_stage(name):
+        started = time.perf_counter()
+        if name not in selected:
+            return name, 'not selected', 0.0
+        if name == 'preprocess' and not stage_inputs(name, data_dir):
+            if all(os.path.exists(path) for path in STAGES[name]['outputs']):
+                return name, 'skipped (no raw data, using existing split)', 0.0
+            raise FileNotFoundError(f"No CSV files in '{data_dir}' and no existing split")
+
+        digest = stage_digest(name)
+        outputs_exist = all(os.path.exists(path) for path in STAGES[name]['outputs'])
+        if not force and outputs_exist and done_digests.get(name) == digest:
+            return name, 'skipped (unchanged)', time.perf_counter() - started
+
+        print(f"\n▶️  Stage '{name}' starting with {budgets[name]} CPU(s)")
+        runners[name](budgets[name])
+        with state_lock:
+            done_digests[name] = digest
+        return name, 'ran', time.perf_counter() - started
+
+    pending = dict(STAGES)
+    finished, failed = set(), set()
+    with ThreadPoolExecutor(max_workers=len(STAGES)) as pool:
+        running = {}
+        while pending or running:
+            for name in [n for n, spec in pending.items() if all(dep in finished | failed for dep in spec['deps'])]:
+                spec = pending.pop(name)
+                if any(dep in failed for dep in spec['deps']):
+                    failed.add(name)
+                    report[name] = {'status': 'blocked by failed dependency', 'seconds': 0.0, 'cpus': 0}
+                    continue
+                running[pool.submit(run_stage, name)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    _, status, seconds = future.result()
+                    finished.add(name)
+                except Exception as e:
+                    status, seconds = f'failed: {e}', 0.0
+                    failed.add(name)
+                report[name] = {'status': status, 'seconds': round(seconds, 2), 'cpus': budgets.get(name, 0)}
+
+    with open(STATE_FILE, 'w') as f:
+        json.dump({'stages': done_digests, 'files': digests.entries}, f, indent=2)
+    with open(REPORT_FILE, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "=" * 60)
+    print("⏱️  Training report")
+    print("=" * 60)
+    for name in STAGES:
+        entry = report[name]
+        print(f"  {name:<15} {entry['status']:<45} {entry['seconds']:>8.1f}s  cpus={entry['cpus']}")
+    print(f"\nReport saved to '{REPORT_FILE}', figures in '{figures_dir}/'")
+    return not failed
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run preprocessing and all IDS model trainers as one DAG.")
+    parser.add_argument('--cpus', type=int, default=None, help="Total CPU budget (default: all cores)")
+    parser.add_argument('--force', action='store_true', help="Re-run stages even if their inputs are unchanged")
+    parser.add_argument('--only', nargs='+', choices=list(STAGES), help="Run only these stages")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--parquet-cache', default=None, metavar='DIR')
+    parser.add_argument('--figures-dir', default=FIGURES_DIR)
+    args = parser.parse_args()
+
+    ok = train_all(total_cpus=args.cpus, force=args.force, only=args.only, data_dir=args.data_dir,
+                   cache_dir=args.parquet_cache, figures_dir=args.figures_dir)
+    sys.exit(0 if ok else 1)
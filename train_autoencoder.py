@@ -1,42 +1,27 @@
+import time
+import argparse
 import joblib
 import pandas as pd
 import numpy as np
+import tensorflow as tf
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from tensorflow.keras.models import Model
 from tensorflow.keras.layers import Input, Dense
-from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.callbacks import EarlyStopping, Callback
 import seaborn as sns
 import matplotlib.pyplot as plt
+from split_store import load_split, load_weights, SPLIT_DIR
+from training_utils import PLOT_LOCK, finish_figure
+from threshold_sketch import QuantileSketch, SKETCH_FILE, DEFAULT_TARGET_FPR
 
+BASE_BATCH_SIZE = 32
+BASE_LEARNING_RATE = 1e-3  # Adam default, tuned for batch_size=32
 
-def train_and_evaluate_autoencoder():
-    """
-    Trains, evaluates, and saves an Autoencoder model for anomaly detection.
-    """
-    print("--- Training Autoencoder Model ---")
-
-    # Load preprocessed data
-    print("🔹 Loading preprocessed data from 'train_test_data.pkl'...")
-    try:
-        X_train_full, X_test_full, y_train_full, y_test_full = joblib.load('train_test_data.pkl')
-        label_encoder = joblib.load('label_encoder.pkl')
-    except FileNotFoundError:
-        print("Error: Required .pkl files not found. Please run data_preprocessing.py first.")
-        exit()
-
-    # Get 'BENIGN' label index
-    benign_label_idx = np.where(label_encoder.classes_ == 'BENIGN')[0][0]
-
-    # Filter for BENIGN data only for training the autoencoder
-    X_train_benign = X_train_full[y_train_full == benign_label_idx]
-    X_test_benign = X_test_full[y_test_full == benign_label_idx]
-
-    print(f"Number of BENIGN samples for Autoencoder training: {len(X_train_benign)}")
-    print(f"Number of BENIGN samples for Autoencoder testing: {len(X_test_benign)}")
 
-    # --- Build the Autoencoder Model ---
-    input_dim = X_train_benign.shape[1]
+def build_autoencoder(input_dim, learning_rate=BASE_LEARNING_RATE):
+    """Builds and compiles the symmetric dense autoencoder used for anomaly detection."""
     encoding_dim = int(input_dim / 2)  # Example: Half the input dimensions
     latent_dim = int(encoding_dim / 2)  # Even smaller bottleneck
 
@@ -51,52 +36,214 @@ def train_and_evaluate_autoencoder():
     decoder = Dense(input_dim, activation="linear")(decoder)  # Linear for standardized data
 
     autoencoder = Model(inputs=input_layer, outputs=decoder)
-    autoencoder.compile(optimizer='adam', loss='mse')  # Mean Squared Error is common for autoencoders
+    # Mean Squared Error is common for autoencoders
+    autoencoder.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse')
+    return autoencoder
+
+
+def configure_threading(intra_op_threads=None, inter_op_threads=None):
+    """Sets TF's CPU thread pools; must run before TensorFlow executes its first op."""
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError:
+        print("⚠️  TensorFlow already initialised; thread settings not applied")
+
+
+def scaled_learning_rate(batch_size, rule='sqrt'):
+    """Scales the base learning rate with the batch size ('linear' or 'sqrt', the safer choice for Adam)."""
+    ratio = batch_size / BASE_BATCH_SIZE
+    return BASE_LEARNING_RATE * (ratio if rule == 'linear' else np.sqrt(ratio))
+
+
+def make_dataset(X, batch_size, shuffle, seed=42, sample_weight=None):
+    """
+    float32 tf.data pipeline yielding (x, x) batches, or (x, x, w) when
+    `sample_weight` is given. Shuffling permutes row indices and gathers whole
+    batches, so no per-row Python work is done.
+    """
+    X = tf.constant(np.asarray(X, dtype=np.float32))
+    indices = tf.data.Dataset.range(X.shape[0])
+    if shuffle:
+        indices = indices.shuffle(X.shape[0], seed=seed, reshuffle_each_iteration=True)
+    if sample_weight is None:
+        batches = indices.batch(batch_size).map(lambda idx: tf.gather(X, idx), num_parallel_calls=tf.data.AUTOTUNE)
+        return batches.map(lambda x: (x, x)).prefetch(tf.data.AUTOTUNE)
+
+    W = tf.constant(np.asarray(sample_weight, dtype=np.float32))
+    batches = indices.batch(batch_size).map(lambda idx: (tf.gather(X, idx), tf.gather(X, idx), tf.gather(W, idx)),
+                                            num_parallel_calls=tf.data.AUTOTUNE)
+    return batches.prefetch(tf.data.AUTOTUNE)
+
+
+class ValidationErrorStats(Callback):
+    """
+    Runs the validation pass itself so that, besides reporting `val_loss` for
+    EarlyStopping, it streams the per-sample reconstruction errors of the
+    held-out BENIGN rows into a quantile sketch. The sketch from the epoch
+    whose weights are kept is used for the threshold, so no separate full
+    predict pass is needed.
+    """
+
+    def __init__(self, val_dataset):
+        super().__init__()
+        self.val_dataset = val_dataset
+        self.last_sketch = None
+        self.best_sketch = None
+        self.best_loss = np.inf
+
+    def on_train_begin(self, logs=None):
+        model = self.model
+
+        @tf.function
+        def sample_errors(x):
+            return tf.reduce_mean(tf.square(x - model(x, training=False)), axis=1)
+
+        self._sample_errors = sample_errors
+
+    def on_epoch_end(self, epoch, logs=None):
+        sketch = QuantileSketch()
+        for batch in self.val_dataset:
+            counts = batch[2].numpy() if len(batch) == 3 else None
+            sketch.update(self._sample_errors(batch[0]).numpy(), counts)
+        val_loss = sketch.mean()
+        if logs is not None:
+            logs['val_loss'] = val_loss
+        self.last_sketch = sketch
+        if val_loss < self.best_loss:
+            self.best_loss, self.best_sketch = val_loss, sketch
+
+
+class ThroughputLogger(Callback):
+    """Records epoch wall time and training samples/s."""
+
+    def __init__(self, n_samples):
+        super().__init__()
+        self.n_samples = n_samples
+        self.epoch_times = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._started = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._started
+        self.epoch_times.append(elapsed)
+        print(f"⏱️  Epoch {epoch + 1}: {elapsed:.1f}s, {self.n_samples / elapsed:,.0f} samples/s")
+
+    def summary(self):
+        mean_time = float(np.mean(self.epoch_times))
+        return {'epochs': len(self.epoch_times), 'mean_epoch_seconds': round(mean_time, 2),
+                'samples_per_second': round(self.n_samples / mean_time, 1)}
+
+
+def train_and_evaluate_autoencoder(X_train_full, X_test_full, y_train_full, y_test_full, label_encoder,
+                                   figure_path=None, batch_size=1024, epochs=50, lr_scaling='sqrt',
+                                   target_fpr=DEFAULT_TARGET_FPR, w_train=None, w_test=None):
+    """
+    Trains, evaluates, and saves an Autoencoder model for anomaly detection.
+    `w_train`/`w_test` are the duplicate counts of a deduplicated split; they
+    weight the training loss and the benign error sketch.
+    """
+    print("--- Training Autoencoder Model ---")
+
+    # Get 'BENIGN' label index
+    benign_label_idx = np.where(label_encoder.classes_ == 'BENIGN')[0][0]
+
+    # Filter for BENIGN data only for training the autoencoder
+    train_benign, test_benign = y_train_full == benign_label_idx, y_test_full == benign_label_idx
+    X_train_benign = np.asarray(X_train_full[train_benign], dtype=np.float32)
+    X_test_benign = np.asarray(X_test_full[test_benign], dtype=np.float32)
+    w_train_benign = w_train[train_benign] if w_train is not None else None
+    w_test_benign = w_test[test_benign] if w_test is not None else None
+
+    print(f"Number of BENIGN samples for Autoencoder training: {len(X_train_benign)}")
+    print(f"Number of BENIGN samples for Autoencoder testing: {len(X_test_benign)}")
+
+    # --- Build the Autoencoder Model ---
+    learning_rate = scaled_learning_rate(batch_size, lr_scaling)
+    print(f"Batch size {batch_size}, learning rate {learning_rate:.2e} ({lr_scaling} scaling)")
+    autoencoder = build_autoencoder(X_train_benign.shape[1], learning_rate=learning_rate)
 
     print("\nAutoencoder Model Summary:")
     autoencoder.summary()
 
     # --- Train the Autoencoder ---
-    # Use early stopping to prevent overfitting
+    train_dataset = make_dataset(X_train_benign, batch_size, shuffle=True, sample_weight=w_train_benign)
+    val_dataset = make_dataset(X_test_benign, batch_size * 4, shuffle=False, sample_weight=w_test_benign)
+    validation_stats = ValidationErrorStats(val_dataset)
+    throughput = ThroughputLogger(len(X_train_benign))
+    # Use early stopping to prevent overfitting; it reads the val_loss set by validation_stats
     early_stopping = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
 
-    history = autoencoder.fit(X_train_benign, X_train_benign,
-                              epochs=50,
-                              batch_size=32,
-                              shuffle=True,
-                              validation_data=(X_test_benign, X_test_benign),
-                              callbacks=[early_stopping],
-                              verbose=1)
+    history = autoencoder.fit(train_dataset,
+                              epochs=epochs,
+                              callbacks=[validation_stats, early_stopping, throughput],
+                              verbose=2)
 
     print("\n✅ Autoencoder training complete!")
+    print(f"⏱️  Throughput: {throughput.summary()}")
 
     # --- Evaluate Anomaly Threshold ---
-    # Get reconstruction errors for benign data
-    benign_reconstructions = autoencoder.predict(X_train_benign)
-    benign_loss = np.mean(np.power(X_train_benign - benign_reconstructions, 2), axis=1)
-
-    # Set a threshold (e.g., mean + X * standard deviation of benign loss)
-    threshold = np.mean(benign_loss) + 2 * np.std(benign_loss)  # Common heuristic
-    print(f"Calculated Anomaly Threshold: {threshold:.4f}")
-
-    # Save the trained autoencoder model and the threshold
+    # Error sketch of held-out benign data from the epoch whose weights were kept
+    restored_best = early_stopping.stopped_epoch > 0
+    sketch = validation_stats.best_sketch if restored_best else validation_stats.last_sketch
+
+    # The threshold is the benign error quantile matching the target false-positive rate
+    threshold = sketch.threshold_for_fpr(target_fpr)
+    print(f"Benign loss mean {sketch.mean():.4f}, std {sketch.std():.4f}")
+    for fpr in (0.01, 0.001, 0.0001):
+        print(f"    Threshold at {fpr:.2%} FPR: {sketch.threshold_for_fpr(fpr):.4f}")
+    print(f"Calculated Anomaly Threshold ({target_fpr:.2%} FPR): {threshold:.4f}")
+
+    # Save the trained autoencoder model, the threshold and the error sketch
     autoencoder.save('ids_autoencoder_model.keras')  # Keras models use .h5 or .keras
     joblib.dump(threshold, 'autoencoder_threshold.pkl')
+    sketch.save(SKETCH_FILE)
     print("\n💾 Autoencoder model saved to 'ids_autoencoder_model.keras'")
     print("💾 Anomaly threshold saved to 'autoencoder_threshold.pkl'")
+    print(f"💾 Benign error sketch saved to '{SKETCH_FILE}'")
 
     # --- Visualization of Loss Distribution ---
-    plt.figure(figsize=(10, 6))
-    sns.histplot(benign_loss, bins=50, kde=True, color='blue', label='Benign Loss')
-    plt.axvline(threshold, color='red', linestyle='--', label=f'Threshold: {threshold:.4f}')
-    plt.title('Reconstruction Loss Distribution for Benign Traffic')
-    plt.xlabel('Reconstruction Loss (MSE)')
-    plt.ylabel('Number of Samples')
-    plt.legend()
-    plt.show()
+    with PLOT_LOCK:
+        fig, ax = plt.subplots(figsize=(10, 6))
+        bucket_values, bucket_counts = sketch.histogram()
+        ax.plot(bucket_values, bucket_counts, color='blue', label='Benign Loss (held-out)')
+        ax.set_xscale('log')
+        ax.axvline(threshold, color='red', linestyle='--', label=f'Threshold: {threshold:.4f}')
+        ax.set_title('Reconstruction Loss Distribution for Benign Traffic')
+        ax.set_xlabel('Reconstruction Loss (MSE, log scale)')
+        ax.set_ylabel('Number of Samples per Bucket')
+        ax.legend()
+        finish_figure(fig, figure_path)
+    return autoencoder, threshold
 
 
 # --- Main execution block ---
 if __name__ == "__main__":
-    train_and_evaluate_autoencoder()
+    parser = argparse.ArgumentParser(description="Train the anomaly-detection autoencoder on BENIGN traffic.")
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--lr-scaling', choices=['sqrt', 'linear'], default='sqrt')
+    parser.add_argument('--intra-op-threads', type=int, default=None)
+    parser.add_argument('--inter-op-threads', type=int, default=None)
+    parser.add_argument('--target-fpr', type=float, default=DEFAULT_TARGET_FPR,
+                        help="False-positive rate on benign traffic used for the saved threshold")
+    args = parser.parse_args()
+    configure_threading(args.intra_op_threads, args.inter_op_threads)
+
+    # Load preprocessed data
+    print(f"🔹 Loading preprocessed data from '{SPLIT_DIR}/'...")
+    try:
+        X_train_full, X_test_full, y_train_full, y_test_full = load_split('X_train', 'X_test', 'y_train', 'y_test')
+        w_train, w_test = load_weights('w_train', 'w_test')
+        label_encoder = joblib.load('label_encoder.pkl')
+    except FileNotFoundError:
+        print("Error: Preprocessed data or label encoder not found. Please run data_preprocessing.py first.")
+        exit()
+
+    train_and_evaluate_autoencoder(X_train_full, X_test_full, y_train_full, y_test_full, label_encoder,
+                                   batch_size=args.batch_size, epochs=args.epochs, lr_scaling=args.lr_scaling,
+                                   target_fpr=args.target_fpr, w_train=w_train, w_test=w_test)
     print("\n✅ Autoencoder training and evaluation complete!")
\ No newline at end of file
@@ -1,69 +1,98 @@
+import os
+import time
 import joblib
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import seaborn as sns
 import matplotlib.pyplot as plt
+from split_store import load_split, load_weights, SPLIT_DIR
+from training_utils import PLOT_LOCK, finish_figure, balanced_sample_weight
 
 
-def train_and_evaluate(model, model_name, X_train, y_train, X_test, y_test, class_names):
+def train_and_evaluate(model, model_name, X_train, y_train, X_test, y_test, class_names, figure_path=None,
+                       sample_weight=None, test_weight=None):
     """
     A helper function to train a model and print its evaluation metrics.
+    The confusion matrix is shown interactively, or saved to `figure_path` if given.
+    Test metrics are weighted by `test_weight` (duplicate counts) when given.
     """
     print(f"--- Training {model_name} ---")
 
     # Train the model
-    model.fit(X_train, y_train)
+    started = time.perf_counter()
+    model.fit(X_train, y_train, sample_weight=sample_weight)
+    print(f"⏱️  Training time: {time.perf_counter() - started:.1f}s on {len(X_train):,} rows")
 
     # Make predictions on the test set
     y_pred = model.predict(X_test)
 
     # Evaluate performance
-    accuracy = accuracy_score(y_test, y_pred)
+    accuracy = accuracy_score(y_test, y_pred, sample_weight=test_weight)
     print(f"✅ Accuracy: {accuracy:.4f}\n")
 
     print("📊 Classification Report:")
-    print(classification_report(y_test, y_pred, target_names=class_names, zero_division=0))
+    print(classification_report(y_test, y_pred, target_names=class_names, zero_division=0,
+                                sample_weight=test_weight))
 
     # Visualize the Confusion Matrix
-    cm = confusion_matrix(y_test, y_pred)
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=class_names, yticklabels=class_names)
-    plt.title(f'Confusion Matrix for {model_name}')
-    plt.xlabel('Predicted Label')
-    plt.ylabel('True Label')
-    plt.show()
+    cm = confusion_matrix(y_test, y_pred, sample_weight=test_weight).round().astype(int)
+    with PLOT_LOCK:
+        fig, ax = plt.subplots(figsize=(10, 8))
+        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=class_names, yticklabels=class_names, ax=ax)
+        ax.set_title(f'Confusion Matrix for {model_name}')
+        ax.set_xlabel('Predicted Label')
+        ax.set_ylabel('True Label')
+        finish_figure(fig, figure_path)
+
+
+def train_tree_models(X_train, y_train, X_test, y_test, class_names, n_jobs=-1, figure_dir=None,
+                      w_train=None, w_test=None):
+    """
+    Trains the Decision Tree baseline and the Random Forest, then saves the Random Forest.
+    `w_train`/`w_test` are the duplicate counts of a deduplicated split.
+    """
+    def figure_path(name):
+        return os.path.join(figure_dir, f'confusion_matrix_{name}.png') if figure_dir else None
+
+    # Balanced class weights, computed over the original rows so that collapsing
+    # duplicates doesn't change how much each class counts.
+    sample_weight = balanced_sample_weight(y_train, w_train)
+
+    dt_model = DecisionTreeClassifier(random_state=42)
+    train_and_evaluate(dt_model, "Decision Tree", X_train, y_train, X_test, y_test, class_names,
+                       figure_path('decision_tree'), sample_weight=sample_weight, test_weight=w_test)
+
+    # n_jobs=-1 uses all available CPU cores for faster training.
+    rf_model = RandomForestClassifier(random_state=42, n_jobs=n_jobs)
+    train_and_evaluate(rf_model, "Random Forest", X_train, y_train, X_test, y_test, class_names,
+                       figure_path('random_forest'), sample_weight=sample_weight, test_weight=w_test)
+
+    print("✅ Model training and evaluation complete!")
+
+    # Save the best performing model (Random Forest)
+    print("\n🔹 Saving the trained Random Forest model...")
+    joblib.dump(rf_model, 'ids_rf_model.pkl')
+    print("✅ Model saved to 'ids_rf_model.pkl'")
+    return rf_model
 
 
 # --- Main execution block ---
 if __name__ == "__main__":
     # 1. Load the preprocessed data
-    print("🔹 Loading preprocessed data from 'train_test_data.pkl'...")
+    print(f"🔹 Loading preprocessed data from '{SPLIT_DIR}/'...")
     try:
-        X_train, X_test, y_train, y_test = joblib.load('train_test_data.pkl')
+        X_train, X_test, y_train, y_test = load_split('X_train', 'X_test', 'y_train', 'y_test')
+        w_train, w_test = load_weights('w_train', 'w_test')
         label_encoder = joblib.load('label_encoder.pkl')
         class_names = label_encoder.classes_
     except FileNotFoundError:
-        print("Error: Required .pkl files not found. Please run data_preprocessing.py first.")
+        print("Error: Preprocessed data or label encoder not found. Please run data_preprocessing.py first.")
         exit()
 
     print("Data loaded successfully.")
 
-    # 2. Initialize and run Decision Tree
-    # We use class_weight='balanced' to help with the imbalanced dataset.
-    dt_model = DecisionTreeClassifier(random_state=42, class_weight='balanced')
-    train_and_evaluate(dt_model, "Decision Tree", X_train, y_train, X_test, y_test, class_names)
-
-    # 3. Initialize and run Random Forest
-    # n_jobs=-1 uses all available CPU cores for faster training.
-    rf_model = RandomForestClassifier(random_state=42, class_weight='balanced', n_jobs=-1)
-    train_and_evaluate(rf_model, "Random Forest", X_train, y_train, X_test, y_test, class_names)
-
-    print("✅ Model training and evaluation complete!")
-
-    # 4. Save the best performing model (Random Forest)
-    print("\n🔹 Saving the trained Random Forest model...")
-    joblib.dump(rf_model, 'ids_rf_model.pkl')
-    print("✅ Model saved to 'ids_rf_model.pkl'")
+    # 2. Train the Decision Tree and Random Forest, then save the Random Forest
+    train_tree_models(X_train, y_train, X_test, y_test, class_names, w_train=w_train, w_test=w_test)
 
     print("\n✅ Process complete!")
\ No newline at end of file
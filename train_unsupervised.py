@@ -1,31 +1,44 @@
 import joblib
 import pandas as pd
 from sklearn.ensemble import IsolationForest
+from split_store import load_split, load_weights
 
-print("🔹 Loading preprocessed data...")
-try:
-    X_train, _, y_train, _ = joblib.load('train_test_data.pkl')
-    label_encoder = joblib.load('label_encoder.pkl')
-except FileNotFoundError:
-    print("❌ Error: Required .pkl files not found. Please run data_preprocessing.py first.")
-    exit()
 
-# We need to find which numerical label corresponds to 'BENIGN'
-benign_label_numeric = label_encoder.transform(['BENIGN'])[0]
+def train_isolation_forest(X_train, y_train, label_encoder, n_jobs=-1, w_train=None):
+    """Trains the Isolation Forest on BENIGN training rows (weighted by duplicate count) and saves it."""
+    # We need to find which numerical label corresponds to 'BENIGN'
+    benign_label_numeric = label_encoder.transform(['BENIGN'])[0]
 
-# Filter the training data to get ONLY the BENIGN traffic
-X_train_benign = X_train[y_train == benign_label_numeric]
+    # Filter the training data to get ONLY the BENIGN traffic
+    benign_mask = y_train == benign_label_numeric
+    X_train_benign = X_train[benign_mask]
+    w_train_benign = w_train[benign_mask] if w_train is not None else None
 
-print(f"✅ Data loaded. Training Isolation Forest on {len(X_train_benign)} BENIGN samples...")
+    print(f"✅ Data loaded. Training Isolation Forest on {len(X_train_benign)} BENIGN samples...")
 
-# --- Train the Isolation Forest Model ---
-# contamination='auto' is a good starting point. It means the model will try to
-# estimate the proportion of outliers in the data.
-iforest_model = IsolationForest(n_estimators=100, contamination='auto', random_state=42, n_jobs=-1)
-iforest_model.fit(X_train_benign)
+    # --- Train the Isolation Forest Model ---
+    # contamination='auto' is a good starting point. It means the model will try to
+    # estimate the proportion of outliers in the data.
+    iforest_model = IsolationForest(n_estimators=100, contamination='auto', random_state=42, n_jobs=n_jobs)
+    iforest_model.fit(X_train_benign, sample_weight=w_train_benign)
 
-print("✅ Training complete.")
+    print("✅ Training complete.")
 
-# --- Save the Trained Model ---
-joblib.dump(iforest_model, 'ids_iforest_model.pkl')
-print("💾 Unsupervised model saved to 'ids_iforest_model.pkl'")
\ No newline at end of file
+    # --- Save the Trained Model ---
+    joblib.dump(iforest_model, 'ids_iforest_model.pkl')
+    print("💾 Unsupervised model saved to 'ids_iforest_model.pkl'")
+    return iforest_model
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    print("🔹 Loading preprocessed data...")
+    try:
+        X_train, y_train = load_split('X_train', 'y_train')
+        w_train, = load_weights('w_train')
+        label_encoder = joblib.load('label_encoder.pkl')
+    except FileNotFoundError:
+        print("❌ Error: Preprocessed data or label encoder not found. Please run data_preprocessing.py first.")
+        exit()
+
+    train_isolation_forest(X_train, y_train, label_encoder, w_train=w_train)
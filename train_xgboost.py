@@ -1,65 +1,120 @@
+import os
+import time
 import joblib
+import numpy as np
 import xgboost as xgb
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import seaborn as sns
 import matplotlib.pyplot as plt
 import pandas as pd
+from split_store import load_split, load_weights, SPLIT_DIR
+from training_utils import PLOT_LOCK, finish_figure
+from xgb_model_io import save_xgb_model, load_xgb_model, XGB_MODEL_FILE, XGB_META_FILE, LEGACY_XGB_MODEL_FILE
 
 
-def train_and_evaluate_xgboost(X_train, y_train, X_test, y_test, class_names):
+def report_prediction_latency(predictor, X, batch_sizes=(1, 1000, 100000), repeats=5):
+    """Prints median inplace_predict latency per batch size."""
+    for batch_size in batch_sizes:
+        batch = np.ascontiguousarray(X[:batch_size], dtype=np.float32)
+        if len(batch) < batch_size:
+            continue
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            predictor.predict_proba(batch)
+            timings.append(time.perf_counter() - started)
+        latency = float(np.median(timings))
+        print(f"⏱️  Predict {batch_size:>7,} rows: {latency * 1000:8.2f} ms ({batch_size / latency:,.0f} rows/s)")
+
+
+def train_and_evaluate_xgboost(X_train, y_train, X_test, y_test, class_names, n_jobs=-1, figure_path=None,
+                               w_train=None, w_test=None):
     """
     Trains, evaluates, and saves an XGBoost model.
+    `w_train`/`w_test` are the duplicate counts of a deduplicated split.
     """
     print("--- Training XGBoost Model ---")
 
+    if w_train is None:
+        w_train = np.ones(len(y_train), dtype=np.float32)
+
+    # Hold out 10% of the training data for early stopping
+    X_fit, X_val, y_fit, y_val, w_fit, w_val = train_test_split(X_train, y_train, w_train, test_size=0.1,
+                                                                random_state=42, stratify=y_train)
+
     # Initialize the XGBoost Classifier
-    # 'use_label_encoder=False' and 'eval_metric' are set to avoid deprecation warnings
-    model = xgb.XGBClassifier(objective='multi:softmax', num_class=len(class_names),
-                              use_label_encoder=False, eval_metric='mlogloss', n_jobs=-1, random_state=42)
+    # 'softprob' gives per-class probabilities (File Analysis uses predict_proba);
+    # 'hist' bins features once, which is much faster than exact splits on millions of rows.
+    model = xgb.XGBClassifier(objective='multi:softprob', num_class=len(class_names), tree_method='hist',
+                              n_estimators=1000, early_stopping_rounds=20, eval_metric='mlogloss',
+                              n_jobs=n_jobs, random_state=42)
 
     # Train the model
-    model.fit(X_train, y_train)
+    started = time.perf_counter()
+    model.fit(X_fit, y_fit, sample_weight=w_fit, eval_set=[(X_val, y_val)], sample_weight_eval_set=[w_val],
+              verbose=50)
+    train_seconds = time.perf_counter() - started
+    print(f"⏱️  Training time: {train_seconds:.1f}s on {len(X_fit):,} rows (best iteration {model.best_iteration})")
+
+    # Keep only the trees up to the best iteration and predict through the native Booster
+    booster = model.get_booster()[:model.best_iteration + 1]
+    metadata = save_xgb_model(booster, {
+        'objective': 'multi:softprob',
+        'num_class': len(class_names),
+        'n_features': int(X_train.shape[1]),
+        'class_names': [str(name) for name in class_names],
+        'best_iteration': int(model.best_iteration),
+        'train_seconds': round(train_seconds, 2),
+    })
+    predictor = load_xgb_model(n_threads=n_jobs if n_jobs and n_jobs > 0 else None)
+    print(f"\n💾 XGBoost model saved to '{XGB_MODEL_FILE}' ({metadata['model_bytes'] / 1024:,.0f} KB) "
+          f"with metadata in '{XGB_META_FILE}'")
+    report_prediction_latency(predictor, X_test)
+    if os.path.exists(LEGACY_XGB_MODEL_FILE):
+        print(f"    For comparison, legacy pickle '{LEGACY_XGB_MODEL_FILE}': "
+              f"{os.path.getsize(LEGACY_XGB_MODEL_FILE) / 1024:,.0f} KB")
+        report_prediction_latency(joblib.load(LEGACY_XGB_MODEL_FILE), X_test)
 
     # Make predictions on the test set
-    y_pred = model.predict(X_test)
+    y_pred = predictor.predict(X_test)
 
     # Evaluate performance
-    accuracy = accuracy_score(y_test, y_pred)
+    accuracy = accuracy_score(y_test, y_pred, sample_weight=w_test)
     print(f"✅ XGBoost Accuracy: {accuracy:.4f}\n")
 
     print("📊 Classification Report:")
-    report_dict = classification_report(y_test, y_pred, target_names=class_names, output_dict=True, zero_division=0)
+    report_dict = classification_report(y_test, y_pred, target_names=class_names, output_dict=True, zero_division=0,
+                                        sample_weight=w_test)
     report_df = pd.DataFrame(report_dict).transpose()
     print(report_df)
 
-    # Save the trained model
-    joblib.dump(model, 'ids_xgb_model.pkl')
-    print("\n💾 XGBoost model saved to 'ids_xgb_model.pkl'")
-
     # Visualize the Confusion Matrix
-    cm = confusion_matrix(y_test, y_pred)
-    plt.figure(figsize=(12, 10))
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=class_names, yticklabels=class_names)
-    plt.title('Confusion Matrix for XGBoost Model')
-    plt.xlabel('Predicted Label')
-    plt.ylabel('True Label')
-    plt.tight_layout()
-    plt.show()
+    cm = confusion_matrix(y_test, y_pred, sample_weight=w_test).round().astype(int)
+    with PLOT_LOCK:
+        fig, ax = plt.subplots(figsize=(12, 10))
+        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=class_names, yticklabels=class_names, ax=ax)
+        ax.set_title('Confusion Matrix for XGBoost Model')
+        ax.set_xlabel('Predicted Label')
+        ax.set_ylabel('True Label')
+        fig.tight_layout()
+        finish_figure(fig, figure_path)
 
 
 # --- Main execution block ---
 if __name__ == "__main__":
-    print("🔹 Loading preprocessed data from 'train_test_data.pkl'...")
+    print(f"🔹 Loading preprocessed data from '{SPLIT_DIR}/'...")
     try:
-        X_train, X_test, y_train, y_test = joblib.load('train_test_data.pkl')
+        X_train, X_test, y_train, y_test = load_split('X_train', 'X_test', 'y_train', 'y_test')
+        w_train, w_test = load_weights('w_train', 'w_test')
         label_encoder = joblib.load('label_encoder.pkl')
         class_names = label_encoder.classes_
     except FileNotFoundError:
-        print("Error: Required .pkl files not found. Please run data_preprocessing.py first.")
+        print("Error: Preprocessed data or label encoder not found. Please run data_preprocessing.py first.")
         exit()
 
     print("Data loaded successfully.")
 
-    train_and_evaluate_xgboost(X_train, y_train, X_test, y_test, class_names)
+    train_and_evaluate_xgboost(X_train, y_train, X_test, y_test, class_names, w_train=w_train, w_test=w_test)
 
     print("\n✅ XGBoost training and evaluation complete!")
\ No newline at end of file
